@@ -0,0 +1,245 @@
+"""Stage benchmarks on a synthetic theme.
+
+    python -m benchmarks --assets 120 --save baseline.json
+    python -m benchmarks --assets 120 --baseline baseline.json
+
+Every stage runs --repeat times and keeps the fastest run. With --baseline
+each stage is compared to the stored result and any stage slower by more
+than --tolerance is reported as a regression (exit code 1).
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import PIL
+from PIL import Image
+
+from benchmarks.synthetic_theme import generate_theme, generate_pattern
+from core import engine
+from core.engine import ThemeJob
+from utils.color_lut import get_color_lut
+from utils.color_utils import hex_to_rgb
+from utils.image_processing import (load_rgba_bands, is_large_image, render_pixels,
+                                    blend_pixels, BAND_ROWS)
+from utils.pattern_cache import get_pattern_pixels, clear_pattern_cache
+from utils.png_encoder import ENCODE_MODES, encode_image
+
+STAGES = ['decode', 'kernel', 'pattern', 'encode', 'backup', 'copy', 'plist', 'theme']
+
+BENCH_COLOR = '#ff3469'
+BENCH_INTENSITY = 0.5
+BENCH_PATTERN_BLEND = 0.3
+
+# Differences smaller than this are timer noise, whatever the percentage
+MIN_REGRESSION_SECONDS = 0.005
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the engine's per-file prints while timing"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def band_rows_for(pixels):
+    return BAND_ROWS if is_large_image((pixels.shape[1], pixels.shape[0])) else None
+
+
+def bench_decode(ctx):
+    for path in ctx['images']:
+        load_rgba_bands(path)
+
+
+def bench_kernel(ctx):
+    lut = get_color_lut(hex_to_rgb(BENCH_COLOR), BENCH_INTENSITY, 1.0, 1.0, True, True, 254, 30)
+    seconds = 0.0
+    for pixels, band_rows in ctx['decoded']:
+        work = pixels.copy()
+        start = time.perf_counter()
+        render_pixels(work, lut, True, False, None, 0, band_rows)
+        seconds += time.perf_counter() - start
+    return seconds
+
+
+def bench_pattern(ctx):
+    # Cold cache: the first file of each size pays for decode and resize
+    clear_pattern_cache()
+    seconds = 0.0
+    for pixels, _ in ctx['decoded']:
+        work = pixels.copy()
+        start = time.perf_counter()
+        pattern_pixels = get_pattern_pixels(ctx['pattern'], (work.shape[1], work.shape[0]))
+        blend_pixels(work, pattern_pixels, BENCH_PATTERN_BLEND)
+        seconds += time.perf_counter() - start
+    return seconds
+
+
+def bench_encode(ctx):
+    out_dir = ctx['scratch'] / 'encode'
+    out_dir.mkdir(exist_ok=True)
+    seconds = 0.0
+    for path, (pixels, _) in zip(ctx['images'], ctx['decoded']):
+        img = Image.frombuffer("RGBA", (pixels.shape[1], pixels.shape[0]), pixels, "raw", "RGBA", 0, 1)
+        seconds += encode_image(img, out_dir / path.name, ctx['encoding'])[0]
+    return seconds
+
+
+def bench_backup(ctx):
+    shutil.rmtree(ctx['theme'] / 'backup', ignore_errors=True)
+    start = time.perf_counter()
+    engine.create_backup(ctx['theme'])
+    return time.perf_counter() - start
+
+
+def bench_copy(ctx):
+    out_dir = ctx['scratch'] / 'copy'
+    shutil.rmtree(out_dir, ignore_errors=True)
+    out_dir.mkdir()
+    start = time.perf_counter()
+    engine.copy_all_items(ctx['theme'], out_dir)
+    return time.perf_counter() - start
+
+
+def bench_plist(ctx):
+    job = ThemeJob(input_dir=ctx['theme'], color=BENCH_COLOR, intensity=BENCH_INTENSITY,
+                   create_new=False)
+    shutil.copy2(ctx['theme'] / 'backup' / 'settings.plist', ctx['theme'] / 'settings.plist')
+    start = time.perf_counter()
+    engine.process_plist_file(job)
+    return time.perf_counter() - start
+
+
+def bench_theme(ctx):
+    # Jobs only offer default and fast encoding; optimizing is a follow-up pass
+    job = ThemeJob(input_dir=ctx['theme'], color=BENCH_COLOR, intensity=BENCH_INTENSITY,
+                   workers=ctx['workers'], incremental=False, render_cache_mb=0,
+                   png_encoding='fast' if ctx['encoding'] == 'fast' else 'default')
+    start = time.perf_counter()
+    engine.process_theme(job)
+    seconds = time.perf_counter() - start
+    shutil.rmtree(job.output_folder, ignore_errors=True)
+    return seconds
+
+
+def run_stage(name, ctx, repeat):
+    """Fastest of `repeat` runs. A stage may return its own timing to
+    leave setup work out of the measurement"""
+    fn = globals()[f'bench_{name}']
+    runs = []
+    for _ in range(repeat):
+        with quiet():
+            start = time.perf_counter()
+            seconds = fn(ctx)
+            elapsed = time.perf_counter() - start
+        runs.append(seconds if seconds is not None else elapsed)
+    return min(runs)
+
+
+def describe_environment(args, ctx):
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pillow': PIL.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'assets': args.assets,
+        'scale': args.scale,
+        'pixels': int(sum(p.shape[0] * p.shape[1] for p, _ in ctx['decoded'])),
+        'repeat': args.repeat,
+        'workers': args.workers,
+        'encoding': args.encoding,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print each stage against the baseline. Returns the regressed stages"""
+    regressions = []
+    print(f"{'stage':<10}{'baseline':>12}{'now':>12}{'change':>10}")
+    for name, seconds in results['stages'].items():
+        before = baseline['stages'].get(name)
+        if not before:
+            print(f"{name:<10}{'-':>12}{seconds:>11.3f}s{'new':>10}")
+            continue
+        change = seconds / before - 1
+        flag = ''
+        if change > tolerance and seconds - before > MIN_REGRESSION_SECONDS:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<10}{before:>11.3f}s{seconds:>11.3f}s{change:>+10.1%}{flag}")
+    if baseline.get('environment', {}).get('platform') != results['environment']['platform']:
+        print("Note: the baseline was recorded on a different platform")
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Time each colorize stage on a synthetic theme")
+    parser.add_argument('--assets', type=int, default=120, help="number of images in the theme")
+    parser.add_argument('--scale', type=float, default=1.0, help="size multiplier for every asset")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, help="workers for the full theme stage")
+    parser.add_argument('--encoding', choices=list(ENCODE_MODES), default='default')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--save', help="write the results as a baseline JSON file")
+    parser.add_argument('--baseline', help="compare against a baseline JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="allowed slowdown before a stage counts as a regression")
+    parser.add_argument('--keep', help="build the theme in this folder and keep it")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    scratch = Path(args.keep) if args.keep else Path(tempfile.mkdtemp(prefix="glow-bench-"))
+    # Keep renders out of the user's cache
+    os.environ.setdefault('GLOW_COLORIZER_CACHE_DIR', str(scratch / 'render-cache'))
+
+    try:
+        print(f"Generating {args.assets} assets at scale {args.scale} in {scratch}")
+        theme = scratch / 'BenchTheme'
+        shutil.rmtree(theme, ignore_errors=True)
+        images = generate_theme(theme, args.assets, args.scale)
+        ctx = {
+            'scratch': scratch,
+            'theme': theme,
+            'images': images,
+            'decoded': [(pixels, band_rows_for(pixels)) for pixels in map(load_rgba_bands, images)],
+            'pattern': generate_pattern(scratch / 'pattern.png'),
+            'workers': args.workers,
+            'encoding': args.encoding,
+        }
+        with quiet():
+            engine.create_backup(theme)
+
+        results = {'environment': describe_environment(args, ctx), 'stages': {}}
+        for name in STAGES:
+            if name in args.stages:
+                results['stages'][name] = round(run_stage(name, ctx, args.repeat), 4)
+                print(f"  {name:<10}{results['stages'][name]:>9.3f}s")
+    finally:
+        if not args.keep:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""Fuzzed equivalence and throughput check for colorize kernels.
+
+    python -m benchmarks.kernels --cases 200
+    python -m benchmarks.kernels --kernels lut render --throughput-size 2048
+
+Random images and parameter sets go through the original per-pixel loop
+(kept here as the reference) and through every registered kernel. For each
+kernel the maximum per-channel deviation from the reference is reported
+with its throughput; any deviation above --max-deviation exits with code 1.
+
+A new backend only has to be added to KERNELS: a function taking an RGBA
+uint8 array and a params dict and returning the colorized array.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from utils.color_lut import get_color_lut
+from utils.color_utils import hex_to_rgb, adjust_color_hsv, is_white_pixel, is_black_pixel
+from utils.image_processing import colorize_pixels, render_pixels, opaque_box
+from utils.palette_index import pack_rgba, unpack_rgba
+
+
+def reference_colorize(pixels, params):
+    """The original colorize_enhanced pixel loop, unchanged"""
+    img = Image.fromarray(pixels, "RGBA").copy()
+    r_col, g_col, b_col = hex_to_rgb(params['color'])
+    intensity = params['intensity']
+    saturation = params['saturation']
+    brightness = params['brightness']
+    access = img.load()
+
+    for y in range(img.height):
+        for x in range(img.width):
+            r, g, b, a = access[x, y]
+
+            # Preserve transparency if enabled
+            if params['preserve_transparency'] and a == 0:
+                continue
+
+            # Skip white/black pixels if preservation is enabled
+            if params['preserve_whites'] and is_white_pixel(r, g, b, params['white_threshold']):
+                continue
+            if params['preserve_blacks'] and is_black_pixel(r, g, b, params['black_threshold']):
+                continue
+
+            # Apply color tinting
+            r_new = round(r*(1-intensity) + r_col*intensity)
+            g_new = round(g*(1-intensity) + g_col*intensity)
+            b_new = round(b*(1-intensity) + b_col*intensity)
+
+            # Apply saturation and brightness adjustments
+            r_new, g_new, b_new = adjust_color_hsv(r_new, g_new, b_new, saturation, brightness)
+
+            # Clamp values
+            r_new = max(0, min(255, r_new))
+            g_new = max(0, min(255, g_new))
+            b_new = max(0, min(255, b_new))
+
+            access[x, y] = (r_new, g_new, b_new, a)
+    return np.array(img)
+
+
+def _color_args(params):
+    return (hex_to_rgb(params['color']), params['intensity'],
+            params['saturation'], params['brightness'])
+
+
+def numpy_kernel(pixels, params):
+    """colorize_pixels over the whole image"""
+    return colorize_pixels(pixels.copy(), *_color_args(params),
+                           params['preserve_transparency'], params['preserve_whites'],
+                           params['preserve_blacks'], params['white_threshold'],
+                           params['black_threshold'])
+
+
+def _lut(params):
+    # Cached per parameter set like the pipeline's, so throughput runs are warm
+    return get_color_lut(*_color_args(params), params['preserve_whites'], params['preserve_blacks'],
+                         params['white_threshold'], params['black_threshold'])
+
+
+def lut_kernel(pixels, params):
+    """ColorLUT.apply, as used by colorize_enhanced"""
+    out = pixels.copy()
+    _lut(params).apply(out, params['preserve_transparency'])
+    return out
+
+
+def render_kernel(pixels, params):
+    """render_pixels with small row bands, to cover band edges"""
+    out = pixels.copy()
+    render_pixels(out, _lut(params), params['preserve_transparency'], band_rows=7)
+    return out
+
+
+def box_kernel(pixels, params):
+    """render_pixels limited to the opaque box, as colorize_enhanced runs it
+    when transparency is preserved"""
+    out = pixels.copy()
+    box = opaque_box(out) if params['preserve_transparency'] else None
+    render_pixels(out, _lut(params), params['preserve_transparency'], band_rows=7, lut_box=box)
+    return out
+
+
+def palette_kernel(pixels, params):
+    """Colorize the unique colors once and scatter them back, as the
+    palette index and live preview do"""
+    palette, inverse = np.unique(pack_rgba(pixels).reshape(-1), return_inverse=True)
+    colors = unpack_rgba(palette).reshape(-1, 1, 4)
+    colorize_pixels(colors, *_color_args(params),
+                    params['preserve_transparency'], params['preserve_whites'],
+                    params['preserve_blacks'], params['white_threshold'],
+                    params['black_threshold'])
+    return colors.reshape(-1, 4)[inverse.reshape(-1)].reshape(pixels.shape)
+
+
+KERNELS = {
+    'numpy': numpy_kernel,
+    'lut': lut_kernel,
+    'render': render_kernel,
+    'box': box_kernel,
+    'palette': palette_kernel,
+}
+
+
+def random_color(rng):
+    """3- or 6-digit hex, with or without '#'"""
+    digits = 3 if rng.random() < 0.3 else 6
+    value = ''.join(rng.choice(list('0123456789abcdefABCDEF'), digits))
+    return ('#' if rng.random() < 0.7 else '') + value
+
+
+def random_params(rng):
+    return {
+        'color': random_color(rng),
+        # 0.5 and the extremes hit round()'s ties and the no-op cases
+        'intensity': float(rng.choice([0.0, 0.5, 1.0, 0.25, rng.random()])),
+        'saturation': float(rng.choice([1.0, 0.0, rng.uniform(0, 2)])),
+        'brightness': float(rng.choice([1.0, 0.0, rng.uniform(0, 2)])),
+        'preserve_transparency': bool(rng.random() < 0.8),
+        'preserve_whites': bool(rng.random() < 0.8),
+        'preserve_blacks': bool(rng.random() < 0.8),
+        'white_threshold': int(rng.integers(200, 256)),
+        'black_threshold': int(rng.integers(0, 61)),
+    }
+
+
+def random_image(rng, params, max_size):
+    """Random RGBA pixels salted with the values kernels get wrong: exact
+    thresholds, grays, fully transparent and fully opaque pixels and
+    transparent margins"""
+    height, width = rng.integers(1, max_size + 1, 2)
+    pixels = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    flat = pixels.reshape(-1, 4)
+    picks = rng.random(len(flat))
+
+    white = params['white_threshold'] + rng.integers(-1, 2, len(flat))
+    black = params['black_threshold'] + rng.integers(-1, 2, len(flat))
+    flat[picks < 0.15, :3] = np.clip(white[picks < 0.15], 0, 255)[:, None]
+    edge = (picks >= 0.15) & (picks < 0.3)
+    flat[edge, :3] = np.clip(black[edge], 0, 255)[:, None]
+    gray = (picks >= 0.3) & (picks < 0.4)
+    flat[gray, 1] = flat[gray, 0]
+    flat[gray, 2] = flat[gray, 0]
+    flat[rng.random(len(flat)) < 0.1, 3] = 0
+    flat[rng.random(len(flat)) < 0.3, 3] = 255
+    if rng.random() < 0.4:
+        # Transparent margins, as around window frame and checkbox sprites
+        top, left = rng.integers(0, height + 1), rng.integers(0, width + 1)
+        pixels[:top, :, 3] = 0
+        pixels[:, :left, 3] = 0
+        pixels[rng.integers(top, height + 1):, :, 3] = 0
+    return pixels
+
+
+def fuzz(kernels, cases, max_size, seed):
+    """Run every case through the reference and each kernel.
+
+    Returns {kernel: {'max_deviation': [r, g, b, a], 'bad_pixels': n,
+    'first_failure': params or None}}.
+    """
+    rng = np.random.default_rng(seed)
+    results = {name: {'max_deviation': [0, 0, 0, 0], 'bad_pixels': 0, 'first_failure': None}
+               for name in kernels}
+    for _ in range(cases):
+        params = random_params(rng)
+        pixels = random_image(rng, params, max_size)
+        expected = reference_colorize(pixels, params).astype(np.int16)
+        for name in kernels:
+            actual = KERNELS[name](pixels, params).astype(np.int16)
+            deviation = np.abs(actual - expected).reshape(-1, 4)
+            entry = results[name]
+            entry['max_deviation'] = [max(old, int(new)) for old, new
+                                      in zip(entry['max_deviation'], deviation.max(axis=0))]
+            bad = int(deviation.any(axis=1).sum())
+            if bad and entry['first_failure'] is None:
+                entry['first_failure'] = params
+            entry['bad_pixels'] += bad
+    return results
+
+
+def throughput(fn, pixels, params, repeat):
+    """Best pixels per second over repeat runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(pixels, params)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return pixels.shape[0] * pixels.shape[1] / max(best, 1e-9)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.kernels",
+                                     description="Check colorize kernels against the reference loop")
+    parser.add_argument('--kernels', nargs='+', choices=sorted(KERNELS), default=list(KERNELS))
+    parser.add_argument('--cases', type=int, default=100, help="random image/parameter cases")
+    parser.add_argument('--max-size', type=int, default=48, help="largest fuzzed image side")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--throughput-size', type=int, default=1024,
+                        help="image side used to measure kernel throughput")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-deviation', type=int, default=0,
+                        help="largest per-channel difference still accepted")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    print(f"Fuzzing {args.cases} cases (seed {args.seed}) through {', '.join(args.kernels)}")
+    results = fuzz(args.kernels, args.cases, args.max_size, args.seed)
+
+    rng = np.random.default_rng(args.seed + 1)
+    params = random_params(rng)
+    params.update(intensity=0.5, saturation=1.2, brightness=0.9)
+    side = args.throughput_size
+    big = rng.integers(0, 256, (side, side, 4), dtype=np.uint8)
+    # The pure Python loop is timed on a small crop
+    small = big[:64, :64].copy()
+    reference_rate = throughput(reference_colorize, small, params, 1)
+
+    print(f"{'kernel':<10}{'max dev R/G/B/A':>18}{'bad pixels':>12}{'Mpx/s':>10}{'speedup':>10}")
+    print(f"{'reference':<10}{'-':>18}{'-':>12}{reference_rate / 1e6:>10.3f}{1:>9.0f}x")
+    failed = False
+    for name in args.kernels:
+        entry = results[name]
+        rate = throughput(KERNELS[name], big, params, args.repeat)
+        deviation = '/'.join(str(d) for d in entry['max_deviation'])
+        print(f"{name:<10}{deviation:>18}{entry['bad_pixels']:>12}{rate / 1e6:>10.3f}"
+              f"{rate / reference_rate:>9.0f}x")
+        if max(entry['max_deviation']) > args.max_deviation:
+            failed = True
+            print(f"  first failing parameters: {entry['first_failure']}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
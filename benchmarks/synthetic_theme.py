@@ -0,0 +1,147 @@
+"""Synthetic Glow themes for benchmarking.
+
+Assets follow Glow Engine naming (Mica tiles, window frames, checkboxes)
+and come as 1x/@2x pairs. Pixels are smooth gradients with noise, soft
+alpha edges and runs of pure white/black, so decoding, the color kernel
+and PNG compression all see realistic work.
+"""
+import plistlib
+import numpy as np
+from PIL import Image
+
+# (name stem, 1x width, 1x height)
+MICA_ASSETS = [
+    ('Mica: Header', 1024, 52),
+    ('Mica: Header-Opaque', 1024, 52),
+    ('Mica: Sidebar', 240, 900),
+    ('Mica: Sidebar-Opaque', 240, 900),
+    ('Mica: Titlebar', 1024, 28),
+    ('Mica: Titlebar-Opaque', 1024, 28),
+    ('Mica: Menu', 320, 480),
+    ('Mica: Menu-Opaque', 320, 480),
+    ('Mica: WindowBackground', 1280, 800),
+    ('Mica: WindowBackground-Opaque', 1280, 800),
+]
+WINDOWFRAME_ASSETS = [
+    ('WindowFrame_WindowShapeEdges_Regular', 64, 96),
+    ('WindowFrame_TitlebarButtons_Close', 14, 14),
+    ('WindowFrame_TitlebarButtons_Minimize', 14, 14),
+    ('WindowFrame_TitlebarButtons_Zoom', 14, 14),
+]
+CONTROL_ASSETS = [
+    ('CheckBox_Regular', 16, 16),
+    ('RadioButton_Regular', 16, 16),
+    ('PushButton_Regular', 96, 22),
+    ('PopUpButton_Regular', 120, 22),
+    ('Slider_Knob_Regular', 20, 20),
+    ('Scroller_Knob_Regular', 12, 64),
+    ('Toolbar_Background', 800, 52),
+    ('Dock_Background', 1024, 96),
+]
+STATES = ['Active', 'Inactive']
+
+THEME_COLORS = {
+    'ControlAccent': '#0a84ffff',
+    'WindowBackground': '#ecececff',
+    'HeaderText': '#1d1d1fff',
+    'SidebarBackground': '#f5f5f7d9',
+    'Separator': '#0000001a',
+    'SelectedContent': '#0064e1ff',
+    'MenuBackground': '#ffffffcc',
+    'Shadow': '#00000040',
+}
+
+
+def asset_specs(assets):
+    """List (file name, width, height) for roughly `assets` files.
+
+    Mica tiles and window frames come first, each as Active/Inactive and
+    1x/@2x, then controls; the list repeats with numbered variants until
+    the count is reached.
+    """
+    base = []
+    for stem, width, height in MICA_ASSETS + WINDOWFRAME_ASSETS + CONTROL_ASSETS:
+        for state in STATES:
+            base.append((f"{stem}_{state}_Normal_Off_Base0", width, height))
+
+    specs = []
+    variant = 0
+    while len(specs) < assets:
+        for name, width, height in base:
+            if variant:
+                name = f"{name}_{variant}"
+            specs.append((f"{name}.png", width, height))
+            specs.append((f"{name}@2x.png", width * 2, height * 2))
+            if len(specs) >= assets:
+                break
+        variant += 1
+    return specs[:assets]
+
+
+def synthetic_pixels(width, height, rng):
+    """RGBA uint8 pixels with gradients, noise, alpha edges and flat runs"""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    hue = rng.random(3).astype(np.float32)
+    rgb = np.empty((height, width, 3), dtype=np.float32)
+    for c in range(3):
+        rgb[..., c] = 128 + 100 * np.sin(x / max(width, 1) * 3 + hue[c] * 6) * np.cos(y / max(height, 1) * 2)
+    rgb += rng.normal(0, 4, rgb.shape).astype(np.float32)
+
+    pixels = np.empty((height, width, 4), dtype=np.uint8)
+    pixels[..., :3] = np.clip(rgb, 0, 255)
+
+    # Soft alpha towards the edges, like rounded window chrome
+    edge = np.minimum(np.minimum(x, width - 1 - x), np.minimum(y, height - 1 - y))
+    pixels[..., 3] = np.clip(edge * 64, 0, 255)
+
+    # Pure white and black runs exercise the preserve thresholds
+    band = max(height // 8, 1)
+    pixels[:band, : width // 3, :3] = 255
+    pixels[-band:, -(width // 4):, :3] = 0
+    return pixels
+
+
+def theme_plist(specs):
+    """settings.plist contents with gColors, gMicaTile and gAssetSlice"""
+    mica = {name[:-len('.png')]: True for name, _, _ in specs if name.startswith('Mica:')}
+    slices = {}
+    for name, _, _ in specs:
+        if name.startswith('WindowFrame_WindowShapeEdges'):
+            stem = name[:-len('.png')]
+            slices[stem] = "{32,96,0,0}" if stem.endswith('@2x') else "{16,48,0,0}"
+    return {
+        'gColors': dict(THEME_COLORS),
+        'gMicaTile': mica,
+        'gAssetSlice': slices,
+        'gWindowShadowActiveRadius': 10,
+        'gWindowShadowInactiveRadius': 8,
+        'gDockSlices': "{{0.25, 0.05},{0.5, 0.95}}",
+    }
+
+
+def generate_theme(theme_dir, assets=120, scale=1.0, seed=0):
+    """Write a synthetic theme of `assets` images into theme_dir.
+
+    scale multiplies every asset's size. Returns the list of image paths.
+    """
+    theme_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    specs = [(name, max(int(width * scale), 1), max(int(height * scale), 1))
+             for name, width, height in asset_specs(assets)]
+
+    paths = []
+    for name, width, height in specs:
+        path = theme_dir / name
+        Image.fromarray(synthetic_pixels(width, height, rng), 'RGBA').save(path)
+        paths.append(path)
+
+    with open(theme_dir / 'settings.plist', 'wb') as f:
+        plistlib.dump(theme_plist(specs), f)
+    return paths
+
+
+def generate_pattern(path, size=(512, 512), seed=1):
+    """Write a tileable noise pattern for the pattern stage"""
+    rng = np.random.default_rng(seed)
+    Image.fromarray(synthetic_pixels(size[0], size[1], rng), 'RGBA').save(path)
+    return path
@@ -0,0 +1,172 @@
+"""Headless command line for the colorize engine.
+
+    python -m core process /Library/GlowThemes/MyTheme --color '#ff3469'
+    python -m core process MyTheme --job job.json --workers 8
+    python -m core restore /Library/GlowThemes/MyTheme
+    python -m core batch jobs.json --status status.json
+"""
+import argparse
+import json
+import signal
+import sys
+from pathlib import Path
+
+from core import engine, batch
+from core.engine import ThemeJob, ProcessingCancelled, Reporter
+from utils.asset_cache import get_asset_cache
+
+
+class ConsoleReporter(Reporter):
+    """Prints stages and progress; the first Ctrl+C cancels cleanly"""
+
+    def __init__(self):
+        self.cancel_requested = False
+        self.last_percent = None
+
+    def set_stage(self, stage):
+        self.last_percent = None
+        print(stage)
+
+    def set_progress(self, done, total):
+        percent = int(done / total * 100)
+        if percent != self.last_percent:
+            self.last_percent = percent
+            print(f"  {percent}%", end='\n' if done == total else '\r', flush=True)
+
+    def warn(self, message):
+        print(f"Warning: {message}", file=sys.stderr)
+
+    def check_cancelled(self):
+        if self.cancel_requested:
+            raise ProcessingCancelled()
+
+    def handle_interrupt(self, signum, frame):
+        if self.cancel_requested:
+            raise KeyboardInterrupt
+        self.cancel_requested = True
+        print("\nCancelling after the current file (Ctrl+C again to abort)", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m core",
+                                     description="Glow Engine theme colorizer")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    process = commands.add_parser('process', help="colorize a theme")
+    process.add_argument('theme', help="theme folder")
+    process.add_argument('--job', help="JSON file with ThemeJob fields; flags override it")
+    process.add_argument('--color', help="tint color as HEX, e.g. '#ff3469'")
+    process.add_argument('--intensity', type=float)
+    process.add_argument('--saturation', type=float)
+    process.add_argument('--brightness', type=float)
+    process.add_argument('--in-place', dest='create_new', action='store_const', const=False,
+                         help="modify the theme instead of creating a new one")
+    process.add_argument('--dark', dest='theme_mode', action='store_const', const="Dark Theme",
+                         help="treat the theme as a dark theme")
+    process.add_argument('--no-checkboxes', dest='tint_checkboxes', action='store_const', const=False)
+    process.add_argument('--no-windowframes', dest='tint_windowframes', action='store_const', const=False)
+    process.add_argument('--white-threshold', type=int)
+    process.add_argument('--black-threshold', type=int)
+    process.add_argument('--no-preserve-transparency', dest='preserve_transparency',
+                         action='store_const', const=False)
+    process.add_argument('--no-preserve-whites', dest='preserve_whites', action='store_const', const=False)
+    process.add_argument('--no-preserve-blacks', dest='preserve_blacks', action='store_const', const=False)
+    process.add_argument('--pattern', dest='pattern_path')
+    process.add_argument('--pattern-blend', type=float)
+    process.add_argument('--pattern-filter', dest='pattern_filters', action='append',
+                         help="Mica prefix to pattern, e.g. 'Mica: Header' (repeatable)")
+    process.add_argument('--workers', type=int)
+    process.add_argument('--pipeline', action='store_const', const=True,
+                         help="overlap file reads and writes with rendering, for slow disks")
+    process.add_argument('--read-ahead', type=int, help="source files read ahead with --pipeline")
+    process.add_argument('--write-behind', type=int, help="encoded files queued for writing with --pipeline")
+    process.add_argument('--full', dest='incremental', action='store_const', const=False,
+                         help="re-render every file even if unchanged")
+    process.add_argument('--palette-index', dest='use_palette_index', action='store_const', const=True,
+                         help="recolor few-color files through their unique colors, indexed once")
+    process.add_argument('--no-palette-index', dest='use_palette_index', action='store_const', const=False)
+    process.add_argument('--derive-1x', action='store_const', const=True,
+                         help="make 1x files by downsampling their @2x render")
+    process.add_argument('--derive-1x-tolerance', type=float,
+                         help="largest mean difference from a direct 1x render, 0-255 per channel")
+    process.add_argument('--cache-mb', dest='render_cache_mb', type=int,
+                         help="render cache budget in MB, 0 to disable")
+    process.add_argument('--decoded-cache-mb', dest='decoded_cache_mb', type=int,
+                         help="decoded source pixel store budget in MB, 0 to disable")
+    process.add_argument('--png-encoding', choices=engine.PNG_ENCODINGS)
+    process.add_argument('--profile', nargs='?', const='spans',
+                         help="write stage timings; add 'cprofile', 'tracemalloc' or 'all' "
+                              "for profiler captures")
+
+    restore = commands.add_parser('restore', help="restore a theme from its backup")
+    restore.add_argument('theme', help="theme folder")
+
+    backup = commands.add_parser('backup', help="back up a theme's images and plist")
+    backup.add_argument('theme', help="theme folder")
+
+    batch_run = commands.add_parser('batch', help="colorize many themes with many parameter sets")
+    batch_run.add_argument('batch_file', help="JSON file listing themes and parameter sets")
+    batch_run.add_argument('--workers', type=int)
+    batch_run.add_argument('--status', help=f"per-job status JSON, default {batch.BATCH_STATUS_FILE} "
+                                            "next to the batch file")
+    return parser
+
+
+def job_from_args(args):
+    fields = {}
+    if args.job:
+        with open(args.job, 'r') as f:
+            fields.update(json.load(f))
+
+    for name, value in vars(args).items():
+        if name in ('command', 'job', 'theme') or value is None:
+            continue
+        fields[name] = value
+    fields['input_dir'] = args.theme
+
+    if 'color' not in fields:
+        raise ValueError("a color is required (--color or the job file)")
+    return ThemeJob(**fields)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    reporter = ConsoleReporter()
+    signal.signal(signal.SIGINT, reporter.handle_interrupt)
+
+    try:
+        if args.command == 'process':
+            job = job_from_args(args)
+            if not job.input_dir.exists():
+                raise ValueError(f"theme folder not found: {job.input_dir}")
+            if not job.renders_in_process:
+                # Decoded sources are only worth keeping where files render
+                get_asset_cache().set_budget(0)
+            rendered = engine.process_theme(job, reporter)
+            if job.png_encoding == 'optimize' and rendered:
+                engine.optimize_theme_outputs(rendered, job.workers, reporter)
+            print(f"Theme written to {job.process_folder}")
+        elif args.command == 'restore':
+            engine.restore_theme(args.theme, reporter)
+        elif args.command == 'backup':
+            engine.create_backup(Path(args.theme))
+        elif args.command == 'batch':
+            jobs = batch.load_batch_file(args.batch_file)
+            # Every file of a batch renders on its pool workers
+            get_asset_cache().set_budget(0)
+            status_path = args.status or Path(args.batch_file).with_name(batch.BATCH_STATUS_FILE)
+            status = batch.run_batch(jobs, args.workers, status_path, reporter)
+            print(f"Status written to {status_path}")
+            if status.counts().get('failed'):
+                return 1
+    except ProcessingCancelled:
+        print("Cancelled", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""Batch runs of many themes x parameter sets on one shared process pool.
+
+A batch file is JSON:
+
+    {
+      "base_path": "/Library/GlowThemes",
+      "themes": ["Sequoia", "Tahoe"],          (or "*" for every theme)
+      "defaults": {"create_new": true, "workers": 8},
+      "parameter_sets": [
+        {"color": "#ff3469", "intensity": 0.5},
+        {"color": "#3a7bd5", "intensity": 0.4, "saturation": 1.2}
+      ]
+    }
+
+Each parameter set is merged over the defaults into a ThemeJob for every
+theme.
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+from core import engine
+from core.engine import ThemeJob, ProcessingCancelled, Reporter, DEFAULT_THEMES_PATH, PNG_ENCODINGS
+from utils.parallel import create_pool, submit_variant_jobs, new_run_stats, add_run_result
+from utils.render_cache import RenderCache
+from utils.decoded_store import DecodedAssetStore
+
+BATCH_STATUS_FILE = 'batch_status.json'
+
+
+def find_themes(base_path):
+    """Source themes under base_path, skipping themes made by this tool"""
+    return sorted(item for item in Path(base_path).iterdir()
+                  if item.is_dir() and '-colorized#' not in item.name)
+
+
+def load_batch_file(path):
+    """Expand a batch file into a list of ThemeJobs"""
+    with open(path, 'r') as f:
+        spec = json.load(f)
+
+    base_path = Path(spec.get('base_path', DEFAULT_THEMES_PATH))
+    themes = spec.get('themes', '*')
+    if themes == '*':
+        theme_dirs = find_themes(base_path)
+    else:
+        theme_dirs = [base_path / theme for theme in themes]
+
+    defaults = spec.get('defaults', {})
+    for params in [defaults] + spec['parameter_sets']:
+        if params.get('png_encoding', 'default') not in PNG_ENCODINGS:
+            raise ValueError(f"png_encoding must be one of {', '.join(PNG_ENCODINGS)}, "
+                             f"not {params['png_encoding']!r}")
+    return [ThemeJob(input_dir=theme_dir, **dict(defaults, **params))
+            for theme_dir in theme_dirs
+            for params in spec['parameter_sets']]
+
+
+def split_waves(jobs):
+    """Group job indexes so no job in a group writes a folder another reads"""
+    waves = []
+    for i, job in enumerate(jobs):
+        writes = {str(job.process_folder)}
+        touches = set(job.theme_keys)
+        for wave in waves:
+            if not (writes & wave['touches'] or touches & wave['writes']):
+                break
+        else:
+            wave = {'jobs': [], 'writes': set(), 'touches': set()}
+            waves.append(wave)
+        wave['jobs'].append(i)
+        wave['writes'] |= writes
+        wave['touches'] |= touches
+    return [wave['jobs'] for wave in waves]
+
+
+class BatchStatus:
+    """Per-job status of a batch, rewritten atomically on every change"""
+
+    def __init__(self, jobs, path=None):
+        self.path = Path(path) if path else None
+        self.entries = [{
+            'theme': str(job.input_dir),
+            'output': str(job.process_folder),
+            'color': job.color,
+            'intensity': job.intensity,
+            'saturation': job.saturation,
+            'brightness': job.brightness,
+            'status': 'pending',
+            'error': None,
+            'files': 0,
+            'seconds': None,
+        } for job in jobs]
+        self._started = {}
+        self.save()
+
+    def update(self, i, status, **fields):
+        entry = self.entries[i]
+        entry['status'] = status
+        entry.update(fields)
+        if status == 'running':
+            self._started[i] = time.perf_counter()
+        elif i in self._started:
+            entry['seconds'] = round(time.perf_counter() - self._started.pop(i), 3)
+        self.save()
+
+    def counts(self):
+        counts = {}
+        for entry in self.entries:
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+        return counts
+
+    def save(self):
+        if self.path is None:
+            return
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'jobs': self.entries, 'counts': self.counts()}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def run_batch(jobs, workers=None, status_path=None, reporter=None):
+    """Run every job, sharing one process pool between all their files.
+
+    Each wave's jobs are planned (backup, copy, manifest check) in the
+    parent, then every source file is rendered once for all the jobs that
+    need it. A job that fails is rolled back and marked failed; the batch
+    carries on. A job that would write the same folder as an earlier one is
+    failed without running, so it can't replace or roll back that job's
+    output. Returns the BatchStatus. workers defaults to the largest of the
+    jobs' own.
+    """
+    reporter = reporter or Reporter()
+    status = BatchStatus(jobs, status_path)
+    refused = refuse_shared_outputs(jobs, status)
+    if workers is None:
+        workers = max((job.workers for job in jobs if job.workers), default=None)
+
+    budgets = [job.render_cache_mb for job in jobs if job.render_cache_mb > 0]
+    render_cache = RenderCache(max_bytes=max(budgets) * 1024 * 1024) if budgets else None
+
+    total_files = 0
+    done_files = 0
+    created_folders = set()     # jobs whose new theme folder didn't exist before them
+    with create_pool(workers) as executor:
+        for wave in split_waves(jobs):
+            running = []
+            futures = []
+            try:
+                for i in wave:
+                    reporter.check_cancelled()
+                    if i in refused:
+                        continue
+                    job = jobs[i]
+                    if job.create_new and not job.output_folder.exists():
+                        created_folders.add(i)
+                    status.update(i, 'running')
+                    reporter.set_stage(f"Planning {job.input_dir.name} ({job.color})")
+                    try:
+                        plan = engine.plan_theme_files(job, render_cache=render_cache)
+                    except ProcessingCancelled:
+                        raise
+                    except Exception as e:
+                        fail_job(job, i, e, status, i in created_folders)
+                        continue
+                    total_files += len(plan['pending'])
+                    running.append((i, plan))
+
+                # Each source renders once for every job in the wave that needs it
+                groups = group_variants(running)
+                futures = submit_variant_jobs(executor, groups, render_cache)
+                reporter.set_stage(f"Colorizing {len(groups)} files for {len(running)} themes")
+                stats = {i: new_run_stats() for i, _ in running}
+                plans = dict(running)
+                errors = {}
+                for group, future in zip(groups, futures):
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        for i in group['jobs']:
+                            errors.setdefault(i, e)
+                    else:
+                        for i, file_job, result in zip(group['jobs'], group['file_jobs'], results):
+                            add_run_result(stats[i], result, render_cache)
+                            engine.record_file_result(plans[i], file_job, result)
+                    done_files += len(group['jobs'])
+                    reporter.set_progress(done_files, total_files)
+                    reporter.check_cancelled()
+
+                for i, plan in running:
+                    job = jobs[i]
+                    try:
+                        if i in errors:
+                            raise errors[i]
+                        rendered = engine.finish_theme_files(plan)
+                        engine.process_plist_file(job)
+                    except ProcessingCancelled:
+                        raise
+                    except Exception as e:
+                        fail_job(job, i, e, status, i in created_folders)
+                        continue
+                    status.update(i, 'done', files=stats[i]['files'])
+                    if job.png_encoding == 'optimize' and rendered:
+                        # The job stands either way; a file is only replaced once smaller
+                        try:
+                            engine.optimize_theme_outputs(rendered, workers, reporter)
+                        except ProcessingCancelled:
+                            raise
+                        except Exception as e:
+                            print(f"Error optimizing {job.input_dir.name} ({job.color}): {e}")
+
+            except ProcessingCancelled:
+                for future in futures:
+                    future.cancel()
+                executor.shutdown(wait=True, cancel_futures=True)
+                for i, entry in enumerate(status.entries):
+                    if entry['status'] == 'running':
+                        engine.rollback_theme(jobs[i], i in created_folders)
+                        status.update(i, 'cancelled')
+                raise
+
+    if render_cache is not None:
+        render_cache.evict()
+    for job in jobs:
+        if job.decoded_cache_mb > 0:
+            DecodedAssetStore(max_bytes=job.decoded_cache_mb * 1024 * 1024).evict()
+            break
+    counts = status.counts()
+    print(f"Batch finished: {counts.get('done', 0)} done, {counts.get('failed', 0)} failed")
+    return status
+
+
+def group_variants(running):
+    """Group the pending files of planned jobs by source file and content.
+
+    Returns one group per source with the colorize arguments of every job
+    that renders it, in the form submit_variant_jobs takes; group['jobs']
+    and group['file_jobs'] list the owning job and file job of each variant.
+    """
+    groups = {}
+    for i, plan in running:
+        options = {key: value for key, value in plan['options'].items()
+                   if key not in ('input_dir', 'decoded_store')}
+        for file_job, *_ in plan['pending']:
+            key = (str(file_job['file_path']), file_job['source_hash'])
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {
+                    'file_path': file_job['file_path'],
+                    'source_hash': file_job['source_hash'],
+                    'palette_index': plan['palette_index'],
+                    'decoded_store': plan['options'].get('decoded_store'),
+                    'variants': [],
+                    'jobs': [],
+                    'file_jobs': [],
+                }
+            kwargs = dict(options, **{key: value for key, value in file_job.items()
+                                      if key not in ('file_path', 'source_hash', 'cache_key', 'alpha_box')})
+            group['variants'].append((file_job['cache_key'], kwargs))
+            group['jobs'].append(i)
+            group['file_jobs'].append(file_job)
+    return list(groups.values())
+
+
+def refuse_shared_outputs(jobs, status):
+    """Mark failed every job whose output folder an earlier job writes.
+    Returns their indexes"""
+    writers = {}
+    refused = set()
+    for i, job in enumerate(jobs):
+        first = writers.setdefault(str(job.process_folder), i)
+        if first != i:
+            error = f"writes the same folder as job {first + 1}: {job.process_folder}"
+            print(f"Skipping {job.input_dir.name} ({job.color}): {error}")
+            status.update(i, 'failed', error=error)
+            refused.add(i)
+    return refused
+
+
+def fail_job(job, i, error, status, created_folder=False):
+    print(f"Error processing {job.input_dir.name} ({job.color}): {error}")
+    try:
+        engine.rollback_theme(job, created_folder)
+    except Exception as e:
+        print(f"Error rolling back {job.input_dir.name}: {e}")
+    status.update(i, 'failed', error=str(error))
@@ -1,45 +1,52 @@
 import os
-import shutil
 import json
-import plistlib
+import threading
 from pathlib import Path
 from collections import Counter
 from PyQt5.QtWidgets import QColorDialog
-from utils.color_utils import hex_to_rgb, adjust_color_hsv
 from widgets.color_variations_widget import ColorVariationsWidget
 
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLabel, QComboBox, QSlider, QDoubleSpinBox,
                              QCheckBox, QFileDialog, QMessageBox, QGroupBox, QProgressBar,
                              QListWidget, QLineEdit, QGridLayout, QTabWidget, QSpinBox)
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThread
 from PyQt5.QtGui import QColor
 
 from widgets.drag_drop_label import DragDropLabel
 from widgets.color_profile_widget import ColorProfileWidget
 from widgets.pattern_generator_widget import PatternGeneratorWidget
 from widgets.plist_settings_widget import PlistSettingsWidget
-from utils.image_processing import colorize_enhanced
-from utils.color_utils import hex_to_rgb
-from utils.file_utils import get_all_image_files, get_top_level_files
+from widgets.theme_preview_widget import ThemePreviewWidget
+from utils.parallel import default_worker_count, create_pool, DEFAULT_READ_AHEAD, DEFAULT_WRITE_BEHIND
+from utils.render_cache import DEFAULT_CACHE_BYTES
+from utils.decoded_store import (DecodedAssetStore, DEFAULT_DECODED_BYTES, preload_sources,
+                                 store_decoded_sources)
+from utils.asset_cache import get_asset_cache, DEFAULT_ASSET_CACHE_BYTES
+from utils.file_utils import get_top_level_files
+from utils.profiling import profile_root
 
 from widgets.manual_color_adjustment_widget import ManualColorAdjustmentWidget
-import colorsys
 
 from widgets.plist_colors_widget import PlistColorsWidget
+from core.theme_worker import ThemeWorker
+from core import engine
+from core.engine import ThemeJob
 
 
-
-SUPPORTED = ['.png', '.jpg', '.jpeg']
 CONFIG_FILE = 'colorizer_config.json'
 
 class ColorizerApp(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.base_path = Path("/Library/GlowThemes")
+        self.base_path = engine.DEFAULT_THEMES_PATH
         self.current_theme = None
         self.extracted_colors = []
         self.current_config = {}
+        self.running_jobs = {}
+        self.worker_pool = None
+        self.worker_pool_key = None
+        self.preload_generation = 0
         self.load_config()
         self.setup_ui()
 
@@ -122,6 +129,23 @@ class ColorizerApp(QMainWindow):
         self.setup_plist_colors_tab(plist_colors_tab)
         self.tab_widget.addTab(plist_colors_tab, "Plist Colors")
 
+        # Any change to the color settings redraws the preview
+        self.color_input.textChanged.connect(self.refresh_preview)
+        self.intensity_slider.valueChanged.connect(self.refresh_preview)
+        self.saturation_slider.valueChanged.connect(self.refresh_preview)
+        self.brightness_slider.valueChanged.connect(self.refresh_preview)
+        for checkbox in (self.preserve_transparency, self.preserve_whites, self.preserve_blacks):
+            checkbox.stateChanged.connect(self.refresh_preview)
+        self.white_threshold.valueChanged.connect(self.refresh_preview)
+        self.black_threshold.valueChanged.connect(self.refresh_preview)
+        self.preview_widget.set_theme(self.get_selected_theme(), self.get_decoded_store())
+        self.refresh_preview()
+
+        # Current stage of the running job (outside tabs)
+        self.stage_label = QLabel("")
+        self.stage_label.setStyleSheet("color: #666;")
+        main_layout.addWidget(self.stage_label)
+
         # Progress bar (outside tabs)
         self.progress_bar = QProgressBar()
         self.progress_bar.setFixedHeight(20)
@@ -147,6 +171,12 @@ class ColorizerApp(QMainWindow):
         self.load_last_btn.clicked.connect(self.load_last_config)
         button_layout.addWidget(self.load_last_btn)
 
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setFixedHeight(40)
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_jobs)
+        button_layout.addWidget(self.cancel_btn)
+
         main_layout.addLayout(button_layout)
 
     def setup_main_tab(self, parent):
@@ -279,6 +309,16 @@ class ColorizerApp(QMainWindow):
 
         layout.addWidget(adjustments_group)
 
+        # Live preview of key assets, rendered in memory
+        preview_group = QGroupBox("Preview")
+        preview_group.setStyleSheet("QGroupBox { font-weight: bold; }")
+        preview_layout = QVBoxLayout(preview_group)
+
+        self.preview_widget = ThemePreviewWidget()
+        preview_layout.addWidget(self.preview_widget)
+
+        layout.addWidget(preview_group)
+
         # Color Variations
         variations_group = QGroupBox("Color Variations")
         variations_layout = QVBoxLayout(variations_group)
@@ -375,6 +415,107 @@ class ColorizerApp(QMainWindow):
         self.preserve_blacks.setChecked(True)
         processing_layout.addWidget(self.preserve_blacks)
 
+        self.use_palette_index = QCheckBox("Recolor few-color files through a palette index")
+        self.use_palette_index.setChecked(False)
+        processing_layout.addWidget(self.use_palette_index)
+
+        self.incremental_processing = QCheckBox("Only re-render files whose inputs changed")
+        self.incremental_processing.setChecked(True)
+        processing_layout.addWidget(self.incremental_processing)
+
+        derive_layout = QHBoxLayout()
+        self.derive_1x = QCheckBox("Make 1x images from @2x, max difference:")
+        self.derive_1x.setToolTip("Downsample each @2x render instead of colorizing its 1x file; "
+                                  "files that differ more from a direct render are colorized as usual")
+        derive_layout.addWidget(self.derive_1x)
+        self.derive_1x_tolerance = QDoubleSpinBox()
+        self.derive_1x_tolerance.setRange(0.0, 32.0)
+        self.derive_1x_tolerance.setSingleStep(0.5)
+        self.derive_1x_tolerance.setValue(2.0)
+        derive_layout.addWidget(self.derive_1x_tolerance)
+        derive_layout.addStretch()
+        processing_layout.addLayout(derive_layout)
+
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel("Worker Processes:"))
+        self.worker_count = QSpinBox()
+        self.worker_count.setRange(1, default_worker_count() * 2)
+        self.worker_count.setValue(default_worker_count())
+        workers_layout.addWidget(self.worker_count)
+        workers_layout.addStretch()
+        processing_layout.addLayout(workers_layout)
+
+        pipeline_layout = QHBoxLayout()
+        self.pipeline_checkbox = QCheckBox("Pipeline disk reads and writes, queue depths:")
+        self.pipeline_checkbox.setToolTip("Read and write files on their own threads while others "
+                                          "render; helps with themes on slow or external disks")
+        pipeline_layout.addWidget(self.pipeline_checkbox)
+        self.read_ahead = QSpinBox()
+        self.read_ahead.setRange(1, 256)
+        self.read_ahead.setValue(DEFAULT_READ_AHEAD)
+        self.read_ahead.setPrefix("read ")
+        pipeline_layout.addWidget(self.read_ahead)
+        self.write_behind = QSpinBox()
+        self.write_behind.setRange(1, 256)
+        self.write_behind.setValue(DEFAULT_WRITE_BEHIND)
+        self.write_behind.setPrefix("write ")
+        pipeline_layout.addWidget(self.write_behind)
+        pipeline_layout.addStretch()
+        processing_layout.addLayout(pipeline_layout)
+
+        render_cache_layout = QHBoxLayout()
+        render_cache_layout.addWidget(QLabel("Render Cache Size (MB, 0 = off):"))
+        self.render_cache_size = QSpinBox()
+        self.render_cache_size.setRange(0, 64 * 1024)
+        self.render_cache_size.setValue(DEFAULT_CACHE_BYTES // (1024 * 1024))
+        render_cache_layout.addWidget(self.render_cache_size)
+        render_cache_layout.addStretch()
+        processing_layout.addLayout(render_cache_layout)
+
+        decoded_cache_layout = QHBoxLayout()
+        decoded_cache_layout.addWidget(QLabel("Decoded Image Cache Size (MB, 0 = off):"))
+        self.decoded_cache_size = QSpinBox()
+        self.decoded_cache_size.setRange(0, 64 * 1024)
+        self.decoded_cache_size.setValue(DEFAULT_DECODED_BYTES // (1024 * 1024))
+        decoded_cache_layout.addWidget(self.decoded_cache_size)
+        decoded_cache_layout.addStretch()
+        processing_layout.addLayout(decoded_cache_layout)
+
+        asset_cache_layout = QHBoxLayout()
+        asset_cache_layout.addWidget(QLabel("In-Memory Image Cache (MB, 0 = off):"))
+        self.asset_cache_size = QSpinBox()
+        self.asset_cache_size.setRange(0, 64 * 1024)
+        self.asset_cache_size.setValue(DEFAULT_ASSET_CACHE_BYTES // (1024 * 1024))
+        self.asset_cache_size.valueChanged.connect(self.update_asset_budget)
+        self.worker_count.valueChanged.connect(self.update_asset_budget)
+        self.pipeline_checkbox.toggled.connect(self.update_asset_budget)
+        self.update_asset_budget()
+        asset_cache_layout.addWidget(self.asset_cache_size)
+        asset_cache_layout.addStretch()
+        processing_layout.addLayout(asset_cache_layout)
+
+        encoding_layout = QHBoxLayout()
+        encoding_layout.addWidget(QLabel("PNG Encoding:"))
+        self.png_encoding_combo = QComboBox()
+        self.png_encoding_combo.addItem("Default", 'default')
+        self.png_encoding_combo.addItem("Fast", 'fast')
+        self.png_encoding_combo.addItem("Fast, then optimize size in background", 'optimize')
+        encoding_layout.addWidget(self.png_encoding_combo)
+        encoding_layout.addStretch()
+        processing_layout.addLayout(encoding_layout)
+
+        profile_layout = QHBoxLayout()
+        profile_layout.addWidget(QLabel("Profiling:"))
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItem("Off", '')
+        self.profile_combo.addItem("Stage timings", 'spans')
+        self.profile_combo.addItem("Stage timings + cProfile (single process)", 'cprofile')
+        self.profile_combo.addItem("Stage timings + memory (tracemalloc)", 'tracemalloc')
+        self.profile_combo.setToolTip(f"Reports are saved in {profile_root()}")
+        profile_layout.addWidget(self.profile_combo)
+        profile_layout.addStretch()
+        processing_layout.addLayout(profile_layout)
+
         layout.addWidget(processing_group)
 
         # Threshold settings
@@ -507,6 +648,9 @@ class ColorizerApp(QMainWindow):
                 else:
                     self.theme_info_label.setText("No previous configuration found")
 
+                self.preview_widget.set_theme(theme_path, self.get_decoded_store())
+                self.preload_theme_assets(theme_path)
+
                 # Update plist colors tab if it's visible
                 self.update_plist_colors_tab_status()
 
@@ -650,6 +794,23 @@ class ColorizerApp(QMainWindow):
 
         self.process_theme()
 
+    def refresh_preview(self, *args):
+        """Re-render the live preview with the current color settings"""
+        color = self.color_input.text().strip()
+        if len(color.lstrip('#')) not in (3, 6):
+            return  # Still being typed
+        self.preview_widget.update_preview({
+            'color': color,
+            'intensity': self.intensity_spin.value(),
+            'saturation': self.saturation_slider.value() / 100.0,
+            'brightness': self.brightness_slider.value() / 100.0,
+            'preserve_transparency': self.preserve_transparency.isChecked(),
+            'preserve_whites': self.preserve_whites.isChecked(),
+            'preserve_blacks': self.preserve_blacks.isChecked(),
+            'white_threshold': self.white_threshold.value(),
+            'black_threshold': self.black_threshold.value(),
+        })
+
     def get_current_theme_path(self):
         """Get the path of the currently selected theme"""
         return self.get_selected_theme()
@@ -674,42 +835,30 @@ class ColorizerApp(QMainWindow):
                 QMessageBox.warning(self, "Error", "Selected theme directory doesn't exist")
                 return
 
-            color = self.color_input.text().strip()
-            if not color.startswith('#'):
-                color = '#' + color
-
-            intensity = self.intensity_spin.value()
-            saturation = self.saturation_slider.value() / 100.0
-            brightness = self.brightness_slider.value() / 100.0
-            create_new = self.create_new_checkbox.isChecked()
-            tint_checkboxes = self.tint_checkboxes.isChecked()
-            tint_windowframes = self.tint_windowframes.isChecked()
-            preserve_transparency = self.preserve_transparency.isChecked()
-            preserve_whites = self.preserve_whites.isChecked()
-            preserve_blacks = self.preserve_blacks.isChecked()
-            white_threshold = self.white_threshold.value()
-            black_threshold = self.black_threshold.value()
+            # Read every widget here, on the GUI thread; the job only sees this
+            job = self.collect_process_settings(input_dir)
+            if self.is_theme_busy(job.theme_keys):
+                return
 
             self.progress_bar.setValue(0)
 
             # Save configuration
-            self.save_config(str(input_dir), color, intensity, saturation, brightness)
-
-            # Process the theme
-            self.process_theme_files(
-                input_dir, color, intensity, saturation, brightness,
-                create_new, tint_checkboxes, tint_windowframes,
-                preserve_transparency, preserve_whites, preserve_blacks,
-                white_threshold, black_threshold
-            )
+            self.save_config(str(input_dir), job.color, job.intensity,
+                             job.saturation, job.brightness)
+
+            # Pipelined runs render on threads in this process instead
+            executor = None if job.pipeline else self.get_worker_pool(job.workers)
 
-            # Process the plist file
-            self.process_plist_file(input_dir, color, intensity, saturation, brightness, create_new)
+            def task(worker):
+                rendered = engine.process_theme(job, worker, executor)
 
-            # Update history
-            self.update_history_list()
+                # Shrink the fast-encoded files once the theme is usable
+                if job.png_encoding == 'optimize' and rendered:
+                    worker.follow_up = lambda follow_up: engine.optimize_theme_outputs(
+                        rendered, job.workers, follow_up)
 
-            QMessageBox.information(self, "Success", "Theme processing completed!")
+            self.start_theme_job(task, job.theme_keys, "Theme processing completed!",
+                                 "Error processing theme")
 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error processing theme: {str(e)}")
@@ -720,443 +869,225 @@ class ColorizerApp(QMainWindow):
             if not input_dir:
                 QMessageBox.warning(self, "Error", "Please select a theme first")
                 return
-            self.restore_backup_files(input_dir)
-            QMessageBox.information(self, "Success", "Backup restored successfully!")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error restoring backup: {str(e)}")
-
-    def process_theme_files(self, input_dir, color, intensity, saturation, brightness,
-                            create_new, tint_checkboxes, tint_windowframes,
-                            preserve_transparency, preserve_whites, preserve_blacks,
-                            white_threshold, black_threshold):
-        """Process theme files with enhanced parameters"""
-        try:
-            folder_name = input_dir.name
-            parent_folder = input_dir.parent
-
-            if create_new:
-                sanitized_color = color.replace('#', '').upper()
-                out_folder = parent_folder / f"{folder_name}-colorized#{sanitized_color}_{intensity:.1f}"
-                out_folder.mkdir(exist_ok=True)
-
-                # Create backup
-                self.create_backup(input_dir)
-
-                # Copy all items
-                self.copy_all_items(input_dir, out_folder, tint_checkboxes, tint_windowframes)
-
-                # Set output folder for processing
-                process_folder = out_folder
-            else:
-                # When NOT creating new theme, ensure we have a backup
-                backup_folder = input_dir / 'backup'
-                if not backup_folder.exists():
-                    self.create_backup(input_dir)
-                else:
-                    self.restore_backup_files(input_dir)
-
-                process_folder = input_dir
-
-            # Get files to process
-            files = get_top_level_files(process_folder, tint_checkboxes, tint_windowframes, SUPPORTED)
-
-            if not files:
-                QMessageBox.warning(self, "Warning", "No supported images found to process")
+            if self.is_theme_busy([str(input_dir)]):
                 return
 
-            # Apply pattern if enabled
-            pattern_path = None
-            pattern_blend = 0
-            pattern_filters = []
-
-            if hasattr(self, 'apply_pattern_checkbox') and self.apply_pattern_checkbox.isChecked():
-                if hasattr(self, 'current_pattern_path'):
-                    pattern_path = self.current_pattern_path
-                    pattern_blend = self.pattern_blend_slider.value() / 100.0
-
-                    # Get pattern filters from UI
-                    if hasattr(self.pattern_widget,
-                               'apply_mica_header') and self.pattern_widget.apply_mica_header.isChecked():
-                        pattern_filters.append('Mica: Header')
-                    if hasattr(self.pattern_widget,
-                               'apply_mica_sidebar') and self.pattern_widget.apply_mica_sidebar.isChecked():
-                        pattern_filters.append('Mica: Sidebar')
-                    if hasattr(self.pattern_widget,
-                               'apply_mica_titlebar') and self.pattern_widget.apply_mica_titlebar.isChecked():
-                        pattern_filters.append('Mica: Titlebar')
-                    if hasattr(self.pattern_widget,
-                               'apply_mica_menu') and self.pattern_widget.apply_mica_menu.isChecked():
-                        pattern_filters.append('Mica: Menu')
-                    if hasattr(self.pattern_widget,
-                               'apply_mica_window_bg') and self.pattern_widget.apply_mica_window_bg.isChecked():
-                        pattern_filters.append('Mica: WindowBackground')
-
-            # Check for color variations
-            use_variations = (hasattr(self, 'color_variations_widget') and
-                              self.color_variations_widget.enable_variations.isChecked())
-
-            variations = []
-            if use_variations:
-                variations = self.color_variations_widget.variations
-
-            total_files = len(files)
-            for i, file in enumerate(files):
-                # Determine which color to use for this file
-                file_color = color  # Default to the main selected color
-
-                if use_variations and variations:
-                    # Use different color variation for each file (cyclic)
-                    variation_index = i % len(variations)
-                    file_color = variations[variation_index]
-
-                # Check for manual color overrides
-                # The crucial change: determine final_color BEFORE calling colorize_enhanced
-                final_color_for_file = file_color
-                if hasattr(self, 'manual_colors') and file.name in self.manual_colors:
-                    final_color_for_file = self.manual_colors[file.name]
-                # Also check for relative paths used in manual_color_adjustment_widget
-                # manual_colors stores full paths like "Mica/ Header_Active_Normal_Off_Base0@2x.png"
-                # so we need to check if file.relative_to(process_folder) is in manual_colors
-                relative_file_path = file.relative_to(process_folder).as_posix()
-                if hasattr(self, 'manual_colors') and relative_file_path in self.manual_colors:
-                    final_color_for_file = self.manual_colors[relative_file_path]
-
-                # Check if pattern should be applied to this file
-                apply_pattern_to_file = False
-                if pattern_path and pattern_filters:
-                    filename = file.name
-                    # Check if filename matches any of the selected filters
-                    for pattern_filter in pattern_filters:
-                        if filename.startswith(pattern_filter.split(': ')[1]):  # Compare with just the filename part
-                            apply_pattern_to_file = True
-                            break
-
-                colorize_enhanced(
-                    file, final_color_for_file, intensity, saturation, brightness,  # Use final_color_for_file here
-                    process_folder, input_dir,
-                    preserve_transparency, preserve_whites, preserve_blacks,
-                    white_threshold, black_threshold,
-                    pattern_path if apply_pattern_to_file else None,
-                    pattern_blend if apply_pattern_to_file else 0
-                )
-                self.progress_bar.setValue(int((i + 1) / total_files * 100))
-
+            self.start_theme_job(lambda worker: engine.restore_theme(input_dir, worker),
+                                 [str(input_dir)], "Backup restored successfully!",
+                                 "Error restoring backup")
         except Exception as e:
-            raise Exception(f"Error processing theme files: {str(e)}")
+            QMessageBox.critical(self, "Error", f"Error restoring backup: {str(e)}")
 
-    def process_plist_file(self, input_dir, color, intensity, saturation, brightness, create_new):
-        """Process the settings.plist file with all available options"""
-        try:
-            if create_new:
-                folder_name = input_dir.name
-                parent_folder = input_dir.parent
-                sanitized_color = color.replace('#','').upper()
-                out_folder = parent_folder / f"{folder_name}-colorized#{sanitized_color}_{intensity:.1f}"
-                plist_path = out_folder / "settings.plist"
-            else:
-                plist_path = input_dir / "settings.plist"
+    def collect_process_settings(self, input_dir):
+        """Snapshot all processing options from the UI as an engine job"""
+        color = self.color_input.text().strip()
+        if not color.startswith('#'):
+            color = '#' + color
+
+        # Apply pattern if enabled
+        pattern_path = None
+        pattern_blend = 0
+        pattern_filters = []
+
+        if hasattr(self, 'apply_pattern_checkbox') and self.apply_pattern_checkbox.isChecked():
+            if hasattr(self, 'current_pattern_path'):
+                pattern_path = self.current_pattern_path
+                pattern_blend = self.pattern_blend_slider.value() / 100.0
+
+                # Get pattern filters from UI
+                if hasattr(self.pattern_widget,
+                           'apply_mica_header') and self.pattern_widget.apply_mica_header.isChecked():
+                    pattern_filters.append('Mica: Header')
+                if hasattr(self.pattern_widget,
+                           'apply_mica_sidebar') and self.pattern_widget.apply_mica_sidebar.isChecked():
+                    pattern_filters.append('Mica: Sidebar')
+                if hasattr(self.pattern_widget,
+                           'apply_mica_titlebar') and self.pattern_widget.apply_mica_titlebar.isChecked():
+                    pattern_filters.append('Mica: Titlebar')
+                if hasattr(self.pattern_widget,
+                           'apply_mica_menu') and self.pattern_widget.apply_mica_menu.isChecked():
+                    pattern_filters.append('Mica: Menu')
+                if hasattr(self.pattern_widget,
+                           'apply_mica_window_bg') and self.pattern_widget.apply_mica_window_bg.isChecked():
+                    pattern_filters.append('Mica: WindowBackground')
+
+        # Check for color variations
+        variations = []
+        if (hasattr(self, 'color_variations_widget') and
+                self.color_variations_widget.enable_variations.isChecked()):
+            variations = list(self.color_variations_widget.variations)
+
+        return ThemeJob(
+            input_dir=input_dir,
+            color=color,
+            intensity=self.intensity_spin.value(),
+            saturation=self.saturation_slider.value() / 100.0,
+            brightness=self.brightness_slider.value() / 100.0,
+            create_new=self.create_new_checkbox.isChecked(),
+            tint_checkboxes=self.tint_checkboxes.isChecked(),
+            tint_windowframes=self.tint_windowframes.isChecked(),
+            preserve_transparency=self.preserve_transparency.isChecked(),
+            preserve_whites=self.preserve_whites.isChecked(),
+            preserve_blacks=self.preserve_blacks.isChecked(),
+            white_threshold=self.white_threshold.value(),
+            black_threshold=self.black_threshold.value(),
+            pattern_path=pattern_path,
+            pattern_blend=pattern_blend,
+            pattern_filters=pattern_filters,
+            variations=variations,
+            manual_colors=dict(getattr(self, 'manual_colors', {})),
+            use_palette_index=self.use_palette_index.isChecked(),
+            incremental=self.incremental_processing.isChecked(),
+            derive_1x=self.derive_1x.isChecked(),
+            derive_1x_tolerance=self.derive_1x_tolerance.value(),
+            workers=self.worker_count.value(),
+            pipeline=self.pipeline_checkbox.isChecked(),
+            read_ahead=self.read_ahead.value(),
+            write_behind=self.write_behind.value(),
+            render_cache_mb=self.render_cache_size.value(),
+            decoded_cache_mb=self.decoded_cache_size.value(),
+            png_encoding=self.png_encoding_combo.currentData(),
+            profile=self.profile_combo.currentData(),
+            theme_mode=self.theme_mode_combo.currentText(),
+            plist=self.plist_widget.get_settings(),
+            plist_color_changes=dict(getattr(self, 'plist_color_changes', None) or {}),
+        )
+
+    def is_theme_busy(self, theme_keys):
+        """Warn and return True if a job is already running on one of the themes"""
+        for worker, _ in self.running_jobs.values():
+            busy = set(worker.theme_keys) & set(theme_keys)
+            if busy:
+                QMessageBox.warning(self, "Busy",
+                                    f"{Path(busy.pop()).name} is already being processed")
+                return True
+        return False
+
+    def start_theme_job(self, task, theme_keys, success_message, error_prefix):
+        """Run a theme job on a background thread"""
+        thread = QThread(self)
+        worker = ThemeWorker(task, theme_keys, success_message, error_prefix)
+        worker.moveToThread(thread)
+
+        thread.started.connect(worker.run)
+        worker.progress.connect(self.progress_bar.setValue)
+        worker.stageChanged.connect(self.stage_label.setText)
+        worker.warning.connect(self.on_job_warning)
+        worker.succeeded.connect(self.on_job_succeeded)
+        worker.failed.connect(self.on_job_failed)
+        worker.cancelled.connect(self.on_job_cancelled)
+        # Direct so quit still reaches the thread while closeEvent waits on it
+        worker.finished.connect(thread.quit, Qt.DirectConnection)
+        thread.finished.connect(self.on_job_finished)
+
+        self.running_jobs[thread] = (worker, thread)
+        self.cancel_btn.setEnabled(True)
+        thread.start()
+
+    def cancel_jobs(self):
+        """Ask every running job to stop"""
+        for worker, _ in self.running_jobs.values():
+            worker.cancel()
+        self.stage_label.setText("Cancelling...")
+
+    def on_job_warning(self, message):
+        QMessageBox.warning(self, "Warning", message)
+
+    def on_job_succeeded(self):
+        worker = self.sender()
+        self.stage_label.setText("")
+        self.update_history_list()
+        if worker.follow_up is not None:
+            self.start_theme_job(worker.follow_up, worker.theme_keys, None, worker.error_prefix)
+        if worker.success_message:
+            QMessageBox.information(self, "Success", worker.success_message)
+
+    def on_job_failed(self, message):
+        worker = self.sender()
+        self.stage_label.setText("")
+        QMessageBox.critical(self, "Error", f"{worker.error_prefix}: {message}")
+
+    def on_job_cancelled(self):
+        self.stage_label.setText("Cancelled")
+        self.progress_bar.setValue(0)
+
+    def on_job_finished(self):
+        thread = self.sender()
+        self.running_jobs.pop(thread, None)
+        thread.deleteLater()
+        self.cancel_btn.setEnabled(bool(self.running_jobs))
+
+    def closeEvent(self, event):
+        """Stop background jobs before the window goes away"""
+        self.preload_generation += 1
+        for worker, thread in list(self.running_jobs.values()):
+            worker.cancel()
+            thread.wait()
+        if self.worker_pool is not None:
+            self.worker_pool.shutdown(wait=False, cancel_futures=True)
+        super().closeEvent(event)
+
+    def get_worker_pool(self, workers):
+        """Worker processes kept for the whole session, so their decoded
+        sources carry over between runs"""
+        asset_cache_bytes = self.asset_cache_size.value() * 1024 * 1024 // max(workers, 1)
+        key = (workers, asset_cache_bytes)
+        if self.worker_pool is None or self.worker_pool_key != key:
+            if self.worker_pool is not None:
+                # Runs still using the old pool finish on it
+                self.worker_pool.shutdown(wait=False)
+            self.worker_pool = create_pool(workers, asset_cache_bytes)
+            self.worker_pool_key = key
+        return self.worker_pool
+
+    def get_decoded_store(self):
+        """Decoded image store with the Advanced tab's budget, or None when
+        it is off"""
+        if self.decoded_cache_size.value() == 0:
+            return None
+        return DecodedAssetStore(max_bytes=self.decoded_cache_size.value() * 1024 * 1024)
+
+    def renders_in_process(self):
+        """Check whether runs render on this process instead of the pool"""
+        return self.pipeline_checkbox.isChecked() or self.worker_count.value() == 1
+
+    def update_asset_budget(self, *args):
+        """Give the in-memory image budget to the processes that render:
+        this one for in-process runs, else the pool workers, which split it
+        in get_worker_pool"""
+        budget = self.asset_cache_size.value() * 1024 * 1024
+        get_asset_cache().set_budget(budget if self.renders_in_process() else 0)
+
+    def preload_theme_assets(self, theme_path):
+        """Decode the theme's sources in the background before a run.
+
+        In-process runs read them from this process's memory. Pool workers
+        can't, so for them the decoded image store they map sources from
+        is filled instead.
+        """
+        self.preload_generation += 1
+        generation = self.preload_generation
+        in_process = self.renders_in_process()
+        decoded_store = self.get_decoded_store()
+        if in_process and self.asset_cache_size.value() == 0:
+            return
+        if not in_process and decoded_store is None:
+            return
 
-            if not plist_path.exists():
-                print(f"No settings.plist found at {plist_path}")
-                return
+        backup_dir = theme_path / 'backup'
+        source_dir = backup_dir if backup_dir.exists() else theme_path
+        files = get_top_level_files(source_dir, self.tint_checkboxes.isChecked(),
+                                    self.tint_windowframes.isChecked(), engine.SUPPORTED)
 
-            # Load the plist file
-            with open(plist_path, 'rb') as f:
-                plist_data = plistlib.load(f)
-
-                # Determinar se é tema escuro
-            is_dark_theme = self.theme_mode_combo.currentText() == "Dark Theme"
-
-            # Ajustar a cor baseado no tema
-            if is_dark_theme:
-                # Para tema escuro, escurecer a cor
-                r, g, b = hex_to_rgb(color)
-                # Reduzir brilho (valor HSV) em 30% para tema escuro
-                h, s, v = colorsys.rgb_to_hsv(r / 255, g / 255, b / 255)
-                r, g, b = colorsys.hsv_to_rgb(h, s, v)
-                theme_color = f"#{int(r * 255):02x}{int(g * 255):02x}{int(b * 255):02x}"
+        def preload():
+            cancelled = lambda: generation != self.preload_generation
+            if in_process:
+                loaded = preload_sources(files, decoded_store, cancelled)
             else:
-                # Para tema claro, manter a cor original
-                theme_color = color
-
-
-            # Get all settings from UI
-            active_shadow = self.plist_widget.active_shadow_spin.value()
-            inactive_shadow = self.plist_widget.inactive_shadow_spin.value()
-            dock_reflection = self.plist_widget.dock_reflection_checkbox.isChecked()
-            dock_touches_ground = self.plist_widget.dock_touches_ground_checkbox.isChecked()
-            dock_slices = self.plist_widget.dock_slices_input.text()
-            hide_window_rim = self.plist_widget.hide_window_rim_checkbox.isChecked()
-            mini_toolbar = self.plist_widget.mini_toolbar_checkbox.isChecked()
-            patch_appearance = self.plist_widget.patch_appearance_checkbox.isChecked()
-            control_spacing = self.plist_widget.control_spacing_spin.value()
-
-            # Mica settings
-            mica_header = self.plist_widget.mica_header_checkbox.isChecked()
-            mica_sidebar = self.plist_widget.mica_sidebar_checkbox.isChecked()
-            mica_titlebar = self.plist_widget.mica_titlebar_checkbox.isChecked()
-            mica_menu = self.plist_widget.mica_menu_checkbox.isChecked()
-            mica_window_bg = self.plist_widget.mica_window_bg_checkbox.isChecked()
-
-            # Asset slice settings
-            window_frame_mask_1x = self.plist_widget.window_frame_mask_1x.text()
-            window_frame_base_1x = self.plist_widget.window_frame_base_1x.text()
-            window_frame_mask_2x = self.plist_widget.window_frame_mask_2x.text()
-            window_frame_base_2x = self.plist_widget.window_frame_base_2x.text()
-
-            # Update basic settings
-            plist_data['gWindowShadowActiveRadius'] = active_shadow
-            plist_data['gWindowShadowInactiveRadius'] = inactive_shadow
-            plist_data['gDockReflection'] = dock_reflection
-            plist_data['gDockTouchesGround'] = dock_touches_ground
-            plist_data['gDockSlices'] = dock_slices
-            plist_data['gHideWindowRim'] = hide_window_rim
-            plist_data['gMiniToolbar'] = mini_toolbar
-            plist_data['gPatchAppearance'] = patch_appearance
-            plist_data['gControlSpacing'] = control_spacing
-
-            # Atualiza configurações básicas
-            plist_data['ActiveShadow'] = active_shadow
-            plist_data['InactiveShadow'] = inactive_shadow
-            plist_data['DockReflection'] = dock_reflection
-            plist_data['DockTouchesGround'] = dock_touches_ground
-            plist_data['DockSlices'] = dock_slices
-            plist_data['HideWindowRim'] = hide_window_rim
-            plist_data['MiniToolbar'] = mini_toolbar
-            plist_data['PatchAppearance'] = patch_appearance
-            plist_data['ControlSpacing'] = control_spacing
-
-            # Atualiza opções de Mica
-            plist_data['MicaHeader'] = mica_header
-            plist_data['MicaSidebar'] = mica_sidebar
-            plist_data['MicaTitlebar'] = mica_titlebar
-            plist_data['MicaMenu'] = mica_menu
-            plist_data['MicaWindowBackground'] = mica_window_bg
-
-            # Atualiza caminhos de assets se informados
-            if window_frame_mask_1x:
-                plist_data['WindowFrameMask1x'] = window_frame_mask_1x
-            if window_frame_base_1x:
-                plist_data['WindowFrameBase1x'] = window_frame_base_1x
-            if window_frame_mask_2x:
-                plist_data['WindowFrameMask2x'] = window_frame_mask_2x
-            if window_frame_base_2x:
-                plist_data['WindowFrameBase2x'] = window_frame_base_2x
-
-            # Adiciona metadados de última cor aplicada
-            plist_data['LastColorizedColor'] = color
-            plist_data['LastColorizedIntensity'] = intensity
-            plist_data['LastColorizedSaturation'] = saturation
-            plist_data['LastColorizedBrightness'] = brightness
-
-            # Update Mica settings
-            if 'gMicaTile' not in plist_data:
-                plist_data['gMicaTile'] = {}
-
-            mica_dict = plist_data['gMicaTile']
-
-            # Header Mica
-            mica_dict['Mica: Header_Active_Normal_Off_Base0'] = mica_header
-            mica_dict['Mica: Header_Active_Normal_Off_Base0@2x'] = mica_header
-            mica_dict['Mica: Header_Inactive_Normal_Off_Base0'] = mica_header
-            mica_dict['Mica: Header_Inactive_Normal_Off_Base0@2x'] = mica_header
-            mica_dict['Mica: Header-Opaque_Active_Normal_Off_Base0'] = mica_header
-            mica_dict['Mica: Header-Opaque_Active_Normal_Off_Base0@2x'] = mica_header
-            mica_dict['Mica: Header-Opaque_Inactive_Normal_Off_Base0'] = mica_header
-            mica_dict['Mica: Header-Opaque_Inactive_Normal_Off_Base0@2x'] = mica_header
-
-            # Sidebar Mica
-            mica_dict['Mica: Sidebar_Active_Normal_Off_Base0'] = mica_sidebar
-            mica_dict['Mica: Sidebar_Active_Normal_Off_Base0@2x'] = mica_sidebar
-            mica_dict['Mica: Sidebar_Inactive_Normal_Off_Base0'] = mica_sidebar
-            mica_dict['Mica: Sidebar_Inactive_Normal_Off_Base0@2x'] = mica_sidebar
-            mica_dict['Mica: Sidebar-Opaque_Active_Normal_Off_Base0'] = mica_sidebar
-            mica_dict['Mica: Sidebar-Opaque_Active_Normal_Off_Base0@2x'] = mica_sidebar
-            mica_dict['Mica: Sidebar-Opaque_Inactive_Normal_Off_Base0'] = mica_sidebar
-            mica_dict['Mica: Sidebar-Opaque_Inactive_Normal_Off_Base0@2x'] = mica_sidebar
-
-            # Titlebar Mica
-            mica_dict['Mica: Titlebar_Active_Normal_Off_Base0'] = mica_titlebar
-            mica_dict['Mica: Titlebar_Active_Normal_Off_Base0@2x'] = mica_titlebar
-            mica_dict['Mica: Titlebar_Inactive_Normal_Off_Base0'] = mica_titlebar
-            mica_dict['Mica: Titlebar_Inactive_Normal_Off_Base0@2x'] = mica_titlebar
-            mica_dict['Mica: Titlebar-Opaque_Active_Normal_Off_Base0'] = mica_titlebar
-            mica_dict['Mica: Titlebar-Opaque_Active_Normal_Off_Base0@2x'] = mica_titlebar
-            mica_dict['Mica: Titlebar-Opaque_Inactive_Normal_Off_Base0'] = mica_titlebar
-            mica_dict['Mica: Titlebar-Opaque_Inactive_Normal_Off_Base0@2x'] = mica_titlebar
-
-            # Menu Mica
-            mica_dict['Mica: Menu_Active_Normal_Off_Base0'] = mica_menu
-            mica_dict['Mica: Menu_Active_Normal_Off_Base0@2x'] = mica_menu
-            mica_dict['Mica: Menu_Inactive_Normal_Off_Base0'] = mica_menu
-            mica_dict['Mica: Menu_Inactive_Normal_Off_Base0@2x'] = mica_menu
-            mica_dict['Mica: Menu-Opaque_Active_Normal_Off_Base0'] = mica_menu
-            mica_dict['Mica: Menu-Opaque_Active_Normal_Off_Base0@2x'] = mica_menu
-            mica_dict['Mica: Menu-Opaque_Inactive_Normal_Off_Base0'] = mica_menu
-            mica_dict['Mica: Menu-Opaque_Inactive_Normal_Off_Base0@2x'] = mica_menu
-
-            # Window Background Mica
-            mica_dict['Mica: WindowBackground_Active_Normal_Off_Base0'] = mica_window_bg
-            mica_dict['Mica: WindowBackground_Active_Normal_Off_Base0@2x'] = mica_window_bg
-            mica_dict['Mica: WindowBackground_Inactive_Normal_Off_Base0'] = mica_window_bg
-            mica_dict['Mica: WindowBackground_Inactive_Normal_Off_Base0@2x'] = mica_window_bg
-            mica_dict['Mica: WindowBackground-Opaque_Active_Normal_Off_Base0'] = mica_window_bg
-            mica_dict['Mica: WindowBackground-Opaque_Active_Normal_Off_Base0@2x'] = mica_window_bg
-            mica_dict['Mica: WindowBackground-Opaque_Inactive_Normal_Off_Base0'] = mica_window_bg
-            mica_dict['Mica: WindowBackground-Opaque_Inactive_Normal_Off_Base0@2x'] = mica_window_bg
-
-            # Update asset slice settings
-            if 'gAssetSlice' not in plist_data:
-                plist_data['gAssetSlice'] = {}
-
-            asset_dict = plist_data['gAssetSlice']
-            asset_dict['WindowFrame_WindowShapeEdges_Regular_Active_Normal_Off_Mask0'] = window_frame_mask_1x
-            asset_dict['WindowFrame_WindowShapeEdges_Regular_Active_Normal_Off_Base0'] = window_frame_base_1x
-            asset_dict['WindowFrame_WindowShapeEdges_Regular_Active_Normal_Off_Mask0@2x'] = window_frame_mask_2x
-            asset_dict['WindowFrame_WindowShapeEdges_Regular_Active_Normal_Off_Base0@2x'] = window_frame_base_2x
-            asset_dict['WindowFrame_WindowShapeEdges_Regular_Inactive_Normal_Off_Mask0'] = window_frame_mask_1x
-            asset_dict['WindowFrame_WindowShapeEdges_Regular_Inactive_Normal_Off_Base0'] = window_frame_base_1x
-            asset_dict['WindowFrame_WindowShapeEdges_Regular_Inactive_Normal_Off_Mask0@2x'] = window_frame_mask_2x
-            asset_dict['WindowFrame_WindowShapeEdges_Regular_Inactive_Normal_Off_Base0@2x'] = window_frame_base_2x
-
-            # Update color values if gColors exists
-            if 'gColors' in plist_data:
-                color_dict = plist_data['gColors']
-                r_col, g_col, b_col = hex_to_rgb(theme_color)
-
-                # Aplicar ajustes de saturação e brilho à cor base
-                r_col_adj, g_col_adj, b_col_adj = adjust_color_hsv(r_col, g_col, b_col, saturation, brightness)
-
-                for key, value in color_dict.items():
-                    if isinstance(value, str) and value.startswith('#'):
-                        # Extract original color components
-                        original_hex = value.lstrip('#')
-                        if len(original_hex) == 8:  # RGBA format
-                            r_orig = int(original_hex[0:2], 16)
-                            g_orig = int(original_hex[2:4], 16)
-                            b_orig = int(original_hex[4:6], 16)
-                            a_orig = original_hex[6:8]
-
-                            # Apply color tinting with adjusted color
-                            r_new = round(r_orig*(1-intensity) + r_col_adj*intensity)
-                            g_new = round(g_orig*(1-intensity) + g_col_adj*intensity)
-                            b_new = round(b_orig*(1-intensity) + b_col_adj*intensity)
-
-                            # Clamp values
-                            r_new = max(0, min(255, r_new))
-                            g_new = max(0, min(255, g_new))
-                            b_new = max(0, min(255, b_new))
-
-                            # Create new color value
-                            new_color = f"#{r_new:02x}{g_new:02x}{b_new:02x}{a_orig}"
-                            color_dict[key] = new_color
-
-            # Save the modified plist
-            with open(plist_path, 'wb') as f:
-                plistlib.dump(plist_data, f)
-
-            print(f"Updated settings.plist at {plist_path}")
-
-            # Apply custom color changes if any
-            if hasattr(self, 'plist_color_changes') and self.plist_color_changes:
-                for key, new_color in self.plist_color_changes.items():
-                    if key in plist_data:
-                        plist_data[key] = new_color
-                        print(f"Updated {key} to {new_color}")
-
-            # Save the modified plist
-            with open(plist_path, 'wb') as f:
-                plistlib.dump(plist_data, f)
+                loaded = store_decoded_sources(files, decoded_store, cancelled)
+            print(f"Preloaded {loaded} of {len(files)} files from {theme_path.name}")
 
-        except Exception as e:
-            print(f"Error processing plist file: {e}")
-            raise
-
-    def create_backup(self, input_dir):
-        """Create backup of all image files and plist"""
-        backup_folder = input_dir / 'backup'
-        backup_folder.mkdir(exist_ok=True)
-
-        # Get all image files
-        all_image_files = get_all_image_files(input_dir, SUPPORTED)
-
-        # Get plist file if exists
-        plist_file = input_dir / "settings.plist"
-        if plist_file.exists():
-            all_image_files.append(plist_file)
-
-        print(f"Creating backup of {len(all_image_files)} files...")
-
-        backed_up_count = 0
-        for file in all_image_files:
-            dest = backup_folder / file.name
-            if not dest.exists():
-                shutil.copy2(file, dest)
-                backed_up_count += 1
-                print(f"Backed up: {file.name}")
-
-        if backed_up_count == 0:
-            print("Backup already exists and is up to date")
-        else:
-            print(f"Backup created with {backed_up_count} files")
-
-    def copy_all_items(self, src_dir, dest_dir, tint_checkboxes=True, tint_windowframes=True):
-         """Copy all items with filtering, including plist and Mica files"""
-         for item in src_dir.iterdir():
-             if item.name == 'backup':
-                 continue
-
-             dest_path = dest_dir / item.name
-
-             if item.is_file():
-                 # Always copy plist file and Mica files
-                 if (item.name == "settings.plist" or
-                     item.name.startswith('Mica:') or
-                     'Mica' in item.name):
-                     shutil.copy2(item, dest_path)
-                     print(f"Copied: {item.name}")
-                     continue
-
-                 # Filter image files based on user preferences
-                 if item.suffix.lower() in SUPPORTED:
-                     filename_lower = item.name.lower()
-                     should_skip = False
-
-                     if not tint_checkboxes and filename_lower.startswith('checkbox'):
-                         should_skip = True
-                     if not tint_windowframes and (filename_lower.startswith('windowframe') or filename_lower.startswith('frame')):
-                         should_skip = True
-
-                     if should_skip:
-                         continue
-
-                     shutil.copy2(item, dest_path)
-                     print(f"Copied: {item.name}")
-                 else:
-                     # Copy other non-image files
-                     shutil.copy2(item, dest_path)
-                     print(f"Copied: {item.name}")
-             elif item.is_dir():
-                 shutil.copytree(item, dest_path, dirs_exist_ok=True)
-                 print(f"Copied directory: {item.name}")
-
-    def restore_backup_files(self, input_dir):
-        """Restore backup files including plist"""
-        backup_folder = input_dir / 'backup'
-        if not backup_folder.exists():
-            raise Exception("No backup found")
-
-        files = []
-        for item in backup_folder.iterdir():
-            # Include both image files and plist file
-            if (item.is_file() and
-                (item.suffix.lower() in SUPPORTED or item.name == "settings.plist")):
-                files.append(item)
-
-        for file in files:
-            dest = input_dir / file.name
-            shutil.copy2(file, dest)
-            print(f"Restored: {file.name}")
+        threading.Thread(target=preload, name="asset-preload", daemon=True).start()
 
     def on_variation_selected(self, color):
         """Handle color variation selection"""
@@ -0,0 +1,913 @@
+import colorsys
+import hashlib
+import json
+import plistlib
+import shutil
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Optional
+
+from utils.color_utils import hex_to_rgb, adjust_color_hsv
+from utils.file_utils import (get_all_image_files, get_top_level_files, CACHE_DIR_NAME, file_digest,
+                              remove_temp_files, copy_file_atomic)
+from utils.theme_manifest import ThemeManifest, RunJournal, effective_params
+from utils.palette_index import PaletteIndex
+from utils.parallel import (resolve_file_jobs, colorize_files, run_pipeline, default_worker_count,
+                            DEFAULT_READ_AHEAD, DEFAULT_WRITE_BEHIND)
+from utils.render_cache import RenderCache, render_key, DEFAULT_CACHE_BYTES
+from utils.decoded_store import DecodedAssetStore, DEFAULT_DECODED_BYTES
+from utils.png_encoder import ENCODE_MODES, optimize_pngs
+from utils.profiling import start_profiler, stop_profiler, active_profiler, span
+
+SUPPORTED = ['.png', '.jpg', '.jpeg']
+
+# Values of ThemeJob.png_encoding, named as the encoder's modes; 'optimize'
+# encodes fast, then optimize_theme_outputs recompresses the files
+PNG_ENCODINGS = tuple(ENCODE_MODES)
+
+# Where Glow Engine looks for themes
+DEFAULT_THEMES_PATH = Path("/Library/GlowThemes")
+
+# ThemeJob fields that change how a run goes, not what it writes
+RUNTIME_FIELDS = ('workers', 'pipeline', 'read_ahead', 'write_behind', 'render_cache_mb',
+                  'decoded_cache_mb', 'use_palette_index', 'incremental', 'profile')
+
+# Defaults of the Plist Settings tab
+DEFAULT_PLIST_SETTINGS = {
+    'active_shadow': 10,
+    'inactive_shadow': 8,
+    'dock_reflection': True,
+    'dock_touches_ground': True,
+    'dock_slices': "{{0.25, 0.05},{0.5, 0.95}}",
+    'hide_window_rim': False,
+    'mini_toolbar': False,
+    'patch_appearance': True,
+    'control_spacing': 7,
+    'mica_header': True,
+    'mica_sidebar': True,
+    'mica_titlebar': True,
+    'mica_menu': True,
+    'mica_window_bg': True,
+    'window_frame_mask_1x': "{16,16,0,0}",
+    'window_frame_base_1x': "{16,48,0,0}",
+    'window_frame_mask_2x': "{32,32,0,0}",
+    'window_frame_base_2x': "{32,96,0,0}",
+}
+
+
+class ProcessingCancelled(Exception):
+    """Raised inside a theme job once the user has asked to cancel it"""
+
+
+class Reporter:
+    """Receives progress from the engine. The base class ignores everything"""
+
+    def set_stage(self, stage):
+        pass
+
+    def set_progress(self, done, total):
+        pass
+
+    def warn(self, message):
+        pass
+
+    def check_cancelled(self):
+        """Raise ProcessingCancelled to stop the job at a safe point"""
+
+
+@dataclass
+class ThemeJob:
+    """Every option of a theme run, independent of any UI.
+
+    Defaults match the initial state of the GUI controls.
+    """
+    input_dir: Path
+    color: str
+    intensity: float = 0.5
+    saturation: float = 1.0
+    brightness: float = 1.0
+    create_new: bool = True
+    tint_checkboxes: bool = True
+    tint_windowframes: bool = True
+    preserve_transparency: bool = True
+    preserve_whites: bool = True
+    preserve_blacks: bool = True
+    white_threshold: int = 254
+    black_threshold: int = 30
+    pattern_path: Optional[str] = None
+    pattern_blend: float = 0
+    pattern_filters: list = field(default_factory=list)
+    variations: list = field(default_factory=list)
+    manual_colors: dict = field(default_factory=dict)
+    use_palette_index: bool = False
+    incremental: bool = True
+    derive_1x: bool = False
+    derive_1x_tolerance: float = 2.0
+    workers: Optional[int] = None
+    pipeline: bool = False
+    read_ahead: int = DEFAULT_READ_AHEAD
+    write_behind: int = DEFAULT_WRITE_BEHIND
+    render_cache_mb: int = DEFAULT_CACHE_BYTES // (1024 * 1024)
+    decoded_cache_mb: int = DEFAULT_DECODED_BYTES // (1024 * 1024)
+    png_encoding: str = 'default'
+    profile: str = ''
+    theme_mode: str = "Light Theme"
+    plist: dict = field(default_factory=lambda: dict(DEFAULT_PLIST_SETTINGS))
+    plist_color_changes: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.input_dir = Path(self.input_dir)
+        if not self.color.startswith('#'):
+            self.color = '#' + self.color
+
+    @property
+    def output_folder(self):
+        """Folder of the new theme when create_new is set"""
+        return get_output_folder(self.input_dir, self.color, self.intensity)
+
+    @property
+    def process_folder(self):
+        """Folder whose files are rewritten by this job"""
+        return self.output_folder if self.create_new else self.input_dir
+
+    @property
+    def theme_keys(self):
+        """Theme folders this job touches, used to refuse overlapping jobs"""
+        keys = [str(self.input_dir)]
+        if self.create_new:
+            keys.append(str(self.output_folder))
+        return keys
+
+    @property
+    def renders_in_process(self):
+        """Whether files render on this process rather than on pool workers"""
+        return self.pipeline or (self.workers or default_worker_count()) == 1
+
+    def to_dict(self):
+        data = asdict(self)
+        data['input_dir'] = str(self.input_dir)
+        return data
+
+    def settings_key(self):
+        """Hash of the options that decide the output files, so a killed run
+        is only resumed by the same job"""
+        data = self.to_dict()
+        for name in RUNTIME_FIELDS:
+            data.pop(name, None)
+        encoded = json.dumps(data, sort_keys=True, default=str).encode()
+        return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def get_output_folder(input_dir, color, intensity):
+    """Folder used for a new theme created from input_dir"""
+    sanitized_color = color.replace('#', '').upper()
+    return input_dir.parent / f"{input_dir.name}-colorized#{sanitized_color}_{intensity:.1f}"
+
+
+def process_theme(job, reporter=None, executor=None):
+    """Run a full theme job: backup, copy, colorize and plist.
+
+    A cancelled job is rolled back before ProcessingCancelled propagates.
+    Returns the output files rendered by this run. When job.profile or the
+    GLOW_COLORIZER_PROFILE environment variable asks for it, timing spans
+    and profiler captures are written to a run folder. executor is an
+    optional long-lived pool from create_pool to render on.
+    """
+    reporter = reporter or Reporter()
+    created_folder = job.create_new and not job.output_folder.exists()
+    profiler = start_profiler(f"{job.input_dir.name}{job.color}", job.profile)
+    try:
+        with span('theme', theme=job.input_dir.name, color=job.color):
+            # Process the theme
+            rendered = process_theme_files(job, reporter, executor)
+            reporter.check_cancelled()
+
+            # Process the plist file
+            reporter.set_stage("Updating settings.plist")
+            with span('plist'):
+                process_plist_file(job)
+        return rendered
+    except ProcessingCancelled:
+        reporter.set_stage("Cancelling")
+        rollback_theme(job, created_folder)
+        raise
+    finally:
+        if profiler is not None:
+            print(f"Profile written to {stop_profiler()}")
+
+
+def restore_theme(input_dir, reporter=None):
+    """Put every backed up file of a theme back in place"""
+    reporter = reporter or Reporter()
+    reporter.set_stage("Restoring backup")
+    restore_backup_files(Path(input_dir))
+
+
+def rollback_theme(job, created_folder=False):
+    """Put a theme back in a consistent state after a cancelled run.
+
+    A new theme folder is only deleted when created_folder says this run
+    made it. A folder kept from an earlier run holds its old outputs and
+    the files this run finished, which are recorded in its manifest.
+    """
+    if job.create_new:
+        if created_folder:
+            # The new theme is only usable once fully processed
+            shutil.rmtree(job.output_folder, ignore_errors=True)
+        elif job.output_folder.exists():
+            settle_journal(job.output_folder)
+    elif (job.input_dir / 'backup').exists():
+        restore_backup_files(job.input_dir)
+        RunJournal.for_theme(job.input_dir).discard()
+
+
+def settle_journal(theme_dir):
+    """Record the outputs a stopped run finished in the theme's manifest
+    and drop its journal"""
+    journal = RunJournal.for_theme(theme_dir)
+    _, outputs = journal.read()
+    if outputs:
+        manifest = ThemeManifest.load(theme_dir)
+        manifest.outputs.update(outputs)
+        manifest.save()
+    journal.discard()
+
+
+def process_theme_files(job, reporter=None, executor=None):
+    """Process theme files with enhanced parameters"""
+    reporter = reporter or Reporter()
+    try:
+        plan = plan_theme_files(job, reporter)
+        pending = plan['pending']
+        if pending:
+            workers = job.workers
+            profiler = active_profiler()
+            if profiler is not None and 'cprofile' in profiler.captures:
+                # cProfile only sees this process, so render files here
+                workers = 1
+
+            def file_callback(file_job, result):
+                record_file_result(plan, file_job, result)
+                if profiler is not None:
+                    record_file_span(file_job, result)
+
+            # Colorize across a pool of worker processes
+            reporter.set_stage(f"Colorizing {len(pending)} of {plan['file_count']} files")
+            with span('colorize', files=len(pending), workers=workers):
+                if job.pipeline:
+                    # Threads in this process overlap reads, pixel work and writes
+                    stats = run_pipeline([file_job for file_job, *_ in pending], plan['options'],
+                                         workers, reporter.set_progress, plan['palette_index'],
+                                         reporter.check_cancelled, plan['render_cache'],
+                                         file_callback, job.read_ahead, job.write_behind)
+                    print("Pipeline: " + ", ".join(
+                        f"{name} {stage['utilization']:.0%} busy, {stage['starved']:.0%} waiting, "
+                        f"{stage['blocked']:.0%} blocked ({stage['threads']} threads)"
+                        for name, stage in stats['stages'].items()))
+                else:
+                    stats = colorize_files([file_job for file_job, *_ in pending], plan['options'],
+                                           workers, reporter.set_progress, plan['palette_index'],
+                                           reporter.check_cancelled, plan['render_cache'],
+                                           file_callback, None if workers == 1 else executor)
+            print(f"Encoded {stats['files'] - stats['cache_hits']} files in "
+                  f"{stats['encode_seconds']:.2f}s, "
+                  f"{stats['bytes_written'] / (1024 * 1024):.1f} MB written")
+
+            render_cache = plan['render_cache']
+            if render_cache is not None:
+                evicted = render_cache.evict()
+                print(f"Render cache: {render_cache.hits} hits, {render_cache.misses} misses, "
+                      f"{evicted} evicted")
+            decoded_store = plan['options'].get('decoded_store')
+            if decoded_store is not None:
+                decoded_store.evict()
+        else:
+            reporter.set_progress(1, 1)
+        with span('manifest'):
+            return finish_theme_files(plan)
+
+    except ProcessingCancelled:
+        raise
+    except Exception as e:
+        raise Exception(f"Error processing theme files: {str(e)}")
+
+
+def record_file_span(file_job, result):
+    """colorize_files callback adding a span per rendered file"""
+    hit, encode_seconds, bytes_written, seconds, _ = result
+    active_profiler().add_span('file', seconds, file=file_job['file_path'].name, cache_hit=hit,
+                               encode_seconds=round(encode_seconds, 6), bytes=bytes_written)
+
+
+def record_alpha_box(plan, file_job, result):
+    """Keep the opaque box a render measured for its source, so the next
+    run can pass it back instead of measuring again"""
+    alpha_box = result[4]
+    if alpha_box is not None and file_job.get('alpha_box') is None:
+        plan['alpha_boxes'][file_job['file_path']] = alpha_box
+
+
+def record_file_result(plan, file_job, result):
+    """Note a rendered file and the 1x file derived with it in the run
+    journal, then keep its opaque box"""
+    names = [file_job['file_path'].name]
+    if file_job.get('derive_1x'):
+        names.append(file_job['derive_1x']['file_path'].name)
+    journal = plan['journal']
+    if journal is not None:
+        for name in names:
+            _, out_path, source_hash, params = plan['entries'][name]
+            journal.record(out_path, source_hash, params)
+    record_alpha_box(plan, file_job, result)
+
+
+def open_journal(job, manifest, theme_dir):
+    """Pick up the journal a killed run left in theme_dir.
+
+    The outputs it lists were fully written, so they go into the manifest
+    either way; temp files of writes cut short are deleted. Returns the
+    journal and the {name: record} of outputs an identical job finished,
+    which this run doesn't render again.
+    """
+    journal = RunJournal.for_theme(theme_dir)
+    run_key, outputs = journal.read()
+    if run_key is None:
+        return journal, {}
+    manifest.outputs.update(outputs)
+    remove_temp_files(job.process_folder)
+    if run_key != job.settings_key():
+        return journal, {}
+    print(f"Resuming an interrupted run: {len(outputs)} files already done")
+    return journal, outputs
+
+
+def plan_theme_files(job, reporter=None, render_cache=None):
+    """Prepare the output folder and work out which files need rendering.
+
+    Creates the backup, copies or restores the theme and checks the
+    manifest, resuming a run the journal shows was killed. Returns a plan
+    dict whose 'pending' list holds
+    (file job, output path, source hash, params) tuples ready for
+    colorize_files; finish_theme_files records them once rendered. Files
+    whose source content and parameters match another output go to
+    'duplicates' with that output, and are copied from it by
+    finish_theme_files. With job.derive_1x, 1x files written by their @2x
+    file's render go to 'derived'. render_cache overrides the job's own
+    cache setting.
+    """
+    reporter = reporter or Reporter()
+    input_dir = job.input_dir
+    process_folder = job.process_folder
+
+    if job.create_new:
+        process_folder.mkdir(exist_ok=True)
+        manifest = ThemeManifest.load(process_folder)
+        journal, resumed = open_journal(job, manifest, process_folder)
+
+        # Create backup
+        reporter.set_stage("Creating backup")
+        with span('backup'):
+            create_backup(input_dir)
+
+        # Copy all items, leaving files rendered by an earlier run in
+        # place; the manifest decides below if they need rendering again.
+        # Full runs keep them too, so a cancel doesn't lose good output
+        reporter.set_stage("Copying theme")
+        with span('copy'):
+            copy_all_items(input_dir, process_folder, job.tint_checkboxes, job.tint_windowframes,
+                           set(manifest.outputs))
+
+        source_folder = input_dir
+    else:
+        manifest = ThemeManifest.load(input_dir)
+        journal, resumed = open_journal(job, manifest, input_dir)
+
+        # When NOT creating new theme, ensure we have a backup
+        backup_folder = input_dir / 'backup'
+        if not backup_folder.exists():
+            reporter.set_stage("Creating backup")
+            with span('backup'):
+                create_backup(input_dir)
+        elif (job.incremental and manifest.exists()) or resumed:
+            # Images are restored per file below, only when re-rendered
+            reporter.set_stage("Restoring backup")
+            with span('restore'):
+                restore_backup_files(input_dir, ["settings.plist"])
+        else:
+            reporter.set_stage("Restoring backup")
+            with span('restore'):
+                restore_backup_files(input_dir)
+
+        source_folder = backup_folder
+
+    # Get files to process
+    files = get_top_level_files(process_folder, job.tint_checkboxes, job.tint_windowframes, SUPPORTED)
+
+    if not job.create_new:
+        # Put back files tinted by an earlier run that are no longer selected
+        selected = {file.name for file in files}
+        for name in list(manifest.outputs):
+            if name not in selected:
+                if (source_folder / name).exists():
+                    shutil.copy2(source_folder / name, process_folder / name)
+                manifest.forget(name)
+
+    plan = {'manifest': manifest, 'pending': [], 'duplicates': [], 'derived': [], 'options': None,
+            'file_count': len(files), 'palette_index': None, 'render_cache': None,
+            'alpha_boxes': {}, 'journal': None, 'entries': {}}
+    if not files:
+        reporter.warn("No supported images found to process")
+        return plan
+
+    reporter.check_cancelled()
+
+    # A pattern that can't be read is left out, as the overlay always was
+    pattern_path = job.pattern_path
+    pattern_hash = None
+    if pattern_path:
+        try:
+            pattern_hash = file_digest(pattern_path)
+        except OSError as e:
+            print(f"Error applying pattern: {e}")
+            reporter.warn(f"Pattern {pattern_path} could not be read and was not applied")
+            pattern_path = None
+
+    file_jobs = resolve_file_jobs(
+        files, process_folder, job.color, job.variations,
+        job.manual_colors, pattern_path,
+        job.pattern_blend, job.pattern_filters
+    )
+    options = {
+        'intensity': job.intensity,
+        'saturation': job.saturation,
+        'brightness': job.brightness,
+        'out_folder': process_folder,
+        'input_dir': input_dir,
+        'preserve_transparency': job.preserve_transparency,
+        'preserve_whites': job.preserve_whites,
+        'preserve_blacks': job.preserve_blacks,
+        'white_threshold': job.white_threshold,
+        'black_threshold': job.black_threshold,
+        'encode_mode': 'default' if job.png_encoding == 'default' else 'fast',
+    }
+
+    # Render straight from the pristine source of each file, skipping
+    # files whose source and effective parameters are unchanged
+    reporter.set_stage("Checking for changes")
+    pending = []
+    duplicates = []
+    renders = {}    # (render key, suffix) -> output holding that render
+    with span('check_changes', files=len(file_jobs)):
+        file_params = {file_job['file_path'].name: effective_params(file_job, options, pattern_hash)
+                       for file_job in file_jobs}
+        for file_job in file_jobs:
+            out_path = file_job['file_path']
+            source_path = source_folder / out_path.name
+            if not source_path.exists():
+                source_path = out_path
+            source_hash = manifest.source_hash(source_path)
+            params = file_params[out_path.name]
+            if job.derive_1x and file_params.get(retina_name(out_path.name)) == params:
+                # Made from its @2x render, so only current in that mode
+                params = dict(params, derived_from_2x=job.derive_1x_tolerance)
+            cache_key = render_key(source_hash, params)
+            key = (cache_key, out_path.suffix.lower())
+            if ((job.incremental or out_path.name in resumed)
+                    and manifest.is_up_to_date(out_path, source_hash, params)):
+                renders.setdefault(key, out_path)
+                continue
+            entry = (dict(file_job, file_path=source_path, source_hash=source_hash,
+                          cache_key=cache_key, alpha_box=manifest.alpha_box(source_path)),
+                     out_path, source_hash, params)
+            # Byte-identical sources with the same parameters (Active and
+            # Inactive copies...) render once and are copied to the rest
+            if key in renders:
+                duplicates.append((entry, renders[key]))
+            else:
+                renders[key] = out_path
+                pending.append(entry)
+
+    if job.derive_1x:
+        pending, derived = pair_retina_files(pending)
+        if derived:
+            print(f"Deriving {len(derived)} 1x files from their @2x renders")
+    else:
+        derived = []
+
+    plan['pending'] = pending
+    plan['duplicates'] = duplicates
+    plan['derived'] = derived
+    plan['options'] = options
+    plan['entries'] = {entry[1].name: entry for entry in pending + derived}
+
+    # Outputs are journaled as they land, so a killed run can pick up here
+    manifest.save()
+    journal.start(job.settings_key())
+    plan['journal'] = journal
+    if pending:
+        # Decoded source pixels are shared by every theme made from the same files
+        decoded_store = None
+        if job.decoded_cache_mb > 0:
+            decoded_store = DecodedAssetStore(max_bytes=job.decoded_cache_mb * 1024 * 1024)
+            options['decoded_store'] = decoded_store
+
+        # Recolor through each file's unique colors when enabled; files
+        # are indexed by whichever process renders them first
+        if job.use_palette_index:
+            plan['palette_index'] = PaletteIndex.for_theme(input_dir)
+
+        # Renders seen before, in any theme, are copied from the cache
+        if render_cache is None and job.render_cache_mb > 0:
+            render_cache = RenderCache(max_bytes=job.render_cache_mb * 1024 * 1024)
+        plan['render_cache'] = render_cache
+    return plan
+
+
+def retina_name(name):
+    """Name of the @2x asset matching a 1x file name"""
+    stem, dot, suffix = name.rpartition('.')
+    return f"{stem}@2x{dot}{suffix}" if dot else f"{name}@2x"
+
+
+def pair_retina_files(pending):
+    """Hand each pending 1x file whose @2x file is also pending to that
+    file's job as derive_1x. Returns (pending, derived entries)"""
+    by_name = {entry[1].name: entry for entry in pending}
+    paired = {}
+    for entry in pending:
+        file_job, out_path, _, params = entry
+        retina = by_name.get(retina_name(out_path.name))
+        if 'derived_from_2x' in params and retina is not None:
+            retina[0]['derive_1x'] = {
+                'file_path': file_job['file_path'],
+                'source_hash': file_job['source_hash'],
+                'cache_key': file_job['cache_key'],
+                'tolerance': params['derived_from_2x'],
+            }
+            paired[out_path.name] = entry
+    return ([entry for entry in pending if entry[1].name not in paired],
+            list(paired.values()))
+
+
+def finish_theme_files(plan):
+    """Copy duplicate outputs from their rendered twin and record every file
+    in the manifest. Returns their paths"""
+    manifest = plan['manifest']
+    entries = list(plan['pending']) + plan['derived']
+    with span('duplicates', files=len(plan['duplicates'])):
+        for entry, rendered_path in plan['duplicates']:
+            copy_file_atomic(rendered_path, entry[1])
+            entries.append(entry)
+    if plan['duplicates']:
+        print(f"Copied {len(plan['duplicates'])} duplicate files")
+
+    for _, out_path, source_hash, params in entries:
+        manifest.record(out_path, source_hash, params)
+    for source_path, alpha_box in plan.get('alpha_boxes', {}).items():
+        manifest.record_alpha_box(source_path, alpha_box)
+    manifest.save()
+    if plan['journal'] is not None:
+        plan['journal'].discard()
+    return [out_path for _, out_path, *_ in entries]
+
+
+def optimize_theme_outputs(paths, workers=None, reporter=None):
+    """Recompress freshly rendered files for size"""
+    reporter = reporter or Reporter()
+    reporter.set_stage(f"Optimizing {len(paths)} PNG files")
+    manifest = ThemeManifest.load(paths[0].parent)
+    try:
+        stats = optimize_pngs(paths, workers, reporter.set_progress, reporter.check_cancelled)
+        print(f"Optimized {stats['files']} files in {stats['seconds']:.2f}s: "
+              f"{stats['bytes_before'] / (1024 * 1024):.1f} MB -> "
+              f"{stats['bytes_after'] / (1024 * 1024):.1f} MB")
+    finally:
+        # Keep the manifest matching so the next run doesn't re-render
+        for path in paths:
+            manifest.refresh_output(path)
+        manifest.save()
+
+
+def process_plist_file(job):
+    """Process the settings.plist file with all available options"""
+    try:
+        color = job.color
+        intensity = job.intensity
+        saturation = job.saturation
+        brightness = job.brightness
+
+        plist_path = job.process_folder / "settings.plist"
+
+        if not plist_path.exists():
+            print(f"No settings.plist found at {plist_path}")
+            return
+
+        # Load the plist file
+        with open(plist_path, 'rb') as f:
+            plist_data = plistlib.load(f)
+
+            # Determinar se é tema escuro
+        is_dark_theme = job.theme_mode == "Dark Theme"
+
+        # Ajustar a cor baseado no tema
+        if is_dark_theme:
+            # Para tema escuro, escurecer a cor
+            r, g, b = hex_to_rgb(color)
+            # Reduzir brilho (valor HSV) em 30% para tema escuro
+            h, s, v = colorsys.rgb_to_hsv(r / 255, g / 255, b / 255)
+            r, g, b = colorsys.hsv_to_rgb(h, s, v)
+            theme_color = f"#{int(r * 255):02x}{int(g * 255):02x}{int(b * 255):02x}"
+        else:
+            # Para tema claro, manter a cor original
+            theme_color = color
+
+
+        # Job values override the Plist Settings defaults
+        plist_settings = dict(DEFAULT_PLIST_SETTINGS, **job.plist)
+        active_shadow = plist_settings['active_shadow']
+        inactive_shadow = plist_settings['inactive_shadow']
+        dock_reflection = plist_settings['dock_reflection']
+        dock_touches_ground = plist_settings['dock_touches_ground']
+        dock_slices = plist_settings['dock_slices']
+        hide_window_rim = plist_settings['hide_window_rim']
+        mini_toolbar = plist_settings['mini_toolbar']
+        patch_appearance = plist_settings['patch_appearance']
+        control_spacing = plist_settings['control_spacing']
+
+        # Mica settings
+        mica_header = plist_settings['mica_header']
+        mica_sidebar = plist_settings['mica_sidebar']
+        mica_titlebar = plist_settings['mica_titlebar']
+        mica_menu = plist_settings['mica_menu']
+        mica_window_bg = plist_settings['mica_window_bg']
+
+        # Asset slice settings
+        window_frame_mask_1x = plist_settings['window_frame_mask_1x']
+        window_frame_base_1x = plist_settings['window_frame_base_1x']
+        window_frame_mask_2x = plist_settings['window_frame_mask_2x']
+        window_frame_base_2x = plist_settings['window_frame_base_2x']
+
+        # Update basic settings
+        plist_data['gWindowShadowActiveRadius'] = active_shadow
+        plist_data['gWindowShadowInactiveRadius'] = inactive_shadow
+        plist_data['gDockReflection'] = dock_reflection
+        plist_data['gDockTouchesGround'] = dock_touches_ground
+        plist_data['gDockSlices'] = dock_slices
+        plist_data['gHideWindowRim'] = hide_window_rim
+        plist_data['gMiniToolbar'] = mini_toolbar
+        plist_data['gPatchAppearance'] = patch_appearance
+        plist_data['gControlSpacing'] = control_spacing
+
+        # Atualiza configurações básicas
+        plist_data['ActiveShadow'] = active_shadow
+        plist_data['InactiveShadow'] = inactive_shadow
+        plist_data['DockReflection'] = dock_reflection
+        plist_data['DockTouchesGround'] = dock_touches_ground
+        plist_data['DockSlices'] = dock_slices
+        plist_data['HideWindowRim'] = hide_window_rim
+        plist_data['MiniToolbar'] = mini_toolbar
+        plist_data['PatchAppearance'] = patch_appearance
+        plist_data['ControlSpacing'] = control_spacing
+
+        # Atualiza opções de Mica
+        plist_data['MicaHeader'] = mica_header
+        plist_data['MicaSidebar'] = mica_sidebar
+        plist_data['MicaTitlebar'] = mica_titlebar
+        plist_data['MicaMenu'] = mica_menu
+        plist_data['MicaWindowBackground'] = mica_window_bg
+
+        # Atualiza caminhos de assets se informados
+        if window_frame_mask_1x:
+            plist_data['WindowFrameMask1x'] = window_frame_mask_1x
+        if window_frame_base_1x:
+            plist_data['WindowFrameBase1x'] = window_frame_base_1x
+        if window_frame_mask_2x:
+            plist_data['WindowFrameMask2x'] = window_frame_mask_2x
+        if window_frame_base_2x:
+            plist_data['WindowFrameBase2x'] = window_frame_base_2x
+
+        # Adiciona metadados de última cor aplicada
+        plist_data['LastColorizedColor'] = color
+        plist_data['LastColorizedIntensity'] = intensity
+        plist_data['LastColorizedSaturation'] = saturation
+        plist_data['LastColorizedBrightness'] = brightness
+
+        # Update Mica settings
+        if 'gMicaTile' not in plist_data:
+            plist_data['gMicaTile'] = {}
+
+        mica_dict = plist_data['gMicaTile']
+
+        # Header Mica
+        mica_dict['Mica: Header_Active_Normal_Off_Base0'] = mica_header
+        mica_dict['Mica: Header_Active_Normal_Off_Base0@2x'] = mica_header
+        mica_dict['Mica: Header_Inactive_Normal_Off_Base0'] = mica_header
+        mica_dict['Mica: Header_Inactive_Normal_Off_Base0@2x'] = mica_header
+        mica_dict['Mica: Header-Opaque_Active_Normal_Off_Base0'] = mica_header
+        mica_dict['Mica: Header-Opaque_Active_Normal_Off_Base0@2x'] = mica_header
+        mica_dict['Mica: Header-Opaque_Inactive_Normal_Off_Base0'] = mica_header
+        mica_dict['Mica: Header-Opaque_Inactive_Normal_Off_Base0@2x'] = mica_header
+
+        # Sidebar Mica
+        mica_dict['Mica: Sidebar_Active_Normal_Off_Base0'] = mica_sidebar
+        mica_dict['Mica: Sidebar_Active_Normal_Off_Base0@2x'] = mica_sidebar
+        mica_dict['Mica: Sidebar_Inactive_Normal_Off_Base0'] = mica_sidebar
+        mica_dict['Mica: Sidebar_Inactive_Normal_Off_Base0@2x'] = mica_sidebar
+        mica_dict['Mica: Sidebar-Opaque_Active_Normal_Off_Base0'] = mica_sidebar
+        mica_dict['Mica: Sidebar-Opaque_Active_Normal_Off_Base0@2x'] = mica_sidebar
+        mica_dict['Mica: Sidebar-Opaque_Inactive_Normal_Off_Base0'] = mica_sidebar
+        mica_dict['Mica: Sidebar-Opaque_Inactive_Normal_Off_Base0@2x'] = mica_sidebar
+
+        # Titlebar Mica
+        mica_dict['Mica: Titlebar_Active_Normal_Off_Base0'] = mica_titlebar
+        mica_dict['Mica: Titlebar_Active_Normal_Off_Base0@2x'] = mica_titlebar
+        mica_dict['Mica: Titlebar_Inactive_Normal_Off_Base0'] = mica_titlebar
+        mica_dict['Mica: Titlebar_Inactive_Normal_Off_Base0@2x'] = mica_titlebar
+        mica_dict['Mica: Titlebar-Opaque_Active_Normal_Off_Base0'] = mica_titlebar
+        mica_dict['Mica: Titlebar-Opaque_Active_Normal_Off_Base0@2x'] = mica_titlebar
+        mica_dict['Mica: Titlebar-Opaque_Inactive_Normal_Off_Base0'] = mica_titlebar
+        mica_dict['Mica: Titlebar-Opaque_Inactive_Normal_Off_Base0@2x'] = mica_titlebar
+
+        # Menu Mica
+        mica_dict['Mica: Menu_Active_Normal_Off_Base0'] = mica_menu
+        mica_dict['Mica: Menu_Active_Normal_Off_Base0@2x'] = mica_menu
+        mica_dict['Mica: Menu_Inactive_Normal_Off_Base0'] = mica_menu
+        mica_dict['Mica: Menu_Inactive_Normal_Off_Base0@2x'] = mica_menu
+        mica_dict['Mica: Menu-Opaque_Active_Normal_Off_Base0'] = mica_menu
+        mica_dict['Mica: Menu-Opaque_Active_Normal_Off_Base0@2x'] = mica_menu
+        mica_dict['Mica: Menu-Opaque_Inactive_Normal_Off_Base0'] = mica_menu
+        mica_dict['Mica: Menu-Opaque_Inactive_Normal_Off_Base0@2x'] = mica_menu
+
+        # Window Background Mica
+        mica_dict['Mica: WindowBackground_Active_Normal_Off_Base0'] = mica_window_bg
+        mica_dict['Mica: WindowBackground_Active_Normal_Off_Base0@2x'] = mica_window_bg
+        mica_dict['Mica: WindowBackground_Inactive_Normal_Off_Base0'] = mica_window_bg
+        mica_dict['Mica: WindowBackground_Inactive_Normal_Off_Base0@2x'] = mica_window_bg
+        mica_dict['Mica: WindowBackground-Opaque_Active_Normal_Off_Base0'] = mica_window_bg
+        mica_dict['Mica: WindowBackground-Opaque_Active_Normal_Off_Base0@2x'] = mica_window_bg
+        mica_dict['Mica: WindowBackground-Opaque_Inactive_Normal_Off_Base0'] = mica_window_bg
+        mica_dict['Mica: WindowBackground-Opaque_Inactive_Normal_Off_Base0@2x'] = mica_window_bg
+
+        # Update asset slice settings
+        if 'gAssetSlice' not in plist_data:
+            plist_data['gAssetSlice'] = {}
+
+        asset_dict = plist_data['gAssetSlice']
+        asset_dict['WindowFrame_WindowShapeEdges_Regular_Active_Normal_Off_Mask0'] = window_frame_mask_1x
+        asset_dict['WindowFrame_WindowShapeEdges_Regular_Active_Normal_Off_Base0'] = window_frame_base_1x
+        asset_dict['WindowFrame_WindowShapeEdges_Regular_Active_Normal_Off_Mask0@2x'] = window_frame_mask_2x
+        asset_dict['WindowFrame_WindowShapeEdges_Regular_Active_Normal_Off_Base0@2x'] = window_frame_base_2x
+        asset_dict['WindowFrame_WindowShapeEdges_Regular_Inactive_Normal_Off_Mask0'] = window_frame_mask_1x
+        asset_dict['WindowFrame_WindowShapeEdges_Regular_Inactive_Normal_Off_Base0'] = window_frame_base_1x
+        asset_dict['WindowFrame_WindowShapeEdges_Regular_Inactive_Normal_Off_Mask0@2x'] = window_frame_mask_2x
+        asset_dict['WindowFrame_WindowShapeEdges_Regular_Inactive_Normal_Off_Base0@2x'] = window_frame_base_2x
+
+        # Update color values if gColors exists
+        if 'gColors' in plist_data:
+            color_dict = plist_data['gColors']
+            r_col, g_col, b_col = hex_to_rgb(theme_color)
+
+            # Aplicar ajustes de saturação e brilho à cor base
+            r_col_adj, g_col_adj, b_col_adj = adjust_color_hsv(r_col, g_col, b_col, saturation, brightness)
+
+            for key, value in color_dict.items():
+                if isinstance(value, str) and value.startswith('#'):
+                    # Extract original color components
+                    original_hex = value.lstrip('#')
+                    if len(original_hex) == 8:  # RGBA format
+                        r_orig = int(original_hex[0:2], 16)
+                        g_orig = int(original_hex[2:4], 16)
+                        b_orig = int(original_hex[4:6], 16)
+                        a_orig = original_hex[6:8]
+
+                        # Apply color tinting with adjusted color
+                        r_new = round(r_orig*(1-intensity) + r_col_adj*intensity)
+                        g_new = round(g_orig*(1-intensity) + g_col_adj*intensity)
+                        b_new = round(b_orig*(1-intensity) + b_col_adj*intensity)
+
+                        # Clamp values
+                        r_new = max(0, min(255, r_new))
+                        g_new = max(0, min(255, g_new))
+                        b_new = max(0, min(255, b_new))
+
+                        # Create new color value
+                        new_color = f"#{r_new:02x}{g_new:02x}{b_new:02x}{a_orig}"
+                        color_dict[key] = new_color
+
+        # Save the modified plist
+        with open(plist_path, 'wb') as f:
+            plistlib.dump(plist_data, f)
+
+        print(f"Updated settings.plist at {plist_path}")
+
+        # Apply custom color changes if any
+        if job.plist_color_changes:
+            for key, new_color in job.plist_color_changes.items():
+                if key in plist_data:
+                    plist_data[key] = new_color
+                    print(f"Updated {key} to {new_color}")
+
+        # Save the modified plist
+        with open(plist_path, 'wb') as f:
+            plistlib.dump(plist_data, f)
+
+    except Exception as e:
+        print(f"Error processing plist file: {e}")
+        raise
+
+
+def create_backup(input_dir):
+    """Create backup of all image files and plist"""
+    backup_folder = input_dir / 'backup'
+    backup_folder.mkdir(exist_ok=True)
+
+    # Get all image files
+    all_image_files = get_all_image_files(input_dir, SUPPORTED)
+
+    # Get plist file if exists
+    plist_file = input_dir / "settings.plist"
+    if plist_file.exists():
+        all_image_files.append(plist_file)
+
+    print(f"Creating backup of {len(all_image_files)} files...")
+
+    backed_up_count = 0
+    for file in all_image_files:
+        dest = backup_folder / file.name
+        if not dest.exists():
+            shutil.copy2(file, dest)
+            backed_up_count += 1
+            print(f"Backed up: {file.name}")
+
+    if backed_up_count == 0:
+        print("Backup already exists and is up to date")
+    else:
+        print(f"Backup created with {backed_up_count} files")
+
+
+def copy_all_items(src_dir, dest_dir, tint_checkboxes=True, tint_windowframes=True,
+                   keep_existing=()):
+    """Copy all items with filtering, including plist and Mica files.
+
+    Images named in keep_existing are not overwritten if already in dest_dir.
+    """
+    for item in src_dir.iterdir():
+        if item.name in ('backup', CACHE_DIR_NAME):
+            continue
+
+        dest_path = dest_dir / item.name
+        if (item.name in keep_existing and item.suffix.lower() in SUPPORTED
+                and dest_path.exists()):
+            continue
+
+        if item.is_file():
+            # Always copy plist file and Mica files
+            if (item.name == "settings.plist" or
+                item.name.startswith('Mica:') or
+                'Mica' in item.name):
+                shutil.copy2(item, dest_path)
+                print(f"Copied: {item.name}")
+                continue
+
+            # Filter image files based on user preferences
+            if item.suffix.lower() in SUPPORTED:
+                filename_lower = item.name.lower()
+                should_skip = False
+
+                if not tint_checkboxes and filename_lower.startswith('checkbox'):
+                    should_skip = True
+                if not tint_windowframes and (filename_lower.startswith('windowframe') or filename_lower.startswith('frame')):
+                    should_skip = True
+
+                if should_skip:
+                    continue
+
+                shutil.copy2(item, dest_path)
+                print(f"Copied: {item.name}")
+            else:
+                # Copy other non-image files
+                shutil.copy2(item, dest_path)
+                print(f"Copied: {item.name}")
+        elif item.is_dir():
+            shutil.copytree(item, dest_path, dirs_exist_ok=True)
+            print(f"Copied directory: {item.name}")
+
+
+def restore_backup_files(input_dir, names=None):
+    """Restore backup files including plist, or only the given names"""
+    backup_folder = input_dir / 'backup'
+    if not backup_folder.exists():
+        raise Exception("No backup found")
+
+    files = []
+    for item in backup_folder.iterdir():
+        # Include both image files and plist file
+        if (item.is_file() and
+            (item.suffix.lower() in SUPPORTED or item.name == "settings.plist")):
+            if names is None or item.name in names:
+                files.append(item)
+
+    for file in files:
+        dest = input_dir / file.name
+        shutil.copy2(file, dest)
+        print(f"Restored: {file.name}")
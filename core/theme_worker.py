@@ -0,0 +1,57 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from core.engine import ProcessingCancelled
+
+
+class ThemeWorker(QObject):
+    """Runs one theme job (process, restore...) on a background QThread.
+
+    The task is a callable taking the worker, which it can hand to the
+    engine as its reporter: stages, progress and warnings become signals,
+    and check_cancelled() stops the job at the engine's safe points. A task
+    may set follow_up to another task, which the window starts as a new job
+    once this one has succeeded.
+    """
+    progress = pyqtSignal(int)
+    stageChanged = pyqtSignal(str)
+    warning = pyqtSignal(str)
+    succeeded = pyqtSignal()
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()
+
+    def __init__(self, task, theme_keys, success_message, error_prefix, parent=None):
+        super().__init__(parent)
+        self.task = task
+        self.theme_keys = theme_keys
+        self.success_message = success_message
+        self.error_prefix = error_prefix
+        self.follow_up = None
+        self._cancel_requested = False
+
+    def run(self):
+        try:
+            self.task(self)
+            self.succeeded.emit()
+        except ProcessingCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            self.finished.emit()
+
+    def cancel(self):
+        """Ask the job to stop at its next safe point"""
+        self._cancel_requested = True
+
+    def check_cancelled(self):
+        if self._cancel_requested:
+            raise ProcessingCancelled()
+
+    def set_stage(self, stage):
+        self.stageChanged.emit(stage)
+
+    def set_progress(self, done, total):
+        self.progress.emit(int(done / total * 100))
+
+    def warn(self, message):
+        self.warning.emit(message)
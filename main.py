@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import sys
+import multiprocessing
 from PyQt5.QtWidgets import QApplication
 from core.colorizer_app import ColorizerApp
 import sys
@@ -20,6 +21,8 @@ def handle_exception(exc_type, exc_value, exc_traceback):
 sys.excepthook = handle_exception
 
 def main():
+    # Worker processes of the frozen app re-run this entry point
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     app.setStyle('Fusion')  # Modern look
     window = ColorizerApp()
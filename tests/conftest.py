@@ -0,0 +1,62 @@
+import pytest
+
+from benchmarks.synthetic_theme import generate_theme
+from core.engine import ThemeJob, Reporter, ProcessingCancelled
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep the shared render and decoded caches inside the test's folder"""
+    monkeypatch.setenv('GLOW_COLORIZER_CACHE_DIR', str(tmp_path / 'cache'))
+    return tmp_path / 'cache'
+
+
+@pytest.fixture
+def theme(tmp_path):
+    """A small synthetic theme"""
+    theme_dir = tmp_path / 'Theme'
+    generate_theme(theme_dir, assets=12, scale=0.25)
+    return theme_dir
+
+
+@pytest.fixture
+def make_job():
+    """Builds a ThemeJob that renders in this process without the decoded
+    store, unless the fields say otherwise"""
+    def make(theme_dir, **fields):
+        fields = dict(dict(workers=1, decoded_cache_mb=0), **fields)
+        return ThemeJob(theme_dir, fields.pop('color', '#3a7bd5'), **fields)
+    return make
+
+
+@pytest.fixture
+def read_outputs():
+    """Reads {name: bytes} of the PNG files in a folder"""
+    def read(folder):
+        return {path.name: path.read_bytes() for path in sorted(folder.glob('*.png'))}
+    return read
+
+
+class StopAfter(Reporter):
+    """Stops a run once `files` files are done, by cancelling it or, with
+    error, by failing like a crash would"""
+
+    def __init__(self, files, error=False):
+        self.files = files
+        self.error = error
+        self.done = 0
+
+    def set_progress(self, done, total):
+        self.done = done
+        if self.error and done >= self.files:
+            raise RuntimeError("killed")
+
+    def check_cancelled(self):
+        if not self.error and self.done >= self.files:
+            raise ProcessingCancelled()
+
+
+@pytest.fixture
+def stop_after():
+    """Reporter class that cancels or kills a run part way"""
+    return StopAfter
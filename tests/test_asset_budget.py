@@ -0,0 +1,28 @@
+import pytest
+
+from core import __main__ as cli
+from utils.asset_cache import get_asset_cache
+
+
+@pytest.fixture
+def asset_cache():
+    asset_cache = get_asset_cache()
+    budget = asset_cache.max_bytes
+    yield asset_cache
+    asset_cache.set_budget(budget)
+
+
+def test_job_renders_in_process(tmp_path, make_job):
+    assert make_job(tmp_path).renders_in_process
+    assert make_job(tmp_path, workers=4, pipeline=True).renders_in_process
+    assert not make_job(tmp_path, workers=4).renders_in_process
+
+
+@pytest.mark.parametrize('workers, kept', [(1, True), (2, False)])
+def test_cli_keeps_decoded_sources_where_files_render(theme, asset_cache, monkeypatch, workers,
+                                                      kept):
+    monkeypatch.setattr(cli.signal, 'signal', lambda *args: None)
+    asset_cache.set_budget(64 * 1024 * 1024)
+    assert cli.main(['process', str(theme), '--color', '#3a7bd5', '--workers', str(workers),
+                     '--cache-mb', '0', '--decoded-cache-mb', '0']) == 0
+    assert (asset_cache.max_bytes > 0) == kept
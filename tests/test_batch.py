@@ -0,0 +1,53 @@
+import pytest
+
+from core import batch, engine
+from core.engine import ProcessingCancelled
+from utils.theme_manifest import RunJournal
+
+
+def test_job_writing_an_earlier_jobs_folder_is_refused(theme, make_job, read_outputs):
+    first = make_job(theme)
+    shared = make_job(theme, saturation=1.5)
+    status = batch.run_batch([first, shared])
+
+    assert [entry['status'] for entry in status.entries] == ['done', 'failed']
+    assert 'same folder' in status.entries[1]['error']
+    expected = read_outputs(first.output_folder)
+    assert len(expected) == 12
+
+    # The refused job didn't touch the first job's output
+    engine.process_theme(first)
+    assert read_outputs(first.output_folder) == expected
+
+
+def test_failed_job_keeps_a_folder_it_did_not_create(theme, make_job, read_outputs):
+    kept = make_job(theme)
+    batch.run_batch([kept])
+    before = read_outputs(kept.output_folder)
+
+    # A broken source fails every job of the next batch
+    broken = sorted(theme.glob('*.png'))[0]
+    broken.write_bytes(b'not an image')
+    new = make_job(theme, color='#d53a7b')
+    status = batch.run_batch([make_job(theme, saturation=1.5), new])
+
+    assert status.counts() == {'failed': 2}
+    assert not new.output_folder.exists()
+    after = read_outputs(kept.output_folder)
+    assert after.keys() == before.keys()
+    assert after[broken.name] == before[broken.name]
+
+
+def test_cancelled_batch_keeps_a_folder_it_did_not_create(theme, make_job, read_outputs,
+                                                          stop_after):
+    kept = make_job(theme)
+    batch.run_batch([kept])
+    before = read_outputs(kept.output_folder)
+
+    new = make_job(theme, color='#d53a7b')
+    with pytest.raises(ProcessingCancelled):
+        batch.run_batch([make_job(theme, saturation=1.5), new], reporter=stop_after(1))
+
+    assert not new.output_folder.exists()
+    assert read_outputs(kept.output_folder).keys() == before.keys()
+    assert not RunJournal.for_theme(kept.output_folder).path.exists()
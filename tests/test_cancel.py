@@ -0,0 +1,36 @@
+import pytest
+
+from core import engine
+from core.engine import ProcessingCancelled
+from utils.theme_manifest import ThemeManifest, RunJournal
+
+
+def test_cancel_removes_a_new_theme_folder(theme, make_job, stop_after):
+    job = make_job(theme)
+    with pytest.raises(ProcessingCancelled):
+        engine.process_theme(job, stop_after(3))
+    assert not job.output_folder.exists()
+
+
+@pytest.mark.parametrize('incremental', [True, False])
+def test_cancel_keeps_output_of_an_earlier_run(theme, incremental, make_job, read_outputs,
+                                               stop_after):
+    job = make_job(theme)
+    engine.process_theme(job)
+    before = read_outputs(job.output_folder)
+
+    changed = make_job(theme, saturation=1.4, incremental=incremental)
+    with pytest.raises(ProcessingCancelled):
+        engine.process_theme(changed, stop_after(3))
+
+    after = read_outputs(job.output_folder)
+    assert after.keys() == before.keys()
+    rerendered = [name for name in before if after[name] != before[name]]
+    assert len(rerendered) == 3
+    manifest = ThemeManifest.load(job.output_folder)
+    assert all(manifest.outputs[name]['params']['saturation'] == 1.4 for name in rerendered)
+    assert not RunJournal.for_theme(job.output_folder).path.exists()
+
+    # The next run of the first settings only redoes the files that changed
+    assert len(engine.process_theme(job)) == 3
+    assert read_outputs(job.output_folder) == before
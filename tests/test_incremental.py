@@ -0,0 +1,35 @@
+import shutil
+
+from core import engine
+from core.engine import Reporter
+
+
+def test_unchanged_files_are_not_rendered_again(theme, make_job):
+    job = make_job(theme)
+    first = engine.process_theme(job)
+    assert len(first) == 12
+    assert engine.process_theme(job) == []
+
+    # Only the file whose source changed is rendered
+    changed = sorted(theme.glob('*.png'))[0]
+    changed.write_bytes((theme / 'backup' / changed.name).read_bytes() + b'\0')
+    assert [path.name for path in engine.process_theme(job)] == [changed.name]
+
+
+def test_missing_pattern_is_skipped_with_a_warning(theme, tmp_path, make_job, read_outputs):
+    warnings = []
+
+    class Warnings(Reporter):
+        def warn(self, message):
+            warnings.append(message)
+
+    plain_theme = tmp_path / 'Plain' / theme.name
+    shutil.copytree(theme, plain_theme)
+    plain = make_job(plain_theme)
+    engine.process_theme(plain)
+
+    job = make_job(theme, pattern_path=str(tmp_path / 'missing.png'), pattern_blend=0.5,
+                   pattern_filters=['Mica: Header'])
+    assert len(engine.process_theme(job, Warnings())) == 12
+    assert len(warnings) == 1
+    assert read_outputs(job.output_folder) == read_outputs(plain.output_folder)
@@ -0,0 +1,36 @@
+import shutil
+
+import pytest
+
+from core import engine
+from utils.theme_manifest import RunJournal
+
+
+@pytest.mark.parametrize('create_new', [True, False])
+@pytest.mark.parametrize('incremental', [True, False])
+def test_killed_run_resumes_from_journal(theme, tmp_path, create_new, incremental, make_job,
+                                         read_outputs, stop_after):
+    reference_theme = tmp_path / 'Reference' / theme.name
+    shutil.copytree(theme, reference_theme)
+    engine.process_theme(make_job(reference_theme, create_new=create_new, render_cache_mb=0))
+
+    job = make_job(theme, create_new=create_new, incremental=incremental, render_cache_mb=0)
+    with pytest.raises(Exception, match="killed"):
+        engine.process_theme(job, stop_after(5, error=True))
+    journal = RunJournal.for_theme(job.process_folder)
+    _, finished = journal.read()
+    assert len(finished) == 5
+
+    rendered = engine.process_theme(job)
+    assert len(rendered) == 7
+    assert not finished.keys() & {path.name for path in rendered}
+    assert not journal.path.exists()
+    assert read_outputs(job.process_folder) == read_outputs(
+        make_job(reference_theme, create_new=create_new).process_folder)
+
+
+def test_journal_of_other_settings_is_not_resumed(theme, make_job, stop_after):
+    with pytest.raises(Exception, match="killed"):
+        engine.process_theme(make_job(theme, incremental=False), stop_after(5, error=True))
+    rendered = engine.process_theme(make_job(theme, incremental=False, saturation=1.5))
+    assert len(rendered) == 12
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageOps
+
+from benchmarks.kernels import KERNELS, fuzz, random_image, random_params, reference_colorize
+from benchmarks.synthetic_theme import generate_pattern
+from utils.color_lut import clear_lut_cache
+from utils.image_processing import colorize_enhanced
+from utils.palette_index import PaletteIndex
+
+
+@pytest.mark.parametrize('kernel', sorted(KERNELS))
+def test_kernel_matches_reference_loop(kernel):
+    result = fuzz([kernel], cases=60, max_size=24, seed=0)[kernel]
+    assert result['max_deviation'] == [0, 0, 0, 0], result['first_failure']
+
+
+def reference_render(source, params, convert_to_grayscale, pattern_path, pattern_blend):
+    """colorize_enhanced as it was before any kernel work"""
+    img = Image.open(source).convert("RGBA")
+    if convert_to_grayscale:
+        gray = ImageOps.grayscale(img)
+        img = Image.merge("RGBA", (gray, gray, gray, img.getchannel("A")))
+    img = Image.fromarray(reference_colorize(np.array(img), params), "RGBA")
+    if pattern_path:
+        pattern = Image.open(pattern_path).convert("RGBA").resize(img.size, Image.LANCZOS)
+        img = Image.blend(img, pattern, pattern_blend)
+    return np.array(img)
+
+
+@pytest.mark.parametrize('use_palette_index', [False, True])
+@pytest.mark.parametrize('convert_to_grayscale', [False, True])
+@pytest.mark.parametrize('with_pattern', [False, True])
+def test_colorize_enhanced_matches_original(tmp_path, use_palette_index, convert_to_grayscale,
+                                            with_pattern):
+    rng = np.random.default_rng(3)
+    theme_dir = tmp_path / 'Theme'
+    theme_dir.mkdir()
+    out_folder = tmp_path / 'out'
+    pattern_path = generate_pattern(tmp_path / 'pattern.png', (32, 32)) if with_pattern else None
+    clear_lut_cache()
+
+    sources = []
+    for i in range(4):
+        params = random_params(rng)
+        source = theme_dir / f"Asset{i}.png"
+        pixels = random_image(rng, params, 40)
+        if i % 2:
+            # Few colors, as in most theme assets, so the file gets indexed
+            colors = pixels.reshape(-1, 4)[:8]
+            pixels = colors[rng.integers(0, len(colors), (64, 64))]
+        Image.fromarray(pixels, "RGBA").save(source)
+        sources.append((source, params))
+    palette_index = PaletteIndex.for_theme(theme_dir) if use_palette_index else None
+
+    # The second pass reads the palettes the first one indexed
+    for source, params in sources + sources:
+        colorize_enhanced(source, params['color'], params['intensity'], params['saturation'],
+                          params['brightness'], out_folder, theme_dir,
+                          params['preserve_transparency'], params['preserve_whites'],
+                          params['preserve_blacks'], params['white_threshold'],
+                          params['black_threshold'], pattern_path, 0.3 if with_pattern else 0,
+                          convert_to_grayscale, palette_index)
+        expected = reference_render(source, params, convert_to_grayscale, pattern_path, 0.3)
+        actual = np.array(Image.open(out_folder / source.name).convert("RGBA"))
+        assert np.array_equal(actual, expected), (source.name, params)
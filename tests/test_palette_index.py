@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from utils.palette_index import PaletteIndex, LEGACY_INDEX_FILE, unpack_rgba
+
+
+def save_image(path, pixels):
+    Image.fromarray(pixels, "RGBA").save(path)
+    return path
+
+
+def decode(path):
+    return np.array(Image.open(path).convert("RGBA"))
+
+
+def test_few_color_file_is_indexed_once(tmp_path):
+    rng = np.random.default_rng(0)
+    colors = rng.integers(0, 256, (6, 4), dtype=np.uint8)
+    source = save_image(tmp_path / 'Flat.png', colors[rng.integers(0, 6, (64, 96))])
+    index = PaletteIndex.for_theme(tmp_path)
+    assert index.palette(source) is None
+
+    codes, inverse, shape = index.add(source, decode(source))
+    assert shape == (64, 96) and len(codes) == 6
+    codes, inverse, shape = index.palette(source)
+    assert np.array_equal(unpack_rgba(codes)[inverse].reshape(64, 96, 4), decode(source))
+
+    # A changed file is indexed again
+    save_image(source, colors[rng.integers(0, 3, (64, 96))])
+    os.utime(source, ns=(0, 0))
+    assert index.palette(source) is None
+    assert len(index.add(source, decode(source))[0]) == 3
+
+
+def test_many_color_file_is_not_indexed(tmp_path):
+    rng = np.random.default_rng(0)
+    source = save_image(tmp_path / 'Noise.png', rng.integers(0, 256, (64, 64, 4), dtype=np.uint8))
+    index = PaletteIndex.for_theme(tmp_path)
+    assert index.add(source, decode(source)) is None
+    assert index.palette(source) is None
+    assert (index.root / 'Noise.png.npz').exists()
+
+
+def test_entry_bigger_than_the_source_is_not_kept(tmp_path):
+    # Two colors in random order: a small PNG, but an inverse index that
+    # doesn't compress any better
+    rng = np.random.default_rng(0)
+    pixels = np.where(rng.random((8, 8, 1)) < 0.5, 0, 255).astype(np.uint8).repeat(4, axis=2)
+    source = save_image(tmp_path / 'Tiny.png', pixels)
+    index = PaletteIndex.for_theme(tmp_path)
+    assert index.add(source, decode(source)) is not None
+    assert index.palette(source) is None
+
+
+def test_legacy_theme_index_is_removed(tmp_path):
+    legacy = tmp_path / '.colorizer' / LEGACY_INDEX_FILE
+    legacy.parent.mkdir()
+    legacy.write_bytes(b'old')
+    PaletteIndex.for_theme(tmp_path)
+    assert not legacy.exists()
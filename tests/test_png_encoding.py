@@ -0,0 +1,19 @@
+import json
+
+import pytest
+
+from core import batch
+
+
+def test_batch_file_checks_png_encoding(tmp_path, theme):
+    spec = {'base_path': str(theme.parent), 'themes': [theme.name],
+            'defaults': {'png_encoding': 'fast'},
+            'parameter_sets': [{'color': '#3a7bd5'}, {'color': '#d53a7b', 'png_encoding': 'optimize'}]}
+    path = tmp_path / 'jobs.json'
+    path.write_text(json.dumps(spec))
+    assert [job.png_encoding for job in batch.load_batch_file(path)] == ['fast', 'optimize']
+
+    spec['parameter_sets'][1]['png_encoding'] = 'optimized'
+    path.write_text(json.dumps(spec))
+    with pytest.raises(ValueError, match="png_encoding"):
+        batch.load_batch_file(path)
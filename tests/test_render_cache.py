@@ -0,0 +1,36 @@
+import shutil
+
+from core import engine
+from utils.parallel import colorize_files
+from utils.render_cache import RenderCache
+
+
+def test_manifest_tracks_encode_mode(theme, make_job):
+    engine.process_theme(make_job(theme, png_encoding='fast'))
+    assert len(engine.process_theme(make_job(theme))) == 12
+
+
+def render(job, render_cache):
+    plan = engine.plan_theme_files(job, render_cache=render_cache)
+    colorize_files([file_job for file_job, *_ in plan['pending']], plan['options'], workers=1,
+                   palette_index=plan['palette_index'], render_cache=plan['render_cache'])
+    return engine.finish_theme_files(plan)
+
+
+def test_render_cache_serves_earlier_renders(theme, cache_dir, make_job, read_outputs):
+    render_cache = RenderCache(cache_dir / 'renders')
+    job = make_job(theme)
+    render(job, render_cache)
+    expected = read_outputs(job.output_folder)
+    misses = render_cache.misses
+
+    shutil.rmtree(job.output_folder)
+    render(job, render_cache)
+    assert render_cache.hits == len(expected)
+    assert render_cache.misses == misses
+    assert read_outputs(job.output_folder) == expected
+
+    # Other encoder settings give other bytes, so they don't share entries
+    shutil.rmtree(job.output_folder)
+    render(make_job(theme, png_encoding='fast'), render_cache)
+    assert render_cache.hits == len(expected)
@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+# Budget of decoded source images kept in memory by each process
+DEFAULT_ASSET_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class AssetCache:
+    """In-memory LRU of decoded source images, keyed by content hash.
+
+    Arrays are stored read-only; callers that modify pixels take a copy.
+    Thread-safe, so a background preload can fill it while a run reads it.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_ASSET_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            pixels = self._entries.get(key)
+            if pixels is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return pixels
+
+    def put(self, key, pixels):
+        """Keep pixels under key, dropping the least recently used entries.
+
+        The cache takes ownership: pixels must not be modified afterwards.
+        Returns a read-only view, which is not kept if it alone exceeds the
+        budget.
+        """
+        pixels = pixels.view()
+        pixels.flags.writeable = False
+        if pixels.nbytes > self.max_bytes:
+            return pixels
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.nbytes
+            self._entries[key] = pixels
+            self.bytes += pixels.nbytes
+            self._trim()
+        return pixels
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def is_full(self):
+        return self.bytes >= self.max_bytes
+
+    def set_budget(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._trim()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def _trim(self):
+        while self._entries and self.bytes > self.max_bytes:
+            _, pixels = self._entries.popitem(last=False)
+            self.bytes -= pixels.nbytes
+
+
+_asset_cache = AssetCache()
+
+
+def get_asset_cache():
+    """This process's decoded asset cache"""
+    return _asset_cache
@@ -0,0 +1,127 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from .image_processing import colorize_pixels
+
+# Number of compiled tables kept alive. Each table is a 64 MB zeroed buffer,
+# but pages are only committed by the OS once a color in them is used.
+# Pool workers split this between them, see set_lut_cache_size.
+LUT_CACHE_SIZE = 8
+
+# Bit set on every filled entry so 0 can mean "not computed yet"
+_FILLED = np.uint32(1 << 24)
+
+_lut_cache = OrderedDict()
+_lut_cache_lock = threading.Lock()
+_lut_cache_size = LUT_CACHE_SIZE
+
+
+def pack_rgb(r, g, b):
+    """Pack RGB channel arrays into 24-bit integer codes"""
+    return (r.astype(np.uint32) | (g.astype(np.uint32) << 8) |
+            (b.astype(np.uint32) << 16))
+
+
+class ColorLUT:
+    """256³ lookup table of the tint + HSV transform for one parameter set.
+
+    Entries are computed on first use with colorize_pixels, so a table only
+    ever pays for the colors the theme actually contains. White/black
+    preservation is baked into the table; transparency depends on alpha and
+    is applied by the caller.
+    """
+
+    def __init__(self, rgb_color, intensity, saturation, brightness,
+                 preserve_whites=True, preserve_blacks=True,
+                 white_threshold=245, black_threshold=30):
+        self.params = (tuple(rgb_color), intensity, saturation, brightness,
+                       preserve_whites, preserve_blacks,
+                       white_threshold, black_threshold)
+        self.table = np.zeros(1 << 24, dtype=np.uint32)
+        self._lock = threading.Lock()
+
+    def _compute(self, codes):
+        """Run the pixel math for packed codes and store the results"""
+        pixels = np.empty((len(codes), 1, 4), dtype=np.uint8)
+        pixels[:, 0, 0] = codes & 0xFF
+        pixels[:, 0, 1] = (codes >> 8) & 0xFF
+        pixels[:, 0, 2] = (codes >> 16) & 0xFF
+        pixels[:, 0, 3] = 255
+
+        rgb_color, intensity, saturation, brightness = self.params[:4]
+        colorize_pixels(pixels, rgb_color, intensity, saturation, brightness,
+                        False, *self.params[4:])
+        out = pack_rgb(pixels[:, 0, 0], pixels[:, 0, 1], pixels[:, 0, 2])
+        self.table[codes] = out | _FILLED
+
+    def lookup(self, codes):
+        """Map packed 24-bit codes through the table, filling misses first"""
+        values = self.table[codes]
+        missing = values == 0
+        if missing.any():
+            with self._lock:
+                self._compute(np.unique(codes[missing]))
+            values = self.table[codes]
+        return values
+
+    def compile(self, chunk_size=1 << 20):
+        """Fill every entry of the table up front"""
+        with self._lock:
+            for start in range(0, 1 << 24, chunk_size):
+                codes = np.arange(start, start + chunk_size, dtype=np.uint32)
+                self._compute(codes[self.table[codes] == 0])
+        return self
+
+    def apply(self, pixels, preserve_transparency=True):
+        """Colorize an RGBA uint8 array in place through the table"""
+        if preserve_transparency:
+            selected = pixels[..., 3] != 0
+            src = pixels[selected]
+        else:
+            selected = None
+            src = pixels.reshape(-1, 4)
+
+        values = self.lookup(pack_rgb(src[:, 0], src[:, 1], src[:, 2]))
+        src[:, 0] = values & 0xFF
+        src[:, 1] = (values >> 8) & 0xFF
+        src[:, 2] = (values >> 16) & 0xFF
+
+        if selected is not None:
+            pixels[selected] = src
+        elif not np.shares_memory(src, pixels):
+            pixels[...] = src.reshape(pixels.shape)
+        return pixels
+
+
+def get_color_lut(rgb_color, intensity, saturation, brightness,
+                  preserve_whites=True, preserve_blacks=True,
+                  white_threshold=245, black_threshold=30):
+    """Return the cached ColorLUT for these parameters, building it if needed"""
+    key = (tuple(rgb_color), intensity, saturation, brightness,
+           preserve_whites, preserve_blacks, white_threshold, black_threshold)
+    with _lut_cache_lock:
+        lut = _lut_cache.get(key)
+        if lut is not None:
+            _lut_cache.move_to_end(key)
+            return lut
+
+        lut = ColorLUT(*key)
+        _lut_cache[key] = lut
+        while len(_lut_cache) > _lut_cache_size:
+            _lut_cache.popitem(last=False)
+        return lut
+
+
+def set_lut_cache_size(size):
+    """Keep at most size tables (at least one) in this process"""
+    global _lut_cache_size
+    with _lut_cache_lock:
+        _lut_cache_size = max(1, size)
+        while len(_lut_cache) > _lut_cache_size:
+            _lut_cache.popitem(last=False)
+
+
+def clear_lut_cache():
+    """Drop every compiled table"""
+    with _lut_cache_lock:
+        _lut_cache.clear()
@@ -1,4 +1,5 @@
 import colorsys
+import numpy as np
 
 def hex_to_rgb(hex_color):
     hex_color = hex_color.lstrip('#')
@@ -30,4 +31,51 @@ def is_black_pixel(r, g, b, threshold=30):
 
 def rgb_to_hex(r, g, b):
     """Convert RGB values to HEX string"""
-    return f"#{r:02x}{g:02x}{b:02x}"
\ No newline at end of file
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+# Array versions of the helpers above. They repeat the colorsys arithmetic
+# step by step on float64 arrays so results match the scalar path exactly.
+
+def rgb_to_hsv_array(r, g, b):
+    """Vectorized rgb_to_hsv for float arrays in the 0-1 range"""
+    maxc = np.maximum(np.maximum(r, g), b)
+    minc = np.minimum(np.minimum(r, g), b)
+    rangec = maxc - minc
+    gray = minc == maxc
+
+    # Avoid dividing by zero on gray pixels; their h and s are forced to 0 below
+    safe_max = np.where(gray, 1.0, maxc)
+    safe_range = np.where(gray, 1.0, rangec)
+
+    s = np.where(gray, 0.0, rangec / safe_max)
+    rc = (maxc - r) / safe_range
+    gc = (maxc - g) / safe_range
+    bc = (maxc - b) / safe_range
+
+    h = np.where(r == maxc, bc - gc,
+                 np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(gray, 0.0, (h / 6.0) % 1.0)
+    return h, s, maxc
+
+def hsv_to_rgb_array(h, s, v):
+    """Vectorized hsv_to_rgb returning int arrays truncated like int()"""
+    i = (h * 6.0).astype(np.int64)
+    f = (h * 6.0) - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i % 6
+
+    r = np.choose(i, [v, q, p, p, t, v])
+    g = np.choose(i, [t, v, v, q, p, p])
+    b = np.choose(i, [p, p, t, v, v, q])
+    return ((r * 255).astype(np.int64), (g * 255).astype(np.int64),
+            (b * 255).astype(np.int64))
+
+def adjust_color_hsv_array(r, g, b, saturation_factor, brightness_factor):
+    """Vectorized adjust_color_hsv for integer channel arrays"""
+    r, g, b = (np.asarray(c, dtype=np.float64) for c in (r, g, b))
+    h, s, v = rgb_to_hsv_array(r / 255.0, g / 255.0, b / 255.0)
+    s = np.minimum(1.0, s * saturation_factor)
+    v = np.minimum(1.0, v * brightness_factor)
+    return hsv_to_rgb_array(h, s, v)
@@ -0,0 +1,132 @@
+import os
+import threading
+import numpy as np
+from PIL import Image
+from .file_utils import file_digest
+from .disk_store import DiskStore
+from .render_cache import default_cache_root
+from .asset_cache import get_asset_cache
+
+DEFAULT_DECODED_BYTES = 2 * 1024 * 1024 * 1024
+
+_digests = {}                   # (path, size, mtime_ns) -> content hash
+_digests_lock = threading.Lock()
+
+
+def source_digest(path):
+    """Content hash of a source image, only re-read when its size or mtime
+    changes"""
+    stat = os.stat(path)
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        digest = _digests.get(key)
+    if digest is None:
+        digest = file_digest(path)
+        with _digests_lock:
+            _digests[key] = digest
+    return digest
+
+
+class DecodedAssetStore(DiskStore):
+    """On-disk store of decoded RGBA pixels as .npy files.
+
+    Entries are keyed by the source file's content hash, so a base theme,
+    its backup and every -colorized# copy made from it share one entry.
+    Pixels are memory-mapped back copy-on-write: pages are read straight
+    from the page cache with no PNG inflate, and writes stay private to the
+    caller. Publishing and LRU eviction are shared with the render cache
+    through DiskStore.
+    """
+
+    suffix = '.npy'
+
+    def __init__(self, root=None, max_bytes=DEFAULT_DECODED_BYTES):
+        super().__init__(root or default_cache_root() / 'decoded', max_bytes)
+
+    def load(self, key):
+        """Writable copy-on-write view of the stored pixels, or None"""
+        path = self._entry_path(key)
+        try:
+            pixels = np.load(path, mmap_mode='c')
+            os.utime(path)
+        except FileNotFoundError:
+            pixels = None
+        except (OSError, ValueError) as e:
+            print(f"Error reading decoded asset {key}: {e}")
+            pixels = None
+        self._count(hit=pixels is not None)
+        return pixels
+
+    def save(self, key, pixels):
+        """Store decoded pixels under a source content hash"""
+        path = self._entry_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._temp_path(key)
+            with open(tmp_path, 'wb') as f:
+                np.save(f, pixels, allow_pickle=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error storing decoded asset: {e}")
+
+
+def load_source_pixels(path, decoded_store=None, source_hash=None):
+    """Read-only decoded RGBA pixels of a source image.
+
+    Looks in this process's asset cache, then decoded_store when given,
+    and only then decodes the file. Whatever is found is kept in the asset
+    cache for the next caller.
+    """
+    asset_cache = get_asset_cache()
+    if asset_cache.max_bytes <= 0 and decoded_store is None:
+        return np.array(Image.open(path).convert("RGBA"))
+
+    source_hash = source_hash or source_digest(path)
+    pixels = asset_cache.get(source_hash)
+    if pixels is not None:
+        return pixels
+
+    if decoded_store is not None:
+        pixels = decoded_store.load(source_hash)
+    if pixels is None:
+        pixels = np.array(Image.open(path).convert("RGBA"))
+        if decoded_store is not None:
+            decoded_store.save(source_hash, pixels)
+    else:
+        pixels = np.array(pixels)
+    return asset_cache.put(source_hash, pixels)
+
+
+def store_decoded_sources(paths, decoded_store, check_cancelled=None):
+    """Decode paths missing from decoded_store into it, without keeping
+    them in this process's memory. Returns the number of files now stored"""
+    stored = 0
+    for path in paths:
+        if check_cancelled and check_cancelled():
+            break
+        try:
+            source_hash = source_digest(path)
+            if source_hash not in decoded_store:
+                decoded_store.save(source_hash, np.array(Image.open(path).convert("RGBA")))
+        except Exception as e:
+            print(f"Error preloading {path.name}: {e}")
+            continue
+        stored += 1
+    return stored
+
+
+def preload_sources(paths, decoded_store=None, check_cancelled=None):
+    """Decode paths into the asset cache until it is full. Returns the
+    number of files now cached"""
+    asset_cache = get_asset_cache()
+    loaded = 0
+    for path in paths:
+        if asset_cache.is_full() or (check_cancelled and check_cancelled()):
+            break
+        try:
+            load_source_pixels(path, decoded_store)
+        except Exception as e:
+            print(f"Error preloading {path.name}: {e}")
+            continue
+        loaded += 1
+    return loaded
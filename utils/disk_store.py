@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+# Leftover temp files older than this are from crashed writers
+_STALE_TMP_SECONDS = 3600
+
+
+class DiskStore:
+    """Folder of files keyed by content hash, trimmed to a byte budget.
+
+    Entries live under root/<first two key characters>/<key><suffix> and
+    are published with an atomic rename, so several processes can share a
+    store. Readers touch an entry's mtime on use, which evict() uses to
+    drop the least recently used files. Subclasses add the read and write
+    API for what they keep.
+    """
+
+    suffix = ''
+
+    def __init__(self, root, max_bytes):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Workers get their own counters; the parent adds up their results
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _entry_path(self, key):
+        return self.root / key[:2] / f"{key}{self.suffix}"
+
+    def _temp_path(self, key):
+        return self._entry_path(key).with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    def __contains__(self, key):
+        return self._entry_path(key).exists()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def evict(self):
+        """Delete least recently used entries until the store fits its budget"""
+        if not self.root.exists():
+            return 0
+
+        with open(self.root / '.lock', 'w') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return 0  # Another process is already evicting
+
+            entries = []
+            total = 0
+            now = time.time()
+            for path in self.root.glob('*/*'):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if path.suffix == '.tmp':
+                    if now - stat.st_mtime > _STALE_TMP_SECONDS:
+                        path.unlink(missing_ok=True)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            removed = 0
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+
+        with self._lock:
+            self.evictions += removed
+        return removed
@@ -1,6 +1,12 @@
+import hashlib
+import os
+import threading
 from pathlib import Path
 import shutil
 
+# Hidden folder inside a theme holding derived data (palette index etc.)
+CACHE_DIR_NAME = '.colorizer'
+
 def get_all_image_files(directory, supported_extensions):
     """Get all image files from directory"""
     files = []
@@ -33,4 +39,48 @@ def get_top_level_files(directory, tint_checkboxes=True, tint_windowframes=True,
             if not tint_windowframes and (filename_lower.startswith('windowframe') or filename_lower.startswith('frame')):
                 continue
             files.append(item)
-    return files
\ No newline at end of file
+    return files
+
+def get_cache_dir(theme_dir):
+    """Get the theme's cache folder, creating it if needed"""
+    cache_dir = Path(theme_dir) / CACHE_DIR_NAME
+    cache_dir.mkdir(exist_ok=True)
+    return cache_dir
+
+def file_digest(path, chunk_size=1 << 20):
+    """Content hash of a file, used to key caches and manifests"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def temp_path(path):
+    """Hidden name next to path to write it under before renaming into
+    place, unique per process and thread"""
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+def remove_temp_files(directory):
+    """Delete temp files left in directory by a killed run"""
+    for item in directory.glob('.*.tmp'):
+        item.unlink(missing_ok=True)
+
+def write_file_atomic(path, data):
+    """Write bytes so path only ever holds the old or the complete new file"""
+    tmp_path = temp_path(path)
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+def copy_file_atomic(src, dest):
+    """shutil.copyfile into a temp name, then rename over dest"""
+    tmp_path = temp_path(dest)
+    try:
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dest)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
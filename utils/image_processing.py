@@ -1,70 +1,443 @@
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import numpy as np
 from PIL import Image, ImageOps
-from .color_utils import hex_to_rgb, adjust_color_hsv, is_white_pixel, is_black_pixel
+from .color_utils import hex_to_rgb, adjust_color_hsv_array
+from .asset_cache import get_asset_cache
+from .decoded_store import load_source_pixels
+from .palette_index import unpack_rgba, unique_colors, remap_palette
+from .pattern_cache import get_pattern_pixels
+from .png_encoder import encode_image, encode_image_bytes
+
+# Images at least this large are processed in row bands on a thread
+# pool instead of being copied whole between processing steps
+BAND_MIN_PIXELS = 2048 * 1024
+BAND_ROWS = 128
+
+# Pixels of a direct 1x render compared against a 1x derived from @2x
+DERIVE_SAMPLE_PIXELS = 4096
+
+_band_pool = None
+_band_pool_lock = threading.Lock()
 
 def colorize_enhanced(file_path, color, intensity, saturation, brightness,
                       out_folder, input_dir, preserve_transparency=True,
                       preserve_whites=True, preserve_blacks=True,
                       white_threshold=245, black_threshold=30,
                       pattern_path=None, pattern_blend=0,
-                      convert_to_grayscale=False):
-    """Enhanced colorization with optional grayscale pre-processing"""
-    img = Image.open(file_path).convert("RGBA")
+                      convert_to_grayscale=False, palette_index=None,
+                      encode_mode='default', source_hash=None, decoded_store=None,
+                      alpha_box=None, derive_1x=None, source_bytes=None, outputs=None):
+    """Enhanced colorization with optional grayscale pre-processing.
+
+    With the source's content hash, decoded pixels are reused from memory or
+    mapped from decoded_store instead of decoding the file (see
+    load_working_pixels). When transparency is preserved, colors are only
+    looked up inside the source's opaque box: alpha_box if known, else
+    measured here. derive_1x makes this @2x render also write its 1x
+    asset (see encode_derived_1x). source_bytes is the source file already
+    read into memory. With an outputs list, encoded files are appended to
+    it as (path, data) for the caller to write instead of being written
+    here. Returns the (seconds, bytes) spent encoding the output and the
+    opaque box, or None when it wasn't needed.
+    """
+    from .color_lut import get_color_lut
+
+    # Colors go through a cached lookup table shared by every file that uses
+    # the same parameters, so each distinct color is computed once per run
+    lut = get_color_lut(hex_to_rgb(color), intensity, saturation, brightness,
+                        preserve_whites, preserve_blacks,
+                        white_threshold, black_threshold)
+
+    def transform(img):
+        return colorize_image(img, lut, preserve_transparency, convert_to_grayscale)
+
+    pixel_lut = lut
+    lut_box = None
+    palette = palette_index.palette(file_path) if palette_index is not None else None
+    if palette is None:
+        pixels = load_working_pixels(file_path, source_hash, decoded_store, source_bytes)
+        if palette_index is not None:
+            palette = palette_index.add(file_path, pixels)
+    if palette is not None:
+        # Recolor the file's unique colors and scatter them back
+        pixels = remap_palette(palette, transform)
+        band_rows = BAND_ROWS if pixels.shape[0] * pixels.shape[1] >= BAND_MIN_PIXELS else None
+        pixel_lut = None  # Already colorized
+    else:
+        band_rows = BAND_ROWS if pixels.shape[0] * pixels.shape[1] >= BAND_MIN_PIXELS else None
+        if preserve_transparency:
+            # Fully transparent margins are left alone by the LUT anyway
+            lut_box = tuple(alpha_box) if alpha_box is not None else opaque_box(pixels)
+
+    # Apply pattern if specified, resized once per distinct file size
+    pattern_pixels = None
+    if pattern_path and pattern_blend > 0:
+        pattern_pixels = get_pattern_pixels(pattern_path, (pixels.shape[1], pixels.shape[0]))
+
+    # Grayscale, tint and pattern blend in one pass over the working buffer
+    render_pixels(pixels, pixel_lut, preserve_transparency, convert_to_grayscale,
+                  pattern_pixels, pattern_blend, band_rows, lut_box)
+
+    # Wrap the working buffer without another full-size copy
+    img = Image.frombuffer("RGBA", (pixels.shape[1], pixels.shape[0]),
+                           pixels, "raw", "RGBA", 0, 1)
+
+    seconds, bytes_written = save_image(img, out_folder / file_path.name, encode_mode, outputs)
+
+    if derive_1x is not None:
+        def render_direct():
+            return colorize_enhanced(
+                derive_1x['file_path'], color, intensity, saturation, brightness,
+                out_folder, input_dir, preserve_transparency, preserve_whites,
+                preserve_blacks, white_threshold, black_threshold, pattern_path,
+                pattern_blend, convert_to_grayscale, palette_index, encode_mode,
+                derive_1x['source_hash'], decoded_store, outputs=outputs)[:2]
+
+        derived = encode_derived_1x(pixels, derive_1x, lut, preserve_transparency,
+                                    convert_to_grayscale, pattern_path, pattern_blend,
+                                    out_folder, encode_mode, render_direct,
+                                    palette_index, decoded_store, outputs)
+        seconds, bytes_written = seconds + derived[0], bytes_written + derived[1]
+    return seconds, bytes_written, lut_box
+
+def colorize_variants(file_path, variants, palette_index=None,
+                      source_hash=None, decoded_store=None):
+    """Render one source file with many parameter sets.
+
+    Each variant is a dict of colorize_enhanced keyword arguments (color,
+    intensity, out_folder, thresholds, pattern...). The source is decoded
+    and reduced to its unique colors once (or read from palette_index);
+    each variant then only colorizes that small palette, scatters it back
+    and encodes. Output matches colorize_enhanced byte for byte. Returns a
+    (seconds, bytes) encode result per variant.
+    """
+    from .color_lut import get_color_lut
+
+    palette = palette_index.palette(file_path) if palette_index is not None else None
+    if palette is None:
+        pixels = load_working_pixels(file_path, source_hash, decoded_store)
+        if palette_index is not None:
+            palette = palette_index.add(file_path, pixels)
+        if palette is None:
+            palette = unique_colors(pixels) + (pixels.shape[:2],)
+        del pixels
+    codes, inverse, shape = palette
+
+    results = []
+    source_colors = unpack_rgba(codes).reshape(-1, 1, 4)
+    for variant in variants:
+        lut = get_color_lut(hex_to_rgb(variant['color']), variant['intensity'],
+                            variant['saturation'], variant['brightness'],
+                            variant.get('preserve_whites', True), variant.get('preserve_blacks', True),
+                            variant.get('white_threshold', 245), variant.get('black_threshold', 30))
+        colors = source_colors.copy()
+        if variant.get('convert_to_grayscale', False):
+            grayscale_pixels(colors)
+        lut.apply(colors, variant.get('preserve_transparency', True))
+        pixels = colors.reshape(-1, 4)[inverse].reshape(shape[0], shape[1], 4)
+
+        pattern_path = variant.get('pattern_path')
+        pattern_blend = variant.get('pattern_blend', 0)
+        if pattern_path and pattern_blend > 0:
+            pattern_pixels = get_pattern_pixels(pattern_path, (shape[1], shape[0]))
+            if pattern_pixels is not None:
+                band_rows = BAND_ROWS if shape[0] * shape[1] >= BAND_MIN_PIXELS else None
+                render_pixels(pixels, None, pattern_pixels=pattern_pixels,
+                              blend_amount=pattern_blend, band_rows=band_rows)
+
+        img = Image.frombuffer("RGBA", (shape[1], shape[0]), pixels, "raw", "RGBA", 0, 1)
+        seconds, bytes_written = save_image(img, variant['out_folder'] / file_path.name,
+                                            variant.get('encode_mode', 'default'))
+
+        derive = variant.get('derive_1x')
+        if derive is not None:
+            def render_direct():
+                kwargs = {key: value for key, value in variant.items() if key != 'derive_1x'}
+                return colorize_enhanced(derive['file_path'], input_dir=None,
+                                         palette_index=palette_index,
+                                         source_hash=derive['source_hash'],
+                                         decoded_store=decoded_store, **kwargs)[:2]
+
+            derived = encode_derived_1x(pixels, derive, lut, variant.get('preserve_transparency', True),
+                                        variant.get('convert_to_grayscale', False), pattern_path,
+                                        pattern_blend, variant['out_folder'],
+                                        variant.get('encode_mode', 'default'), render_direct,
+                                        palette_index, decoded_store)
+            seconds, bytes_written = seconds + derived[0], bytes_written + derived[1]
+        results.append((seconds, bytes_written))
+    return results
+
+def save_image(img, out_path, encode_mode='default', outputs=None):
+    """Encode img to out_path, or into memory onto outputs as (path, data)
+    when given. Returns (seconds, bytes)"""
+    if outputs is None:
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        return encode_image(img, out_path, encode_mode)
+    seconds, data = encode_image_bytes(img, out_path, encode_mode)
+    outputs.append((out_path, data))
+    return seconds, len(data)
+
+def encode_derived_1x(pixels, derive, lut, preserve_transparency, convert_to_grayscale,
+                      pattern_path, pattern_blend, out_folder, encode_mode, render_direct,
+                      palette_index=None, decoded_store=None, outputs=None):
+    """Write the 1x asset of a finished @2x render by downsampling it.
+
+    derive holds the 1x source's file_path and source_hash and the
+    tolerance for derive_1x_pixels. When the derived pixels are rejected,
+    render_direct() renders the 1x source as usual. Returns (seconds, bytes)
+    spent encoding.
+    """
+    small = derive_1x_pixels(pixels, derive, lut, preserve_transparency,
+                             convert_to_grayscale, pattern_path, pattern_blend,
+                             palette_index, decoded_store)
+    if small is None:
+        return render_direct()
+    return save_image(Image.fromarray(small, "RGBA"), out_folder / derive['file_path'].name,
+                      encode_mode, outputs)
+
+def derive_1x_pixels(pixels, derive, lut, preserve_transparency=True,
+                     convert_to_grayscale=False, pattern_path=None, pattern_blend=0,
+                     palette_index=None, decoded_store=None):
+    """Downsample @2x output pixels into the matching 1x asset.
+
+    A sample of the 1x source is colorized directly and compared with the
+    derived pixels on premultiplied RGBA. Returns the 1x array, or None
+    when the sizes don't pair up or the mean difference per channel is
+    above derive['tolerance'].
+    """
+    file_path = derive['file_path']
+    palette = palette_index.palette(file_path) if palette_index is not None else None
+    if palette is not None:
+        height, width = palette[2]
+    else:
+        with Image.open(file_path) as img:
+            width, height = img.size
+    if (pixels.shape[1], pixels.shape[0]) != (width * 2, height * 2):
+        print(f"{file_path.name}: not half the size of its @2x, rendering it directly")
+        return None
 
+    # Spread the sample evenly over the 1x image
+    sample = np.unique(np.linspace(0, width * height - 1,
+                                   min(DERIVE_SAMPLE_PIXELS, width * height)).astype(np.int64))
+    if palette is not None:
+        codes = palette[0][palette[1][sample]]
+        expected = unpack_rgba(codes).reshape(-1, 1, 4)
+    else:
+        source = load_source_pixels(file_path, decoded_store, derive['source_hash'])
+        expected = source.reshape(-1, 4)[sample].reshape(-1, 1, 4)
+    if convert_to_grayscale:
+        grayscale_pixels(expected)
+    lut.apply(expected, preserve_transparency)
+    if pattern_path and pattern_blend > 0:
+        pattern_pixels = get_pattern_pixels(pattern_path, (width, height))
+        if pattern_pixels is not None:
+            blend_pixels(expected, pattern_pixels.reshape(-1, 4)[sample].reshape(-1, 1, 4),
+                         pattern_blend)
+
+    # Pillow resamples RGBA premultiplied, so transparent pixels don't bleed
+    img = Image.frombuffer("RGBA", (pixels.shape[1], pixels.shape[0]), pixels, "raw", "RGBA", 0, 1)
+    small = np.array(img.resize((width, height), Image.LANCZOS))
+
+    difference = np.abs(_premultiplied(small.reshape(-1, 4)[sample]) -
+                        _premultiplied(expected.reshape(-1, 4))).mean()
+    if difference > derive['tolerance']:
+        print(f"{file_path.name}: derived 1x is {difference:.2f} off a direct render, "
+              f"rendering it directly")
+        return None
+    return small
+
+def _premultiplied(pixels):
+    pixels = pixels.astype(np.float32)
+    return np.concatenate([pixels[:, :3] * pixels[:, 3:] / 255, pixels[:, 3:]], axis=1)
+
+def colorize_image(img, lut, preserve_transparency=True, convert_to_grayscale=False):
+    """Colorize a decoded RGBA image through a ColorLUT"""
     if convert_to_grayscale:
         # Convert to grayscale but keep alpha
         gray = ImageOps.grayscale(img)
         img = Image.merge("RGBA", (gray, gray, gray, img.getchannel("A")))
 
-    r_col, g_col, b_col = hex_to_rgb(color)
-    pixels = img.load()
+    pixels = np.array(img)
+    lut.apply(pixels, preserve_transparency)
+    return Image.fromarray(pixels, "RGBA")
 
-    for y in range(img.height):
-        for x in range(img.width):
-            r, g, b, a = pixels[x, y]
+def colorize_pixels(pixels, rgb_color, intensity, saturation, brightness,
+                    preserve_transparency=True, preserve_whites=True,
+                    preserve_blacks=True, white_threshold=245, black_threshold=30):
+    """Tint an RGBA uint8 array in place, whole image at a time.
 
-            # Preserve transparency if enabled
-            if preserve_transparency and a == 0:
-                continue
+    Same result as the old per-pixel loop: round() on the tint, int()
+    truncation in hsv_to_rgb and inclusive white/black thresholds.
+    """
+    r = pixels[..., 0]
+    g = pixels[..., 1]
+    b = pixels[..., 2]
 
-            # Skip white/black pixels if preservation is enabled
-            if preserve_whites and is_white_pixel(r, g, b, white_threshold):
-                continue
-            if preserve_blacks and is_black_pixel(r, g, b, black_threshold):
-                continue
+    # Pixels left untouched
+    skip = np.zeros(pixels.shape[:-1], dtype=bool)
+    if preserve_transparency:
+        skip |= pixels[..., 3] == 0
+    if preserve_whites:
+        skip |= (r >= white_threshold) & (g >= white_threshold) & (b >= white_threshold)
+    if preserve_blacks:
+        skip |= (r <= black_threshold) & (g <= black_threshold) & (b <= black_threshold)
 
-            # Apply color tinting
-            r_new = round(r*(1-intensity) + r_col*intensity)
-            g_new = round(g*(1-intensity) + g_col*intensity)
-            b_new = round(b*(1-intensity) + b_col*intensity)
+    selected = ~skip
+    if not selected.any():
+        return pixels
 
-            # Apply saturation and brightness adjustments
-            r_new, g_new, b_new = adjust_color_hsv(r_new, g_new, b_new, saturation, brightness)
+    src = pixels[selected]
+    channels = src[:, :3].astype(np.float64)
+    r_col, g_col, b_col = rgb_color
 
-            # Clamp values
-            r_new = max(0, min(255, r_new))
-            g_new = max(0, min(255, g_new))
-            b_new = max(0, min(255, b_new))
+    # Apply color tinting (np.rint rounds half to even like round())
+    r_new = np.rint(channels[:, 0] * (1 - intensity) + r_col * intensity)
+    g_new = np.rint(channels[:, 1] * (1 - intensity) + g_col * intensity)
+    b_new = np.rint(channels[:, 2] * (1 - intensity) + b_col * intensity)
 
-            pixels[x, y] = (r_new, g_new, b_new, a)
+    # Apply saturation and brightness adjustments
+    r_new, g_new, b_new = adjust_color_hsv_array(r_new, g_new, b_new, saturation, brightness)
 
-    # Apply pattern if specified
-    if pattern_path and pattern_blend > 0:
-        img = apply_pattern_overlay(img, pattern_path, pattern_blend)
-
-    out_path = out_folder / file_path.name
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
-
-def apply_pattern_overlay(img, pattern_path, blend_amount):
-    """Apply a pattern overlay to an image"""
-    try:
-        pattern = Image.open(pattern_path).convert("RGBA")
-        pattern = pattern.resize(img.size, Image.LANCZOS)
-
-        # Blend pattern with image
-        blended = Image.blend(img, pattern, blend_amount)
-        return blended
-    except Exception as e:
-        print(f"Error applying pattern: {e}")
-        return img
+    # Clamp values
+    src[:, 0] = np.clip(r_new, 0, 255)
+    src[:, 1] = np.clip(g_new, 0, 255)
+    src[:, 2] = np.clip(b_new, 0, 255)
+    pixels[selected] = src
+    return pixels
+
+def get_band_pool():
+    """Shared thread pool for band processing (NumPy releases the GIL)"""
+    global _band_pool
+    with _band_pool_lock:
+        if _band_pool is None:
+            _band_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1,
+                                            thread_name_prefix="band")
+        return _band_pool
+
+def for_each_band(height, fn, band_rows=BAND_ROWS):
+    """Call fn(start, stop) for every row band, spread across the band pool.
+
+    band_rows=None processes the whole height as one band on this thread.
+    """
+    band_rows = band_rows or max(height, 1)
+    bands = [(start, min(start + band_rows, height))
+             for start in range(0, height, band_rows)]
+    if len(bands) <= 1:
+        for start, stop in bands:
+            fn(start, stop)
+        return
+
+    futures = [get_band_pool().submit(fn, start, stop) for start, stop in bands]
+    for future in futures:
+        future.result()
+
+def is_large_image(size):
+    """Check whether an image of size (width, height) should be band-processed"""
+    width, height = size
+    return width * height >= BAND_MIN_PIXELS
+
+def load_rgba_bands(file_path, band_rows=None):
+    """Decode an image into a single RGBA array, converting band by band.
+
+    Pillow decodes the whole file up front, so the decoded image is held in
+    full next to the RGBA array; the bands only spread the RGBA conversion
+    over the band pool. band_rows defaults to BAND_ROWS for large images
+    and a single band otherwise.
+    """
+    with Image.open(file_path) as img:
+        img.load()
+        if band_rows is None and is_large_image(img.size):
+            band_rows = BAND_ROWS
+        pixels = np.empty((img.height, img.width, 4), dtype=np.uint8)
+
+        def convert_band(start, stop):
+            band = img.crop((0, start, img.width, stop)).convert("RGBA")
+            pixels[start:stop] = np.asarray(band)
+
+        for_each_band(img.height, convert_band, band_rows)
+    return pixels
+
+def load_working_pixels(file_path, source_hash=None, decoded_store=None, source_bytes=None):
+    """Writable RGBA pixels of a source file for colorize_enhanced.
+
+    With the source's content hash, pixels come from this process's asset
+    cache, then from decoded_store, and the file is only decoded when
+    neither has them. Whatever is read is kept in both for later runs.
+    source_bytes, when given, is decoded instead of reading file_path.
+    """
+    asset_cache = get_asset_cache()
+    use_memory = bool(source_hash) and asset_cache.max_bytes > 0
+    if use_memory:
+        cached = asset_cache.get(source_hash)
+        if cached is not None:
+            return cached.copy()
+
+    pixels = None
+    if decoded_store is not None and source_hash:
+        pixels = decoded_store.load(source_hash)
+    if pixels is None:
+        # Large images are converted to RGBA in row bands on the band pool
+        pixels = load_rgba_bands(io.BytesIO(source_bytes) if source_bytes is not None else file_path)
+        if decoded_store is not None and source_hash:
+            decoded_store.save(source_hash, pixels)
+
+    if use_memory:
+        return asset_cache.put(source_hash, np.array(pixels)).copy()
+    return pixels
+
+def opaque_box(pixels):
+    """(top, bottom, left, right) bounds of the pixels with non-zero alpha,
+    an empty box for a fully transparent image"""
+    alpha = pixels[..., 3]
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if not len(rows):
+        return (0, 0, 0, 0)
+    cols = np.flatnonzero(alpha[rows[0]:rows[-1] + 1].any(axis=0))
+    return (int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1)
+
+def grayscale_pixels(pixels):
+    """Replace RGB with Pillow's "L" luma in place, keeping alpha"""
+    rgb = pixels[..., :3].astype(np.uint32)
+    gray = (rgb[..., 0] * 19595 + rgb[..., 1] * 38470 + rgb[..., 2] * 7471 + 0x8000) >> 16
+    pixels[..., :3] = gray[..., None]
+    return pixels
+
+def blend_pixels(pixels, pattern_pixels, blend_amount):
+    """Image.blend in place on uint8 arrays, using Pillow's float32 math"""
+    alpha = np.float32(blend_amount)
+    diff = (pattern_pixels.astype(np.int16) - pixels).astype(np.float32)
+    np.copyto(pixels, pixels.astype(np.float32) + alpha * diff, casting="unsafe")
+    return pixels
+
+def render_pixels(pixels, lut=None, preserve_transparency=True,
+                  convert_to_grayscale=False, pattern_pixels=None,
+                  blend_amount=0, band_rows=BAND_ROWS, lut_box=None):
+    """Run every per-pixel stage on an RGBA array in place, band by band.
+
+    Each band is grayscaled, colorized through the LUT and blended with the
+    pattern while it is still in cache, giving the same bytes as running the
+    steps one after another over whole images. lut_box limits the LUT to a
+    (top, bottom, left, right) box, e.g. the opaque box of pixels whose
+    transparency is preserved.
+    """
+    def render_band(start, stop):
+        band = pixels[start:stop]
+        if lut is not None:
+            if convert_to_grayscale:
+                grayscale_pixels(band)
+            if lut_box is None:
+                lut.apply(band, preserve_transparency)
+            else:
+                top, bottom, left, right = lut_box
+                top, bottom = max(top, start) - start, min(bottom, stop) - start
+                if top < bottom and left < right:
+                    lut.apply(band[top:bottom, left:right], preserve_transparency)
+        if pattern_pixels is not None:
+            blend_pixels(band, pattern_pixels[start:stop], blend_amount)
+
+    for_each_band(pixels.shape[0], render_band, band_rows)
+    return pixels
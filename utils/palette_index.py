@@ -0,0 +1,163 @@
+import io
+import json
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from .file_utils import get_cache_dir, write_file_atomic
+
+PALETTE_INDEX_DIR = 'palette_index'
+
+# Theme-wide index written by earlier versions, removed when found
+LEGACY_INDEX_FILE = 'palette_index.npz'
+
+# Files with more unique colors than this per pixel gain little from being
+# recolored through their palette, so they are rendered pixel by pixel
+MAX_COLOR_RATIO = 0.25
+
+# Pixels looked at to estimate a file's colors per pixel before indexing it
+RATIO_SAMPLE_PIXELS = 1 << 16
+
+
+def pack_rgba(pixels):
+    """Pack an (..., 4) uint8 array into 32-bit RGBA codes"""
+    pixels = pixels.astype(np.uint32)
+    return (pixels[..., 0] | (pixels[..., 1] << 8) |
+            (pixels[..., 2] << 16) | (pixels[..., 3] << 24))
+
+
+def unpack_rgba(codes):
+    """Unpack 32-bit RGBA codes into an (N, 4) uint8 array"""
+    codes = np.asarray(codes, dtype=np.uint32)
+    return np.stack([(codes >> shift) & 0xFF for shift in (0, 8, 16, 24)],
+                    axis=-1).astype(np.uint8)
+
+
+def _smallest_index_dtype(count):
+    if count <= 1 << 8:
+        return np.uint8
+    if count <= 1 << 16:
+        return np.uint16
+    return np.uint32
+
+
+def unique_colors(pixels):
+    """Unique RGBA codes of pixels and the inverse index rebuilding them"""
+    codes, inverse = np.unique(pack_rgba(pixels).reshape(-1), return_inverse=True)
+    return codes, inverse.reshape(-1).astype(_smallest_index_dtype(len(codes)))
+
+
+class PaletteIndex:
+    """Unique RGBA colors and inverse indices of a theme's source files.
+
+    Every pixel transform in colorize_enhanced is a function of the pixel's
+    own RGBA value, so a file can be recolored by transforming its unique
+    colors and scattering them back through its inverse index. Each file
+    has its own compressed entry under the theme's .colorizer folder,
+    added by whichever process renders the file first, so workers only
+    read the entries of the files they render. Files with many colors per
+    pixel, or whose entry would be bigger than the source file, are only
+    recorded as not indexed.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    @classmethod
+    def for_theme(cls, theme_dir):
+        cache_dir = get_cache_dir(theme_dir)
+        (cache_dir / LEGACY_INDEX_FILE).unlink(missing_ok=True)
+        return cls(cache_dir / PALETTE_INDEX_DIR)
+
+    def _entry_path(self, file_path):
+        return self.root / f"{file_path.name}.npz"
+
+    def _read(self, file_path):
+        """(meta, codes, inverse) of a file's current entry, or None when it
+        has none or the file changed since"""
+        try:
+            stat = file_path.stat()
+            with np.load(self._entry_path(file_path), allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if meta['size'] != stat.st_size or meta['mtime_ns'] != stat.st_mtime_ns:
+                    return None
+                if not meta['indexed']:
+                    return meta, None, None
+                return meta, data['codes'], data['inverse']
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error reading palette index of {file_path.name}: {e}")
+            return None
+
+    def _write(self, file_path, stat, shape, codes=None, inverse=None):
+        meta = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'width': shape[1],
+            'height': shape[0],
+            'indexed': codes is not None,
+        }
+        arrays = {'meta': np.array(json.dumps(meta))}
+        if codes is not None:
+            arrays.update(codes=codes, inverse=inverse)
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        data = buffer.getvalue()
+        if codes is not None and len(data) > stat.st_size:
+            # Reading it back would cost more than decoding the source
+            return self._write(file_path, stat, shape)
+        try:
+            self.root.mkdir(exist_ok=True)
+            write_file_atomic(self._entry_path(file_path), data)
+        except OSError as e:
+            print(f"Error saving palette index of {file_path.name}: {e}")
+
+    def palette(self, file_path):
+        """(codes, inverse, (height, width)) of an indexed file, or None"""
+        entry = self._read(file_path)
+        if entry is None or entry[1] is None:
+            return None
+        meta, codes, inverse = entry
+        return codes, inverse, (meta['height'], meta['width'])
+
+    def is_current(self, file_path):
+        """Check whether a file can be recolored from its entry"""
+        return self.palette(file_path) is not None
+
+    def add(self, file_path, pixels):
+        """Index a file from its decoded pixels unless its entry is current.
+        Returns the palette to recolor it with, or None when the file isn't
+        worth indexing"""
+        entry = self._read(file_path)
+        if entry is not None:
+            meta, codes, inverse = entry
+            return None if codes is None else (codes, inverse, (meta['height'], meta['width']))
+
+        stat = file_path.stat()
+        shape = pixels.shape[:2]
+        # A sample turns away photos and noisy gradients without sorting
+        # every pixel; it can only make a file look more colorful, so files
+        # near the limit are skipped rather than indexed
+        step = max(1, shape[0] * shape[1] // RATIO_SAMPLE_PIXELS)
+        sample = pack_rgba(pixels.reshape(-1, 4)[::step])
+        if len(np.unique(sample)) > MAX_COLOR_RATIO * len(sample):
+            self._write(file_path, stat, shape)
+            return None
+        codes, inverse = unique_colors(pixels)
+        if len(codes) > MAX_COLOR_RATIO * inverse.size:
+            self._write(file_path, stat, shape)
+        else:
+            self._write(file_path, stat, shape, codes, inverse)
+        return codes, inverse, shape
+
+
+def remap_palette(palette, transform):
+    """Recolor a file from its palette into a new RGBA uint8 array.
+
+    transform takes and returns an RGBA image and must be per-pixel; it only
+    sees the file's unique colors.
+    """
+    codes, inverse, (height, width) = palette
+    colors_img = Image.fromarray(unpack_rgba(codes).reshape(-1, 1, 4), "RGBA")
+    colors = np.array(transform(colors_img)).reshape(-1, 4)
+    return colors[inverse].reshape(height, width, 4)
@@ -0,0 +1,453 @@
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from .image_processing import colorize_enhanced, colorize_variants
+from .asset_cache import get_asset_cache
+from .color_lut import LUT_CACHE_SIZE, set_lut_cache_size
+from .file_utils import write_file_atomic
+
+# Source files read ahead of the compute stage, and encoded files waiting to
+# be written, in a pipelined run
+DEFAULT_READ_AHEAD = 8
+DEFAULT_WRITE_BEHIND = 8
+
+_DONE = object()
+
+
+def default_worker_count():
+    """Number of worker processes to use when none is configured"""
+    return os.cpu_count() or 1
+
+
+def resolve_file_jobs(files, process_folder, color, variations=None,
+                      manual_colors=None, pattern_path=None, pattern_blend=0,
+                      pattern_filters=None):
+    """Work out the color and pattern to use for each file"""
+    jobs = []
+    for i, file in enumerate(files):
+        # Determine which color to use for this file
+        file_color = color  # Default to the main selected color
+
+        if variations:
+            # Use different color variation for each file (cyclic)
+            file_color = variations[i % len(variations)]
+
+        # Manual overrides win, by file name or by path relative to the theme
+        final_color_for_file = file_color
+        if manual_colors and file.name in manual_colors:
+            final_color_for_file = manual_colors[file.name]
+        relative_file_path = file.relative_to(process_folder).as_posix()
+        if manual_colors and relative_file_path in manual_colors:
+            final_color_for_file = manual_colors[relative_file_path]
+
+        # Check if pattern should be applied to this file
+        apply_pattern_to_file = False
+        if pattern_path and pattern_filters:
+            for pattern_filter in pattern_filters:
+                if file.name.startswith(pattern_filter.split(': ')[1]):  # Compare with just the filename part
+                    apply_pattern_to_file = True
+                    break
+
+        jobs.append({
+            'file_path': file,
+            'color': final_color_for_file,
+            'pattern_path': pattern_path if apply_pattern_to_file else None,
+            'pattern_blend': pattern_blend if apply_pattern_to_file else 0,
+        })
+    return jobs
+
+
+def _init_worker(asset_cache_bytes=None, lut_cache_size=None):
+    # Ctrl+C is handled by the parent, which cancels between files
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if asset_cache_bytes is not None:
+        get_asset_cache().set_budget(asset_cache_bytes)
+    if lut_cache_size is not None:
+        set_lut_cache_size(lut_cache_size)
+
+
+def create_pool(workers=None, asset_cache_bytes=None):
+    """Process pool for submit_file_jobs. Each worker keeps up to
+    asset_cache_bytes of decoded sources in memory, which a long-lived
+    pool reuses from one run to the next. The workers share LUT_CACHE_SIZE
+    color tables, so the pool holds no more of them than one process"""
+    workers = workers or default_worker_count()
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(asset_cache_bytes, LUT_CACHE_SIZE // workers))
+
+
+def _render_job(job, options, palette_index=None, render_cache=None):
+    """Colorize one file, going through the render cache when the job has a
+    cache_key. Returns (cache hit, encode seconds, bytes written, seconds,
+    opaque box measured or None)"""
+    start = time.perf_counter()
+    job = dict(job)
+    cache_key = job.pop('cache_key', None)
+    out_path = options['out_folder'] / job['file_path'].name
+    if render_cache is not None and cache_key is not None:
+        bytes_written = _fetch_render(render_cache, cache_key, out_path, job.get('derive_1x'))
+        if bytes_written is not None:
+            return True, 0.0, bytes_written, time.perf_counter() - start, None
+
+    encode_seconds, bytes_written, alpha_box = colorize_enhanced(
+        **job, **options, palette_index=palette_index)
+    if render_cache is not None and cache_key is not None:
+        _store_render(render_cache, cache_key, out_path, job.get('derive_1x'))
+    return False, encode_seconds, bytes_written, time.perf_counter() - start, alpha_box
+
+
+def _fetch_render(render_cache, cache_key, out_path, derive_1x=None):
+    """Copy a cached render, and the 1x derived with it, to out_path's
+    folder. Returns the bytes copied, or None unless both were cached"""
+    if not render_cache.fetch(cache_key, out_path):
+        return None
+    bytes_written = out_path.stat().st_size
+    if derive_1x is not None:
+        small_path = out_path.parent / derive_1x['file_path'].name
+        if not render_cache.fetch(derive_1x['cache_key'], small_path):
+            return None
+        bytes_written += small_path.stat().st_size
+    return bytes_written
+
+
+def _store_render(render_cache, cache_key, out_path, derive_1x=None):
+    render_cache.store(cache_key, out_path)
+    if derive_1x is not None:
+        render_cache.store(derive_1x['cache_key'], out_path.parent / derive_1x['file_path'].name)
+
+
+def _render_variants(file_path, variants, palette_index=None, render_cache=None,
+                     source_hash=None, decoded_store=None):
+    """Render one source for several (cache_key, colorize kwargs) variants,
+    serving what it can from render_cache. Returns a result tuple per variant
+    like _render_job, splitting the shared render time between variants"""
+    results = [None] * len(variants)
+    todo = []
+    for i, (cache_key, kwargs) in enumerate(variants):
+        out_path = kwargs['out_folder'] / file_path.name
+        start = time.perf_counter()
+        bytes_written = None
+        if render_cache is not None and cache_key:
+            bytes_written = _fetch_render(render_cache, cache_key, out_path, kwargs.get('derive_1x'))
+        if bytes_written is not None:
+            results[i] = (True, 0.0, bytes_written, time.perf_counter() - start, None)
+        else:
+            todo.append(i)
+
+    if todo:
+        start = time.perf_counter()
+        encoded = colorize_variants(file_path, [variants[i][1] for i in todo], palette_index,
+                                    source_hash, decoded_store)
+        share = (time.perf_counter() - start) / len(todo)
+        for i, (encode_seconds, bytes_written) in zip(todo, encoded):
+            cache_key, kwargs = variants[i]
+            if render_cache is not None and cache_key:
+                _store_render(render_cache, cache_key, kwargs['out_folder'] / file_path.name,
+                              kwargs.get('derive_1x'))
+            results[i] = (False, encode_seconds, bytes_written, share, None)
+    return results
+
+
+def submit_variant_jobs(executor, groups, render_cache=None):
+    """Queue one task per source file that renders all its variants.
+
+    groups holds dicts with file_path, source_hash, palette_index,
+    decoded_store and variants, a list of (cache_key, colorize kwargs).
+    Returns one future per group resolving to a list of per-variant results.
+    """
+    return [executor.submit(_render_variants, group['file_path'], group['variants'],
+                            group['palette_index'], render_cache, group['source_hash'],
+                            group['decoded_store'])
+            for group in groups]
+
+
+def submit_file_jobs(executor, jobs, options, palette_index=None, render_cache=None):
+    """Queue jobs on a pool from create_pool. Returns one future per job,
+    each resolving to (cache hit, encode seconds, bytes written, seconds)"""
+    return [executor.submit(_render_job, job, options, palette_index, render_cache)
+            for job in jobs]
+
+
+def new_run_stats():
+    return {'files': 0, 'cache_hits': 0, 'encode_seconds': 0.0, 'bytes_written': 0,
+            'render_seconds': 0.0}
+
+
+def add_run_result(stats, result, render_cache=None):
+    """Add one file's result to run stats. Pass render_cache for results
+    from pool workers, which count hits on their own copies of the cache"""
+    hit, encode_seconds, bytes_written, seconds, _ = result
+    stats['files'] += 1
+    stats['cache_hits'] += hit
+    stats['encode_seconds'] += encode_seconds
+    stats['bytes_written'] += bytes_written
+    stats['render_seconds'] += seconds
+    if render_cache is not None:
+        if hit:
+            render_cache.hits += 1
+        else:
+            render_cache.misses += 1
+
+
+def colorize_files(jobs, options, workers=None, progress_callback=None,
+                   palette_index=None, check_cancelled=None, render_cache=None,
+                   file_callback=None, executor=None):
+    """Run colorize_enhanced for every job, in parallel when workers > 1.
+
+    options holds the keyword arguments shared by every file (intensity,
+    out_folder, thresholds...). progress_callback(done, total) is called in
+    job order as files complete. check_cancelled is called after each file
+    and may raise to stop; files not started yet are then dropped. Jobs with
+    a cache_key are served from render_cache when possible, and its hit and
+    miss counters are updated. file_callback(job, result) sees each file's
+    result tuple as it completes. executor is a pool from create_pool to
+    run on instead of a new one; it is left running afterwards.
+
+    Returns a dict of run stats: files rendered, cache hits, the time spent
+    rendering and encoding, and bytes written.
+    """
+    total = len(jobs)
+    workers = min(workers or default_worker_count(), total)
+    stats = new_run_stats()
+
+    if workers <= 1 and executor is None:
+        for i, job in enumerate(jobs):
+            result = _render_job(job, options, palette_index, render_cache)
+            add_run_result(stats, result)
+            if file_callback:
+                file_callback(job, result)
+            if progress_callback:
+                progress_callback(i + 1, total)
+            if check_cancelled:
+                check_cancelled()
+        return stats
+
+    own_pool = executor is None
+    if own_pool:
+        # A one-off pool can't reuse decoded sources, so don't keep them
+        executor = create_pool(workers, asset_cache_bytes=0)
+    futures = submit_file_jobs(executor, jobs, options, palette_index, render_cache)
+    try:
+        for i, future in enumerate(futures):
+            result = future.result()
+            add_run_result(stats, result, render_cache if 'cache_key' in jobs[i] else None)
+            if file_callback:
+                file_callback(jobs[i], result)
+            if progress_callback:
+                progress_callback(i + 1, total)
+            if check_cancelled:
+                check_cancelled()
+    except BaseException:
+        # Don't start queued files; running ones finish before we return
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        raise
+    finally:
+        if own_pool:
+            executor.shutdown(wait=True)
+    return stats
+
+
+class StageStats:
+    """Time a pipeline stage's threads spend working, starved for input and
+    blocked on a full output queue"""
+
+    def __init__(self, threads):
+        self.threads = threads
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, busy=0.0, starved=0.0, blocked=0.0, items=0):
+        with self._lock:
+            self.busy += busy
+            self.starved += starved
+            self.blocked += blocked
+            self.items += items
+
+    def summary(self, wall_seconds):
+        """Shares of the stage's thread time over a run of wall_seconds"""
+        capacity = max(wall_seconds * self.threads, 1e-9)
+        return {
+            'threads': self.threads,
+            'items': self.items,
+            'busy_seconds': self.busy,
+            'utilization': self.busy / capacity,
+            'starved': self.starved / capacity,
+            'blocked': self.blocked / capacity,
+        }
+
+
+def _needs_source(job, palette_index=None, decoded_store=None):
+    """Check whether rendering job will decode its source file"""
+    if palette_index is not None and palette_index.is_current(job['file_path']):
+        return False
+    source_hash = job.get('source_hash')
+    if source_hash:
+        asset_cache = get_asset_cache()
+        if asset_cache.max_bytes > 0 and source_hash in asset_cache:
+            return False
+        if decoded_store is not None and source_hash in decoded_store:
+            return False
+    return True
+
+
+def run_pipeline(jobs, options, workers=None, progress_callback=None,
+                 palette_index=None, check_cancelled=None, render_cache=None,
+                 file_callback=None, read_ahead=DEFAULT_READ_AHEAD,
+                 write_behind=DEFAULT_WRITE_BEHIND):
+    """Run colorize_enhanced for every job as a three-stage pipeline.
+
+    A reader thread copies render cache hits and loads source files into
+    memory, up to read_ahead files ahead; `workers` compute threads decode,
+    colorize and encode in memory; a writer thread flushes up to
+    write_behind encoded files to disk. Everything runs in this process, so
+    disk waits overlap with pixel work. Takes the same arguments as
+    colorize_files and returns its run stats plus a 'stages' dict of
+    StageStats summaries. Progress is reported as files complete.
+    """
+    total = len(jobs)
+    workers = max(1, min(workers or default_worker_count(), total))
+    stats = new_run_stats()
+    stages = {'read': StageStats(1), 'compute': StageStats(workers), 'write': StageStats(1)}
+    read_queue = queue.Queue(maxsize=max(read_ahead, 1))
+    write_queue = queue.Queue(maxsize=max(write_behind, 1))
+    done_queue = queue.Queue()
+    stop = threading.Event()
+    compute_left = [workers]
+    compute_lock = threading.Lock()
+    decoded_store = options.get('decoded_store')
+
+    def put(q, item, stage):
+        start = time.perf_counter()
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        stage.add(blocked=time.perf_counter() - start)
+
+    def get(q, stage):
+        start = time.perf_counter()
+        item = _DONE
+        while not stop.is_set():
+            try:
+                item = q.get(timeout=0.1)
+                break
+            except queue.Empty:
+                pass
+        stage.add(starved=time.perf_counter() - start)
+        return item
+
+    def read():
+        try:
+            for i, job in enumerate(jobs):
+                if stop.is_set():
+                    break
+                start = time.perf_counter()
+                job = dict(job)
+                cache_key = job.pop('cache_key', None)
+                bytes_written = None
+                if render_cache is not None and cache_key is not None:
+                    out_path = options['out_folder'] / job['file_path'].name
+                    bytes_written = _fetch_render(render_cache, cache_key, out_path,
+                                                  job.get('derive_1x'))
+                source_bytes = None
+                if bytes_written is None and _needs_source(job, palette_index, decoded_store):
+                    source_bytes = job['file_path'].read_bytes()
+                seconds = time.perf_counter() - start
+                stages['read'].add(busy=seconds, items=1)
+
+                if bytes_written is not None:
+                    done_queue.put((i, (True, 0.0, bytes_written, seconds, None)))
+                else:
+                    put(read_queue, (i, job, cache_key, source_bytes, seconds), stages['read'])
+        except BaseException as e:
+            done_queue.put((None, e))
+        finally:
+            for _ in range(workers):
+                put(read_queue, _DONE, stages['read'])
+
+    def compute():
+        try:
+            while True:
+                item = get(read_queue, stages['compute'])
+                if item is _DONE:
+                    break
+                i, job, cache_key, source_bytes, seconds = item
+                start = time.perf_counter()
+                outputs = []
+                try:
+                    encode_seconds, bytes_written, alpha_box = colorize_enhanced(
+                        **job, **options, palette_index=palette_index,
+                        source_bytes=source_bytes, outputs=outputs)
+                except Exception as e:
+                    # Sources decoded from memory don't name the file
+                    raise Exception(f"{job['file_path'].name}: {e}") from e
+                busy = time.perf_counter() - start
+                stages['compute'].add(busy=busy, items=1)
+                result = (False, encode_seconds, bytes_written, seconds + busy, alpha_box)
+                put(write_queue, (i, job, cache_key, outputs, result), stages['compute'])
+        except BaseException as e:
+            done_queue.put((None, e))
+        finally:
+            with compute_lock:
+                compute_left[0] -= 1
+                last = compute_left[0] == 0
+            if last:
+                put(write_queue, _DONE, stages['compute'])
+
+    def write():
+        try:
+            while True:
+                item = get(write_queue, stages['write'])
+                if item is _DONE:
+                    break
+                i, job, cache_key, outputs, result = item
+                start = time.perf_counter()
+                for path, data in outputs:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    write_file_atomic(path, data)
+                if render_cache is not None and cache_key is not None:
+                    _store_render(render_cache, cache_key, options['out_folder'] / job['file_path'].name,
+                                  job.get('derive_1x'))
+                busy = time.perf_counter() - start
+                stages['write'].add(busy=busy, items=1)
+                hit, encode_seconds, bytes_written, seconds, alpha_box = result
+                done_queue.put((i, (hit, encode_seconds, bytes_written, seconds + busy, alpha_box)))
+        except BaseException as e:
+            done_queue.put((None, e))
+
+    threads = ([threading.Thread(target=read, daemon=True)] +
+               [threading.Thread(target=compute, daemon=True) for _ in range(workers)] +
+               [threading.Thread(target=write, daemon=True)])
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    try:
+        for done in range(1, total + 1):
+            i, result = done_queue.get()
+            if i is None:
+                raise result
+            add_run_result(stats, result)
+            if file_callback:
+                file_callback(jobs[i], result)
+            if progress_callback:
+                progress_callback(done, total)
+            if check_cancelled:
+                check_cancelled()
+    finally:
+        # Files in flight finish; nothing new is started
+        stop.set()
+        for thread in threads:
+            thread.join()
+    wall_seconds = time.perf_counter() - start
+    stats['stages'] = {name: stage.summary(wall_seconds) for name, stage in stages.items()}
+    return stats
@@ -0,0 +1,88 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from PIL import Image
+from .file_utils import file_digest
+
+# Upper bound on the resized patterns kept in memory. A 4096x4096 RGBA
+# variant is 64 MB, so this holds a few of the largest Mica sizes.
+PATTERN_CACHE_BYTES = 256 * 1024 * 1024
+
+_digests = {}                   # (path, size, mtime_ns) -> content hash
+_sources = OrderedDict()        # content hash -> decoded RGBA pattern
+_resized = OrderedDict()        # (content hash, size) -> RGBA array
+_resized_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def _pattern_digest(pattern_path):
+    """Content hash of a pattern, only re-read when the file changes"""
+    stat = os.stat(pattern_path)
+    key = (str(pattern_path), stat.st_size, stat.st_mtime_ns)
+    with _cache_lock:
+        digest = _digests.get(key)
+    if digest is None:
+        digest = file_digest(pattern_path)
+        with _cache_lock:
+            _digests[key] = digest
+    return digest
+
+
+def _decoded_pattern(digest, pattern_path):
+    with _cache_lock:
+        pattern = _sources.get(digest)
+        if pattern is not None:
+            _sources.move_to_end(digest)
+            return pattern
+
+    pattern = Image.open(pattern_path).convert("RGBA")
+    with _cache_lock:
+        _sources[digest] = pattern
+        # Only the current pattern or two are worth keeping decoded
+        while len(_sources) > 2:
+            _sources.popitem(last=False)
+    return pattern
+
+
+def get_pattern_pixels(pattern_path, size):
+    """Pattern resized to size as a read-only RGBA array, or None on error.
+
+    The pattern is decoded once and each target size is resized once;
+    files sharing dimensions reuse the same array.
+    """
+    global _resized_bytes
+    try:
+        digest = _pattern_digest(pattern_path)
+        key = (digest, tuple(size))
+        with _cache_lock:
+            pixels = _resized.get(key)
+            if pixels is not None:
+                _resized.move_to_end(key)
+                return pixels
+
+        pattern = _decoded_pattern(digest, pattern_path)
+        pixels = np.asarray(pattern.resize(size, Image.LANCZOS))
+        pixels.flags.writeable = False
+    except Exception as e:
+        print(f"Error applying pattern: {e}")
+        return None
+
+    with _cache_lock:
+        if key not in _resized:
+            _resized[key] = pixels
+            _resized_bytes += pixels.nbytes
+            while _resized_bytes > PATTERN_CACHE_BYTES and len(_resized) > 1:
+                _, evicted = _resized.popitem(last=False)
+                _resized_bytes -= evicted.nbytes
+    return pixels
+
+
+def clear_pattern_cache():
+    """Drop every decoded and resized pattern"""
+    global _resized_bytes
+    with _cache_lock:
+        _digests.clear()
+        _sources.clear()
+        _resized.clear()
+        _resized_bytes = 0
@@ -0,0 +1,100 @@
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from .file_utils import temp_path
+
+# Pillow save() options per encoding mode. Only PNG outputs are affected;
+# every mode writes the same pixels.
+ENCODE_MODES = {
+    'default': {},
+    'fast': {'compress_level': 1},
+    'optimize': {'optimize': True},
+}
+
+
+def encode_image(img, out_path, mode='default'):
+    """Save img with the mode's encoder settings. Returns (seconds, bytes).
+
+    The image is written under a temp name and renamed into place, so a
+    killed run never leaves a partly written file.
+    """
+    start = time.perf_counter()
+    options = ENCODE_MODES[mode] if out_path.suffix.lower() == '.png' else {}
+    tmp_path = temp_path(out_path)
+    try:
+        img.save(tmp_path, format=Image.registered_extensions()[out_path.suffix.lower()], **options)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return time.perf_counter() - start, out_path.stat().st_size
+
+
+def encode_image_bytes(img, out_path, mode='default'):
+    """Encode img in memory exactly as encode_image would write it to
+    out_path. Returns (seconds, data)"""
+    start = time.perf_counter()
+    options = ENCODE_MODES[mode] if out_path.suffix.lower() == '.png' else {}
+    buffer = io.BytesIO()
+    img.save(buffer, format=Image.registered_extensions()[out_path.suffix.lower()], **options)
+    return time.perf_counter() - start, buffer.getvalue()
+
+
+def optimize_png(path):
+    """Recompress a PNG for size, keeping it only if smaller.
+
+    Returns (bytes before, bytes after).
+    """
+    before = path.stat().st_size
+    tmp_path = temp_path(path)
+    try:
+        with Image.open(path) as img:
+            img.load()
+            img.save(tmp_path, format='PNG', **ENCODE_MODES['optimize'])
+
+        after = tmp_path.stat().st_size
+        if after < before:
+            os.replace(tmp_path, path)
+            return before, after
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return before, before
+
+
+def _init_optimizer():
+    # Stay out of the way of interactive work
+    if hasattr(os, 'nice'):
+        os.nice(10)
+
+
+def optimize_pngs(paths, workers=None, progress_callback=None, check_cancelled=None):
+    """Recompress finished PNGs on a low-priority process pool.
+
+    Returns a dict with the file count, bytes before/after and wall time.
+    Cancelling leaves every file either untouched or fully replaced.
+    """
+    paths = [path for path in paths if path.suffix.lower() == '.png']
+    stats = {'files': len(paths), 'bytes_before': 0, 'bytes_after': 0, 'seconds': 0.0}
+    if not paths:
+        return stats
+
+    start = time.perf_counter()
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_optimizer) as executor:
+        futures = [executor.submit(optimize_png, path) for path in paths]
+        try:
+            for i, future in enumerate(futures):
+                before, after = future.result()
+                stats['bytes_before'] += before
+                stats['bytes_after'] += after
+                if progress_callback:
+                    progress_callback(i + 1, len(paths))
+                if check_cancelled:
+                    check_cancelled()
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+    stats['seconds'] = time.perf_counter() - start
+    return stats
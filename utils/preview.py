@@ -0,0 +1,107 @@
+import time
+import numpy as np
+from PIL import Image
+from .color_utils import hex_to_rgb
+from .decoded_store import load_source_pixels
+from .image_processing import colorize_pixels
+from .palette_index import pack_rgba, unpack_rgba
+
+# Longest side of a preview proxy, in pixels
+PREVIEW_MAX_SIZE = 160
+PREVIEW_MICA_PARTS = ('header', 'sidebar', 'titlebar')
+
+
+def select_preview_assets(theme_dir, supported_extensions=('.png', '.jpg', '.jpeg')):
+    """Pick a representative set of theme files for the live preview.
+
+    One window frame, one checkbox and every Mica header/sidebar/titlebar
+    (1x when both scales exist). Sources come from the backup when there is
+    one, since an in-place theme may already be tinted.
+    """
+    backup_dir = theme_dir / 'backup'
+    source_dir = backup_dir if backup_dir.exists() else theme_dir
+    names = sorted(item.name for item in source_dir.iterdir()
+                   if item.is_file() and item.suffix.lower() in supported_extensions)
+
+    selected = []
+    for prefix in ('windowframe', 'checkbox'):
+        for name in names:
+            if name.lower().startswith(prefix):
+                selected.append(name)
+                break
+    for name in names:
+        lower = name.lower()
+        if 'mica' not in lower or not any(part in lower for part in PREVIEW_MICA_PARTS):
+            continue
+        if '@2x' in name and name.replace('@2x', '') in names:
+            continue
+        selected.append(name)
+    return [source_dir / name for name in selected]
+
+
+class PreviewEngine:
+    """Downsampled proxies of a theme, recolored in memory.
+
+    All proxy pixels share one table of unique RGBA values, so a render only
+    runs the color math on those values and scatters them back. Nothing is
+    written to disk.
+    """
+
+    def __init__(self, max_size=PREVIEW_MAX_SIZE):
+        self.max_size = max_size
+        self.names = []
+        self.shapes = []
+        self.palette = np.zeros(0, dtype=np.uint32)
+        self.inverse = np.zeros(0, dtype=np.intp)
+        self.last_render_ms = 0.0
+
+    def load(self, files, decoded_store=None):
+        """Build proxies for files, skipping any that can't be decoded.
+
+        With a decoded_store, full-size pixels are mapped from it rather than
+        decoded, and stored there for the renders that follow.
+        """
+        names, shapes, proxies = [], [], []
+        for file_path in files:
+            try:
+                if decoded_store is not None:
+                    proxy = Image.fromarray(load_source_pixels(file_path, decoded_store), "RGBA")
+                else:
+                    with Image.open(file_path) as img:
+                        img.draft("RGB", (self.max_size, self.max_size))
+                        proxy = img.convert("RGBA")
+                proxy.thumbnail((self.max_size, self.max_size), Image.BILINEAR)
+            except Exception as e:
+                print(f"Error loading preview for {file_path.name}: {e}")
+                continue
+            names.append(file_path.name)
+            shapes.append((proxy.height, proxy.width))
+            proxies.append(pack_rgba(np.asarray(proxy)).reshape(-1))
+
+        self.names = names
+        self.shapes = shapes
+        if proxies:
+            self.palette, self.inverse = np.unique(np.concatenate(proxies), return_inverse=True)
+        else:
+            self.palette = np.zeros(0, dtype=np.uint32)
+            self.inverse = np.zeros(0, dtype=np.intp)
+
+    def render(self, color, intensity, saturation, brightness,
+               preserve_transparency=True, preserve_whites=True, preserve_blacks=True,
+               white_threshold=245, black_threshold=30):
+        """Recolor every proxy. Returns a list of (name, RGBA uint8 array)"""
+        start = time.perf_counter()
+        colors = unpack_rgba(self.palette).reshape(-1, 1, 4)
+        colorize_pixels(colors, hex_to_rgb(color), intensity, saturation, brightness,
+                        preserve_transparency, preserve_whites, preserve_blacks,
+                        white_threshold, black_threshold)
+        pixels = colors.reshape(-1, 4)[self.inverse.reshape(-1)]
+
+        results = []
+        offset = 0
+        for name, (height, width) in zip(self.names, self.shapes):
+            count = height * width
+            results.append((name, pixels[offset:offset + count].reshape(height, width, 4)))
+            offset += count
+        self.last_render_ms = (time.perf_counter() - start) * 1000
+        return results
@@ -0,0 +1,180 @@
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from pathlib import Path
+from .render_cache import default_cache_root
+
+# Comma separated list of captures, e.g. "spans", "cprofile,tracemalloc" or "all"
+PROFILE_ENV = 'GLOW_COLORIZER_PROFILE'
+PROFILE_DIR_ENV = 'GLOW_COLORIZER_PROFILE_DIR'
+PROFILE_CAPTURES = ('spans', 'cprofile', 'tracemalloc')
+
+# Captures that hook the whole interpreter, so only one run can hold each
+PROCESS_CAPTURES = ('cprofile', 'tracemalloc')
+
+_local = threading.local()          # .profiler: the run profiled on this thread
+_process_captures = set()           # PROCESS_CAPTURES held by a running profiler
+_process_captures_lock = threading.Lock()
+
+
+def parse_captures(value):
+    """Turn a setting like "1", "cprofile" or "all" into a set of captures.
+
+    Spans are always on once any capture is requested.
+    """
+    if not value or str(value).strip().lower() in ('0', 'off', 'false', 'no'):
+        return set()
+    captures = {'spans'}
+    for part in str(value).lower().split(','):
+        part = part.strip()
+        if part == 'all':
+            captures.update(PROFILE_CAPTURES)
+        elif part in PROFILE_CAPTURES:
+            captures.add(part)
+    return captures
+
+
+def profile_root():
+    """Folder that holds one sub-folder per profiled run"""
+    if os.environ.get(PROFILE_DIR_ENV):
+        return Path(os.environ[PROFILE_DIR_ENV])
+    return default_cache_root() / 'profiles'
+
+
+class RunProfiler:
+    """Timing spans for one run, with optional cProfile and tracemalloc.
+
+    Only the process that starts the profiler is captured by cProfile and
+    tracemalloc; files rendered on pool workers show up as 'file' spans
+    with the time the worker reported. Runs on other threads keep their
+    own spans, but cProfile and tracemalloc go to the first run asking for
+    them; later runs record spans only.
+    """
+
+    def __init__(self, name, captures, root=None):
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        safe_name = ''.join(c if c.isalnum() or c in '-_#.' else '_' for c in name)
+        self.run_dir = Path(root or profile_root()) / f"{stamp}-{safe_name}"
+        self.captures = set(captures)
+        self.spans = []
+        self._origin = None
+        self._profile = None
+
+    def start(self):
+        self._origin = time.perf_counter()
+        with _process_captures_lock:
+            taken = self.captures & _process_captures
+            _process_captures.update(self.captures & set(PROCESS_CAPTURES))
+        if taken:
+            print(f"Not capturing {', '.join(sorted(taken))}: another run is using it")
+            self.captures -= taken
+        if 'cprofile' in self.captures:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        if 'tracemalloc' in self.captures:
+            tracemalloc.start(25)
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - start, start, **attrs)
+
+    def add_span(self, name, seconds, start=None, **attrs):
+        """Record a span measured elsewhere, e.g. by a worker process"""
+        if start is None:
+            start = time.perf_counter() - seconds
+        self.spans.append(dict(attrs, name=name, start=round(start - self._origin, 6),
+                               seconds=round(seconds, 6)))
+
+    def summary(self):
+        """Count, total and max seconds per span name, slowest first"""
+        totals = OrderedDict()
+        for span in self.spans:
+            entry = totals.setdefault(span['name'], {'count': 0, 'total': 0.0, 'max': 0.0})
+            entry['count'] += 1
+            entry['total'] += span['seconds']
+            entry['max'] = max(entry['max'], span['seconds'])
+        return OrderedDict(sorted(totals.items(), key=lambda item: -item[1]['total']))
+
+    def stop(self):
+        """Stop every capture and write the run folder. Returns its path"""
+        snapshot = None
+        try:
+            if self._profile is not None:
+                self._profile.disable()
+            if 'tracemalloc' in self.captures and tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+        finally:
+            with _process_captures_lock:
+                _process_captures.difference_update(self.captures)
+
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        if self._profile is not None:
+            self._profile.dump_stats(self.run_dir / 'profile.pstats')
+            text = io.StringIO()
+            pstats.Stats(self._profile, stream=text).sort_stats('cumulative').print_stats(40)
+            (self.run_dir / 'profile.txt').write_text(text.getvalue())
+            self._profile = None
+
+        if snapshot is not None:
+            lines = [f"Current: {current / (1024 * 1024):.1f} MB, peak: {peak / (1024 * 1024):.1f} MB", ""]
+            lines += [str(stat) for stat in snapshot.statistics('lineno')[:30]]
+            (self.run_dir / 'tracemalloc.txt').write_text('\n'.join(lines) + '\n')
+
+        with open(self.run_dir / 'spans.json', 'w') as f:
+            json.dump({'spans': self.spans, 'summary': self.summary()}, f, indent=2)
+
+        lines = [f"{'span':<24}{'count':>7}{'total s':>10}{'max s':>10}"]
+        for name, entry in self.summary().items():
+            lines.append(f"{name:<24}{entry['count']:>7}{entry['total']:>10.3f}{entry['max']:>10.3f}")
+        (self.run_dir / 'summary.txt').write_text('\n'.join(lines) + '\n')
+        return self.run_dir
+
+
+def start_profiler(name, captures=None):
+    """Start profiling the run on this thread if captures (or the
+    environment) ask for it.
+
+    Returns the active RunProfiler, or None when profiling is off.
+    """
+    captures = parse_captures(captures) | parse_captures(os.environ.get(PROFILE_ENV))
+    if not captures:
+        return None
+    _local.profiler = RunProfiler(name, captures)
+    _local.profiler.start()
+    return _local.profiler
+
+
+def stop_profiler():
+    """Write the results of this thread's profiler. Returns the run folder
+    or None"""
+    profiler = active_profiler()
+    _local.profiler = None
+    if profiler is None:
+        return None
+    return profiler.stop()
+
+
+def active_profiler():
+    """The profiler of the run on this thread, or None"""
+    return getattr(_local, 'profiler', None)
+
+
+def span(name, **attrs):
+    """Time a block under name when the run on this thread is profiled"""
+    profiler = active_profiler()
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.span(name, **attrs)
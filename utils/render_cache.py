@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from .file_utils import copy_file_atomic
+from .disk_store import DiskStore
+
+DEFAULT_CACHE_BYTES = 1024 * 1024 * 1024
+CACHE_DIR_ENV = 'GLOW_COLORIZER_CACHE_DIR'
+
+
+def default_cache_root():
+    """Per-user cache folder shared by every theme and process"""
+    if os.environ.get(CACHE_DIR_ENV):
+        return Path(os.environ[CACHE_DIR_ENV])
+    if sys.platform == 'darwin':
+        return Path.home() / 'Library' / 'Caches' / 'GlowEngineColorizer'
+    return Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'glow-engine-colorizer'
+
+
+def render_key(source_hash, params):
+    """Cache key for a source asset rendered with the given parameters"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(source_hash.encode())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class RenderCache(DiskStore):
+    """On-disk content-addressed store of colorized outputs.
+
+    Entries are shared between processes and evicted least recently used
+    first, see DiskStore. They are copied out rather than hardlinked, since
+    later in-place writes to a theme file would otherwise corrupt the
+    cached copy.
+    """
+
+    suffix = '.png'
+
+    def __init__(self, root=None, max_bytes=DEFAULT_CACHE_BYTES):
+        super().__init__(root or default_cache_root() / 'renders', max_bytes)
+
+    def fetch(self, key, dest):
+        """Copy a cached render to dest. Returns False on a miss"""
+        path = self._entry_path(key)
+        try:
+            copy_file_atomic(path, dest)
+            os.utime(path)
+        except FileNotFoundError:
+            self._count(hit=False)
+            return False
+        self._count(hit=True)
+        return True
+
+    def store(self, key, src):
+        """Add a rendered file to the cache"""
+        path = self._entry_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._temp_path(key)
+            shutil.copyfile(src, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error storing render in cache: {e}")
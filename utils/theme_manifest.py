@@ -0,0 +1,195 @@
+import json
+import os
+from .file_utils import get_cache_dir, file_digest
+
+MANIFEST_FILE = 'manifest.json'
+JOURNAL_FILE = 'journal.jsonl'
+
+
+def effective_params(job, options, pattern_hash=None):
+    """Everything that decides the bytes written for one file"""
+    return {
+        'color': job['color'],
+        'intensity': options['intensity'],
+        'saturation': options['saturation'],
+        'brightness': options['brightness'],
+        'preserve_transparency': options['preserve_transparency'],
+        'preserve_whites': options['preserve_whites'],
+        'preserve_blacks': options['preserve_blacks'],
+        'white_threshold': options['white_threshold'],
+        'black_threshold': options['black_threshold'],
+        'convert_to_grayscale': options.get('convert_to_grayscale', False),
+        'pattern': pattern_hash if job['pattern_path'] else None,
+        'pattern_blend': job['pattern_blend'],
+        # Only PNG outputs change bytes with the encoder settings
+        'encode_mode': (options.get('encode_mode', 'default')
+                        if job['file_path'].suffix.lower() == '.png' else None),
+    }
+
+
+def output_entry(out_path, source_hash, params):
+    """Manifest record of an output file as it is on disk now"""
+    stat = out_path.stat()
+    return {
+        'source': source_hash,
+        'params': params,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+
+
+class ThemeManifest:
+    """Per-theme record of how each output file was produced.
+
+    For every colorized file it keeps the source content hash, the
+    effective parameters and the output's size/mtime, so a later run can
+    tell which files really need to be rendered again. Sources also keep
+    their opaque alpha box once a render has measured it.
+    """
+
+    def __init__(self, path, data=None):
+        self.path = path
+        data = data or {}
+        self.outputs = data.get('outputs', {})
+        self.sources = data.get('sources', {})
+
+    @classmethod
+    def load(cls, theme_dir):
+        path = get_cache_dir(theme_dir) / MANIFEST_FILE
+        try:
+            if path.exists():
+                with open(path, 'r') as f:
+                    return cls(path, json.load(f))
+        except Exception as e:
+            print(f"Error loading manifest: {e}")
+        return cls(path)
+
+    def exists(self):
+        return self.path.exists()
+
+    def save(self):
+        """Write the manifest atomically"""
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'outputs': self.outputs, 'sources': self.sources}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def source_hash(self, source_path):
+        """Content hash of a source file, reused while its size/mtime hold"""
+        stat = source_path.stat()
+        key = str(source_path)
+        cached = self.sources.get(key)
+        if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            return cached['hash']
+
+        digest = file_digest(source_path)
+        self.sources[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest}
+        return digest
+
+    def alpha_box(self, source_path):
+        """Opaque (top, bottom, left, right) box recorded for a source whose
+        hash was just checked, or None"""
+        cached = self.sources.get(str(source_path))
+        return tuple(cached['alpha_box']) if cached and 'alpha_box' in cached else None
+
+    def record_alpha_box(self, source_path, alpha_box):
+        cached = self.sources.get(str(source_path))
+        if cached is not None:
+            cached['alpha_box'] = list(alpha_box)
+
+    def is_up_to_date(self, out_path, source_hash, params):
+        """Check the output was rendered from this source with these params"""
+        entry = self.outputs.get(out_path.name)
+        if entry is None or entry['source'] != source_hash:
+            return False
+        # Round-trip through JSON so floats and tuples compare like stored ones
+        if entry['params'] != json.loads(json.dumps(params)):
+            return False
+        try:
+            stat = out_path.stat()
+        except OSError:
+            return False
+        return entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+
+    def record(self, out_path, source_hash, params):
+        self.outputs[out_path.name] = output_entry(out_path, source_hash, params)
+
+    def refresh_output(self, out_path):
+        """Re-stat an output rewritten without changing its pixels"""
+        entry = self.outputs.get(out_path.name)
+        if entry is not None and out_path.exists():
+            stat = out_path.stat()
+            entry['size'] = stat.st_size
+            entry['mtime_ns'] = stat.st_mtime_ns
+
+    def forget(self, name):
+        self.outputs.pop(name, None)
+
+
+class RunJournal:
+    """Append-only log of the outputs a run has finished, for resuming it.
+
+    The first line holds the run's settings key; each later line is the
+    manifest record of one output, written once the file is renamed into
+    place. A finished run deletes its journal, so one found on disk belongs
+    to a run that was killed part way.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    @classmethod
+    def for_theme(cls, theme_dir):
+        return cls(get_cache_dir(theme_dir) / JOURNAL_FILE)
+
+    def read(self):
+        """Settings key and {name: record} of a left over journal. A line
+        cut short by the crash is ignored"""
+        run_key, outputs = None, {}
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    if 'run' in entry:
+                        run_key = entry['run']
+                    else:
+                        outputs[entry.pop('name')] = entry
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error reading run journal: {e}")
+        return run_key, outputs
+
+    def start(self, run_key):
+        """Begin a new journal for a run, replacing any old one"""
+        self.close()
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps({'run': run_key}) + '\n')
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, 'a')
+
+    def record(self, out_path, source_hash, params):
+        """Log a finished output; flushed so it survives the process dying"""
+        if self._file is None:
+            return
+        entry = dict(output_entry(out_path, source_hash, params), name=out_path.name)
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """Close and delete the journal once its run is settled"""
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
@@ -141,4 +141,27 @@ class PlistSettingsWidget(QWidget):
 
         # Main layout
         main_layout = QVBoxLayout(self)
-        main_layout.addWidget(scroll_area)
\ No newline at end of file
+        main_layout.addWidget(scroll_area)
+
+    def get_settings(self):
+        """Return the current values as a plain dict"""
+        return {
+            'active_shadow': self.active_shadow_spin.value(),
+            'inactive_shadow': self.inactive_shadow_spin.value(),
+            'dock_reflection': self.dock_reflection_checkbox.isChecked(),
+            'dock_touches_ground': self.dock_touches_ground_checkbox.isChecked(),
+            'dock_slices': self.dock_slices_input.text(),
+            'hide_window_rim': self.hide_window_rim_checkbox.isChecked(),
+            'mini_toolbar': self.mini_toolbar_checkbox.isChecked(),
+            'patch_appearance': self.patch_appearance_checkbox.isChecked(),
+            'control_spacing': self.control_spacing_spin.value(),
+            'mica_header': self.mica_header_checkbox.isChecked(),
+            'mica_sidebar': self.mica_sidebar_checkbox.isChecked(),
+            'mica_titlebar': self.mica_titlebar_checkbox.isChecked(),
+            'mica_menu': self.mica_menu_checkbox.isChecked(),
+            'mica_window_bg': self.mica_window_bg_checkbox.isChecked(),
+            'window_frame_mask_1x': self.window_frame_mask_1x.text(),
+            'window_frame_base_1x': self.window_frame_base_1x.text(),
+            'window_frame_mask_2x': self.window_frame_mask_2x.text(),
+            'window_frame_base_2x': self.window_frame_base_2x.text(),
+        }
@@ -0,0 +1,112 @@
+import threading
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QGridLayout, QLabel
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+from utils.preview import PreviewEngine, select_preview_assets
+
+class ThemePreviewWidget(QWidget):
+    """Live preview of a theme's key assets with the current color settings"""
+
+    COLUMNS = 4
+
+    # Emitted from the loader thread with (load generation, PreviewEngine)
+    theme_loaded = pyqtSignal(int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.engine = PreviewEngine()
+        self.load_generation = 0
+        self.theme_loaded.connect(self.on_theme_loaded)
+        self.pending_settings = None
+        self.image_labels = []
+
+        # Coalesce bursts of slider moves into one render per event loop pass
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.setInterval(0)
+        self.render_timer.timeout.connect(self.render_pending)
+
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.grid = QGridLayout()
+        layout.addLayout(self.grid)
+
+        self.status_label = QLabel("No theme selected")
+        self.status_label.setStyleSheet("color: #666;")
+        layout.addWidget(self.status_label)
+
+    def set_theme(self, theme_dir, decoded_store=None):
+        """Load proxies for a theme's representative assets.
+
+        Files are decoded on a background thread, through decoded_store
+        when given; only the latest theme asked for is shown.
+        """
+        for label in self.image_labels:
+            label.setParent(None)
+        self.image_labels = []
+        self.engine = PreviewEngine()
+        self.load_generation += 1
+        generation = self.load_generation
+
+        if not theme_dir or not theme_dir.exists():
+            self.status_label.setText("No theme selected")
+            return
+        self.status_label.setText("Loading preview...")
+
+        def load():
+            engine = PreviewEngine()
+            try:
+                engine.load(select_preview_assets(theme_dir), decoded_store)
+                if decoded_store is not None:
+                    decoded_store.evict()
+            except Exception as e:
+                print(f"Error loading preview of {theme_dir.name}: {e}")
+            try:
+                self.theme_loaded.emit(generation, engine)
+            except RuntimeError:
+                pass    # The window closed while loading
+
+        threading.Thread(target=load, name="preview-load", daemon=True).start()
+
+    def on_theme_loaded(self, generation, engine):
+        if generation != self.load_generation:
+            return
+        self.engine = engine
+        for i, name in enumerate(self.engine.names):
+            label = QLabel()
+            label.setAlignment(Qt.AlignCenter)
+            label.setToolTip(name)
+            label.setStyleSheet("border: 1px solid #ccc; background-color: #f0f0f0;")
+            label.setFixedSize(self.engine.max_size, self.engine.max_size)
+            self.grid.addWidget(label, i // self.COLUMNS, i % self.COLUMNS)
+            self.image_labels.append(label)
+
+        if not self.engine.names:
+            self.status_label.setText("No preview assets found")
+        elif self.pending_settings is not None:
+            self.render_timer.start()
+
+    def update_preview(self, settings):
+        """Schedule a render; only the latest settings are drawn"""
+        self.pending_settings = settings
+        self.render_timer.start()
+
+    def render_pending(self):
+        if self.pending_settings is None or not self.engine.names:
+            return
+        try:
+            results = self.engine.render(**self.pending_settings)
+        except Exception as e:
+            self.status_label.setText(f"Preview unavailable: {e}")
+            return
+
+        for label, (name, pixels) in zip(self.image_labels, results):
+            height, width = pixels.shape[:2]
+            image = QImage(pixels.data, width, height, width * 4, QImage.Format_RGBA8888)
+            label.setPixmap(QPixmap.fromImage(image))
+        self.status_label.setText(
+            f"Preview of {len(results)} assets rendered in {self.engine.last_render_ms:.0f} ms")